@@ -0,0 +1,268 @@
+# *******************************************
+# Archive locale des mesures (SQLite)
+# - Import des fichiers journaux, lignes déjà présentes ignorées
+# - Table des mesures rangée par date (clé primaire), tables agrégées
+#   par minute et par heure
+# - Données d'une plage de temps pour les fenêtres (PhaseDataset)
+# - Import et mesure des performances :
+#     python archive.py import phases.db journal1.csv journal2.csv
+#     python archive.py bench --rows 1000000
+#********************************************
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time as time_module
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from dataset import MEASURE_PREFIXES, PhaseDataset
+from loader import iter_frames
+
+ARCHIVE_COLUMNS = [f"{prefix}{phase}" for phase in range(1, 5) for prefix in MEASURE_PREFIXES]
+LEVELS = {"minute": 60, "hour": 3600}  # tables agrégées : durée d'un intervalle (s)
+MAX_POINTS = 500_000  # au-delà, la lecture automatique passe aux tables agrégées
+BATCH_ROWS = 100_000
+
+
+def to_seconds(times):
+    """datetime64 values to integer seconds (the archive key)"""
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64) // 1_000_000_000
+
+
+class PhaseArchive:
+    """SQLite archive of the phase measurements.
+
+    `samples` holds one row per second keyed by its time (INTEGER PRIMARY KEY:
+    the table itself is stored in time order, so a time range is one
+    contiguous read). `samples_minute` and `samples_hour` hold the count and
+    the mean, min and max of every column per interval.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{col} REAL" for col in ARCHIVE_COLUMNS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS samples (time INTEGER PRIMARY KEY, {columns})")
+        for level in LEVELS:
+            stats = ", ".join(f"{col}_{stat} REAL" for col in ARCHIVE_COLUMNS for stat in ("avg", "min", "max"))
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS samples_{level} "
+                              f"(time INTEGER PRIMARY KEY, count INTEGER, {stats})")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def bounds(self):
+        """First and last time of the archive, (None, None) when empty"""
+        first, last = self.conn.execute("SELECT MIN(time), MAX(time) FROM samples").fetchone()
+        if first is None:
+            return None, None
+        return pd.Timestamp(first, unit='s'), pd.Timestamp(last, unit='s')
+
+    def insert_frame(self, data):
+        """Insert the rows of a DataFrame (time + measurement columns); rows
+        whose time is already archived are skipped. Returns the number of
+        rows inserted. The caller commits and refreshes the aggregates."""
+        if data.empty:
+            return 0
+        values = [to_seconds(data['time'].values).tolist()]
+        for col in ARCHIVE_COLUMNS:
+            values.append(data[col].astype(np.float64).tolist() if col in data.columns else [None] * len(data))
+        placeholders = ", ".join("?" * (len(ARCHIVE_COLUMNS) + 1))
+        before = self.conn.total_changes
+        self.conn.executemany(f"INSERT OR IGNORE INTO samples (time, {', '.join(ARCHIVE_COLUMNS)}) "
+                              f"VALUES ({placeholders})", zip(*values))
+        return self.conn.total_changes - before
+
+    def import_csv(self, file_path, progress=None):
+        """Append a log file to the archive. Returns (rows read, rows inserted,
+        rows skipped because an earlier row of the file has the same second:
+        the archive keeps one row per second)"""
+        read = inserted = same_second = 0
+        first = last = previous = None
+        usecols = ['time'] + ARCHIVE_COLUMNS
+        with self.conn:
+            for data in iter_frames(file_path, usecols=lambda col: col in usecols):
+                data = data.dropna(subset=['time'])
+                if data.empty:
+                    continue
+                read += len(data)
+                inserted += self.insert_frame(data)
+                seconds = to_seconds(data['time'].values)
+                distinct = np.unique(seconds)
+                same_second += len(seconds) - len(distinct) + int(previous in distinct)
+                previous = seconds[-1]
+                first = seconds.min() if first is None else min(first, seconds.min())
+                last = seconds.max() if last is None else max(last, seconds.max())
+                if progress is not None:
+                    progress(read, inserted)
+            if inserted:
+                self.refresh_aggregates(int(first), int(last))
+        return read, inserted, same_second
+
+    def refresh_aggregates(self, first, last):
+        """Recompute the minute and hour tables over [first, last] (seconds)"""
+        hour = LEVELS["hour"]
+        start = first // hour * hour
+        end = (last // hour + 1) * hour
+        names = ", ".join(f"{col}_{stat}" for col in ARCHIVE_COLUMNS for stat in ("avg", "min", "max"))
+        # Chaque niveau à partir des mesures : une moyenne d'heure tirée des
+        # minutes serait faussée par les valeurs absentes (colonne manquante)
+        stats = ", ".join(f"AVG({col}), MIN({col}), MAX({col})" for col in ARCHIVE_COLUMNS)
+        for level, seconds in LEVELS.items():
+            self.conn.execute(f"DELETE FROM samples_{level} WHERE time >= ? AND time < ?", (start, end))
+            self.conn.execute(f"INSERT INTO samples_{level} (time, count, {names}) "
+                              f"SELECT time / {seconds} * {seconds}, COUNT(*), {stats} FROM samples "
+                              f"WHERE time >= ? AND time < ? GROUP BY time / {seconds}", (start, end))
+
+    def level_for(self, start, end):
+        """Finest level giving at most MAX_POINTS rows between start and end"""
+        start_s, end_s = int(to_seconds([start])[0]), int(to_seconds([end])[0])
+        count = self.conn.execute("SELECT SUM(count) FROM samples_hour WHERE time >= ? AND time <= ?",
+                                  (start_s // LEVELS["hour"] * LEVELS["hour"], end_s)).fetchone()[0] or 0
+        if count <= MAX_POINTS:
+            return "raw"
+        for level, seconds in LEVELS.items():
+            if (end_s - start_s) / seconds <= MAX_POINTS:
+                return level
+        return "hour"
+
+    def query(self, start, end, columns=None, level="auto"):
+        """Rows between start and end (inclusive) as a DataFrame like the ones
+        loaded from the files ('time' + columns). The aggregate levels give
+        the mean of each interval. Returns (data, level used)."""
+        columns = [col for col in (columns or ARCHIVE_COLUMNS) if col in ARCHIVE_COLUMNS]
+        if level == "auto":
+            level = self.level_for(start, end)
+        if level == "raw":
+            table, fields = "samples", ", ".join(columns)
+        else:
+            table, fields = f"samples_{level}", ", ".join(f"{col}_avg AS {col}" for col in columns)
+        start_s, end_s = int(to_seconds([start])[0]), int(to_seconds([end])[0])
+        cursor = self.conn.execute(f"SELECT time{', ' if fields else ''}{fields} FROM {table} "
+                                   f"WHERE time >= ? AND time <= ? ORDER BY time", (start_s, end_s))
+        rows = cursor.fetchall()
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns) + 1)
+        data = pd.DataFrame(values[:, 1:], columns=columns)
+        data.insert(0, 'time', (values[:, 0].astype(np.int64) * 1_000_000_000).view('datetime64[ns]'))
+        return data, level
+
+
+class ArchiveDataset(PhaseDataset):
+    """Phase data of a time range read from the archive, for the windows.
+    Columns are read on demand like for the files; reload() reads the range
+    again (after an import)."""
+
+    def __init__(self, db_path, start, end, columns=None, level="auto"):
+        self.db_path = db_path
+        self.requested_level = level
+        with closing(PhaseArchive(db_path)) as archive:
+            data, self.level = archive.query(start, end, columns, level)
+        super().__init__(data, None, ['time'] + ARCHIVE_COLUMNS, (start, end), columns)
+
+    def ensure_columns(self, columns):
+        if self.columns is None:
+            return
+        missing = [col for col in columns if col in ARCHIVE_COLUMNS and col not in self.data.columns]
+        if not missing:
+            return
+        self.cache.pop('quality', None)
+        self.columns.update(missing)
+        with closing(PhaseArchive(self.db_path)) as archive:
+            data, _ = archive.query(*self.time_range, missing, self.level)
+        if len(data) != len(self.data):
+            self.reload()
+            return
+        for col in missing:
+            self.data[col] = data[col].to_numpy()
+
+    def reload(self):
+        with closing(PhaseArchive(self.db_path)) as archive:
+            self.data, self.level = archive.query(*self.time_range, self.columns, self.requested_level)
+        self.changed()
+
+    def patch_lines(self, changes, blank_lines=()):
+        raise ValueError("Archive dataset")
+
+
+# ****************************************Mesure des performances
+
+def synthetic_frame(first_second, rows):
+    """Synthetic measurements, one row per second"""
+    seconds = first_second + np.arange(rows, dtype=np.int64)
+    data = {'time': (seconds * 1_000_000_000).view('datetime64[ns]')}
+    rng = np.random.default_rng(first_second)
+    for phase in range(1, 5):
+        data[f"voltagemoy{phase}"] = 230 + rng.normal(0, 1, rows)
+        data[f"currentmoy{phase}"] = 5 + 4 * np.sin(seconds / 3600 + phase)
+        data[f"powermoy{phase}"] = data[f"voltagemoy{phase}"] * data[f"currentmoy{phase}"]
+    return pd.DataFrame(data)
+
+
+def bench(rows, repeat=5):
+    """Bulk insert throughput and range query latency on a temporary archive"""
+    with tempfile.TemporaryDirectory() as folder:
+        archive = PhaseArchive(os.path.join(folder, "bench.db"))
+        first = int(pd.Timestamp("2025-01-01").value // 1_000_000_000)
+
+        started = time_module.perf_counter()
+        with archive.conn:
+            for offset in range(0, rows, BATCH_ROWS):
+                archive.insert_frame(synthetic_frame(first + offset, min(BATCH_ROWS, rows - offset)))
+        insert_time = time_module.perf_counter() - started
+        started = time_module.perf_counter()
+        with archive.conn:
+            archive.refresh_aggregates(first, first + rows - 1)
+        aggregate_time = time_module.perf_counter() - started
+        started = time_module.perf_counter()
+        with archive.conn:
+            skipped = archive.insert_frame(synthetic_frame(first, min(BATCH_ROWS, rows)))
+        duplicate_time = time_module.perf_counter() - started
+
+        print(f"Insertion : {rows:,} lignes en {insert_time:.2f} s ({rows / insert_time:,.0f} lignes/s)")
+        print(f"Tables agrégées : {aggregate_time:.2f} s")
+        print(f"Réimport de {min(BATCH_ROWS, rows):,} lignes : {skipped} insérées, {duplicate_time:.2f} s")
+
+        start = pd.Timestamp(first, unit='s')
+        for label, seconds in [("1 heure", 3600), ("1 jour", 86400), ("1 semaine", 7 * 86400),
+                               ("tout", rows)]:
+            end = start + pd.Timedelta(seconds=min(seconds, rows) - 1)
+            latencies = []
+            for _ in range(repeat):
+                started = time_module.perf_counter()
+                data, level = archive.query(start, end)
+                latencies.append(time_module.perf_counter() - started)
+            print(f"Plage {label:>9} : {len(data):>8,} lignes ({level:>6}), "
+                  f"{1000 * sorted(latencies)[repeat // 2]:.1f} ms")
+        archive.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive SQLite des mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    import_parser = commands.add_parser("import", help="ajoute des fichiers journaux à l'archive")
+    import_parser.add_argument("database")
+    import_parser.add_argument("files", nargs="+")
+    bench_parser = commands.add_parser("bench", help="mesure insertion et lecture")
+    bench_parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        with closing(PhaseArchive(args.database)) as archive:
+            for file_path in args.files:
+                started = time_module.perf_counter()
+                read, inserted, same_second = archive.import_csv(file_path)
+                print(f"{file_path} : {read:,} lignes lues, {inserted:,} ajoutées, "
+                      f"{read - inserted - same_second:,} déjà présentes, "
+                      f"{same_second:,} ignorées (même seconde qu'une ligne précédente) "
+                      f"({time_module.perf_counter() - started:.1f} s)")
+    elif args.command == "bench":
+        bench(args.rows)
+    else:
+        parser.print_help()
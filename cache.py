@@ -0,0 +1,98 @@
+# *******************************************
+# Cache des résultats calculés (LRU limité en octets)
+# - Résultats rangés par clé (version des données, plage, filtres...), les
+#   moins récemment utilisés sont retirés quand la taille totale dépasse la
+#   limite : revenir à une vue récente ne demande aucun calcul
+# - Taille estimée des tableaux numpy, DataFrame pandas, textes et
+#   conteneurs de ces objets
+# - Compteurs de succès et de calculs affichés par les fenêtres et le serveur
+# - Utilisable par plusieurs threads (serveur HTTP)
+#********************************************
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+VIEW_CACHE_BYTES = 128 * 2**20  # par fenêtre de comparaison
+
+
+def nbytes(value):
+    """Approximate memory used by a result (bytes)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Results by key, the least recently used dropped first when their total
+    size goes over max_bytes (a result larger than max_bytes is not kept)"""
+
+    def __init__(self, max_bytes=VIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()  # clé -> (résultat, taille)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return default
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key][0]
+
+    def put(self, key, value, size=None):
+        size = nbytes(value) if size is None else size
+        with self.lock:
+            if key in self.items:
+                self.bytes -= self.items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self.items.popitem(last=False)[1][1]
+
+    def memo(self, key, compute, size=None):
+        """Result of key, computed by compute() and kept the first time
+        (`size`: function giving the bytes of the result, nbytes by default)"""
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key][0]
+            self.misses += 1
+        value = compute()
+        self.put(key, value, None if size is None else size(value))
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+    def summary(self):
+        return (f"cache : {self.hits:,} succès, {self.misses:,} calculs, "
+                f"{len(self.items)} résultats ({self.bytes / 2**20:.1f} Mo)")
@@ -41,16 +41,41 @@ from datetime import datetime, time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
+import queue
+import threading
+import multiprocessing
+from editor_tools import LineIndex, SearchWorker, ReplaceWorker, compile_pattern, file_lines
+from dataset import PhaseDataset, phase_columns, comparison_columns, memory_report
+from live import create_receiver
+from stats_engine import WindowStats, file_statistics, trapezoid_energy, JOULES_PER_KWH
+from quality import with_breaks, gap_breaks, gap_threshold, describe
+from resample import resample, decimate, RESOLUTIONS
+from periods import PeriodTable, PERIODS, POWER_COLUMNS
+from tariff import EnergyCurve, TariffSchedule, breakdown, dataset_breakdown, export_breakdown
+from events import EventDetector, EVENT_RULES, PLOT_PREFIXES
+from derived import REGISTRY, derived_values
+from rolling import STATISTICS, centered_mean, rolling
+from raster import RasterAxes
+from cache import LRUCache, nbytes
+from distribution import SortedColumn
+from export import export_selection, FILE_TYPES
+from loader import TimeIndex, file_time_bounds
+from archive import PhaseArchive, ArchiveDataset
+from contextlib import closing
+from time import perf_counter
 
 class TextFileEditor:
-    def __init__(self, root, file_path=None):
+    def __init__(self, root, file_path=None, on_save=None):
         self.root = tk.Toplevel(root)  # Create a new top-level window
         self.root.title("CSV/TXT File Editor")
         self.root.geometry("900x600")
 
         self.current_file_path = file_path
+        # Appelé après chaque sauvegarde avec (chemin, lignes modifiées, lignes vides d'origine)
+        self.on_save = on_save
         self.file_modified = False
-        self.original_text = ""
+        self.line_index = LineIndex()
+        self.pending_edit = None  # (première ligne, dernière ligne, nombre de lignes) avant modification
 
         self.create_widgets()
         if self.current_file_path:
@@ -161,7 +186,9 @@ class TextFileEditor:
                     # Mettre à jour l'interface pendant le chargement
                     self.root.update_idletasks()
             
-            self.original_text = self.text_editor.get(1.0, tk.END)
+            self.line_index.reset(self.text_editor.get(1.0, "end-1c").split('\n'))
+            self.pending_edit = None
+            self.reset_text_color()
             self.update_field_headers()
             self.update_line_numbers()
             self.apply_syntax_highlighting()  # Appliquer la coloration après le chargement
@@ -172,11 +199,9 @@ class TextFileEditor:
 
     def update_field_headers(self):
         # Get the first line of the content
-        content = self.text_editor.get(1.0, tk.END)
-        lines = content.splitlines()
+        first_line = self.text_editor.get("1.0", "1.end")
 
-        if lines:
-            first_line = lines[0]
+        if first_line:
             # Extract fields assuming semicolon separator
             fields = first_line.split(';')
             formatted_fields = " | ".join([field.strip() for field in fields])
@@ -194,12 +219,19 @@ class TextFileEditor:
             with open(self.current_file_path, 'w', encoding='utf-8') as file:
                 file.write(content)
 
-            self.original_text = content
+            lines = content[:-1].split('\n')  # sans le retour ligne final ajouté par Tk
+            changes = [(old_first, old_end, lines[new_first:new_end])
+                       for old_first, old_end, new_first, new_end in self.line_index.changed_ranges()]
+            blank_lines = self.line_index.original_blank
+            self.line_index.reset(lines)
+            self.pending_edit = None
             self.file_modified = False
             self.reset_text_color()
             self.update_field_headers()  # Update headers in case first line changed
             self.update_status(f"Saved to {os.path.basename(self.current_file_path)}")
             self.hide_error()
+            if changes and self.on_save is not None:
+                self.on_save(self.current_file_path, changes, blank_lines)
         except Exception as e:
             self.show_error(f"Error saving file: {str(e)}")
 
@@ -288,16 +320,22 @@ Features:
 
         tk.Button(help_window, text="Close", command=help_window.destroy).pack(pady=10)
 
-    def update_line_numbers(self):
-        self.line_numbers.config(state='normal')
-        self.line_numbers.delete(1.0, tk.END)
+    def get_line_count(self):
+        """Nombre de lignes du widget"""
+        return int(self.text_editor.index("end-1c").split('.')[0])
 
-        content = self.text_editor.get(1.0, tk.END)
-        lines = content.splitlines()
-        line_count = len(lines)
+    def update_line_numbers(self, old_count=None):
+        """Met à jour la gouttière ; seules les lignes ajoutées/supprimées en fin sont touchées"""
+        line_count = self.get_line_count()
+        self.line_numbers.config(state='normal', width=max(4, len(str(line_count)) + 1))
 
-        for i in range(1, line_count + 1):
-            self.line_numbers.insert(tk.END, f"{i}\n")
+        if old_count is None:
+            self.line_numbers.delete(1.0, tk.END)
+            self.line_numbers.insert(tk.END, "".join(f"{i}\n" for i in range(1, line_count + 1)))
+        elif line_count > old_count:
+            self.line_numbers.insert("end-1c", "".join(f"{i}\n" for i in range(old_count + 1, line_count + 1)))
+        elif line_count < old_count:
+            self.line_numbers.delete(f"{line_count + 1}.0", "end-1c")
 
         self.line_numbers.config(state='disabled')
 
@@ -307,55 +345,73 @@ Features:
         return "break"  # Empêche la propagation de l'événement
 
     def on_text_change(self, event=None):
-        """Gestionnaire d'événements pour les modifications de texte"""
-        self.update_line_numbers()
-        current_text = self.text_editor.get(1.0, tk.END)
+        """Gestionnaire d'événements pour les modifications de texte.
+
+        The key is not applied yet when this binding runs: we only note the
+        lines it can touch and process them once the widget is up to date.
+        """
+        try:
+            first = int(self.text_editor.index("sel.first").split('.')[0])
+            last = int(self.text_editor.index("sel.last").split('.')[0])
+        except tk.TclError:
+            first = last = int(self.text_editor.index("insert").split('.')[0])
+        line_count = self.get_line_count()
+        # Une ligne de plus de chaque côté pour les fusions (BackSpace/Delete)
+        first = max(1, first - 1)
+        last = min(line_count, last + 1)
+
+        if self.pending_edit is None:
+            self.pending_edit = (first, last, line_count)
+            self.root.after_idle(self.process_edit)
+        else:
+            # Plusieurs touches avant traitement : on élargit la plage en coordonnées d'origine
+            old_first, old_last, old_count = self.pending_edit
+            self.pending_edit = (min(old_first, first),
+                                 max(old_last, last - (line_count - old_count)),
+                                 old_count)
+
+    def process_edit(self):
+        """Apply the pending edit: gutter, header, modified marks, highlighting, validation"""
+        if self.pending_edit is None:
+            return
+        first, last, old_count = self.pending_edit
+        self.pending_edit = None
+
+        line_count = self.get_line_count()
+        new_last = max(first - 1, last + line_count - old_count)
+        new_lines = self.text_editor.get(f"{first}.0", f"{new_last}.end").split('\n') if new_last >= first else []
+        expected_before = self.line_index.expected_fields()
+        modified = self.line_index.replace(first - 1, last - first + 1, new_lines)
+
+        if line_count != old_count:
+            self.update_line_numbers(old_count)
 
         # Update field headers if first line changed
-        self.update_field_headers()
+        if first == 1:
+            self.update_field_headers()
 
-        if current_text != self.original_text:
-            self.file_modified = True
-            self.highlight_modified_text()
-        else:
-            self.file_modified = False
-            self.reset_text_color()
+        self.file_modified = self.line_index.is_modified()
+        for line_num, is_modified in enumerate(modified, first):
+            self.text_editor.tag_remove("modified", f"{line_num}.0", f"{line_num}.end")
+            if is_modified:
+                self.text_editor.tag_add("modified", f"{line_num}.0", f"{line_num}.end")
 
         # Appliquer la coloration syntaxique
-        self.apply_syntax_highlighting()
-        
+        if self.line_index.expected_fields() != expected_before:
+            self.apply_syntax_highlighting()
+        else:
+            self.apply_syntax_highlighting(first, new_last)
+
         # Valider le format CSV si nécessaire
         if self.current_file_path and self.current_file_path.lower().endswith('.csv'):
             self.validate_csv_format()
 
     def highlight_modified_text(self):
-        # First remove all tags
+        """Marque toutes les lignes modifiées (passage complet)"""
         self.text_editor.tag_remove("modified", "1.0", tk.END)
-
-        # If we have original text, compare and highlight differences
-        if self.original_text:
-            # Get both texts as lines for comparison
-            current_lines = self.text_editor.get("1.0", tk.END).splitlines()
-            original_lines = self.original_text.splitlines()
-
-            # Compare line by line
-            for i, (curr_line, orig_line) in enumerate(zip(current_lines, original_lines)):
-                if curr_line != orig_line:
-                    line_num = i + 1
-                    line_start = f"{line_num}.0"
-                    line_end = f"{line_num}.end"
-                    self.text_editor.tag_add("modified", line_start, line_end)
-
-            # If there are more lines in the current text, mark them as modified
-            if len(current_lines) > len(original_lines):
-                start_line = len(original_lines) + 1
-                for i in range(start_line, len(current_lines) + 1):
-                    line_start = f"{i}.0"
-                    line_end = f"{i}.end"
-                    self.text_editor.tag_add("modified", line_start, line_end)
-        else:
-            # If no original text, highlight everything as modified
-            self.text_editor.tag_add("modified", "1.0", tk.END)
+        for i, is_modified in enumerate(self.line_index.modified, 1):
+            if is_modified:
+                self.text_editor.tag_add("modified", f"{i}.0", f"{i}.end")
 
     def reset_text_color(self):
         self.text_editor.tag_remove("modified", "1.0", tk.END)
@@ -378,17 +434,8 @@ Features:
             return
 
         if self.current_file_path.lower().endswith('.csv'):
-            content = self.text_editor.get(1.0, tk.END)
-            lines = content.splitlines()
-
-            # Check for consistent field count
-            field_counts = []
-            for i, line in enumerate(lines):
-                if line.strip():  # Skip empty lines
-                    fields = line.split(';')
-                    field_counts.append(len(fields))
-
-            if field_counts and len(set(field_counts)) > 1:
+            # Check for consistent field count (histogramme tenu à jour par line_index)
+            if not self.line_index.is_consistent():
                 self.show_error("Warning: Inconsistent number of fields across rows")
             else:
                 self.hide_error()
@@ -397,7 +444,7 @@ Features:
         """Affiche la boîte de dialogue de recherche/remplacement"""
         search_window = tk.Toplevel(self.root)
         search_window.title("Rechercher/Remplacer")
-        search_window.geometry("400x150")
+        search_window.geometry("480x420")
         
         # Frame pour la recherche
         search_frame = ttk.LabelFrame(search_window, text="Rechercher/Remplacer", padding=5)
@@ -406,68 +453,229 @@ Features:
         # Champ de recherche
         ttk.Label(search_frame, text="Rechercher:").grid(row=0, column=0, padx=5, pady=5)
         search_entry = ttk.Entry(search_frame, width=30)
-        search_entry.grid(row=0, column=1, padx=5, pady=5)
+        search_entry.grid(row=0, column=1, columnspan=3, padx=5, pady=5)
         
         # Champ de remplacement
         ttk.Label(search_frame, text="Remplacer par:").grid(row=1, column=0, padx=5, pady=5)
         replace_entry = ttk.Entry(search_frame, width=30)
-        replace_entry.grid(row=1, column=1, padx=5, pady=5)
-        
+        replace_entry.grid(row=1, column=1, columnspan=3, padx=5, pady=5)
+
+        # Options
+        regex_var = tk.BooleanVar(value=False)
+        case_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(search_frame, text="Regex", variable=regex_var).grid(row=2, column=1, sticky=tk.W)
+        ttk.Checkbutton(search_frame, text="Respecter la casse", variable=case_var).grid(row=2, column=2, columnspan=2, sticky=tk.W)
+
+        # Nombre de résultats et liste des correspondances
+        count_var = tk.StringVar(value="0 résultat(s)")
+        ttk.Label(search_window, textvariable=count_var, font=('Arial', 10, 'bold')).pack(anchor=tk.W, padx=10)
+        match_list = tk.Listbox(search_window, height=10)
+        match_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.text_editor.tag_config("search", background="yellow")
+        self.text_editor.tag_config("search_current", background="orange")
+
+        # Etat de la recherche en cours
+        state = {'worker': None, 'matches': [], 'current': -1}
+        MAX_LISTED = 10000  # au-delà, les correspondances sont comptées mais pas listées
+
+        def get_pattern():
+            try:
+                return compile_pattern(search_entry.get(), regex_var.get(), case_var.get())
+            except re.error as e:
+                messagebox.showerror("Regex", f"Expression invalide : {e}", parent=search_window)
+                return None
+
+        def cancel_search():
+            if state['worker'] is not None:
+                state['worker'].cancel()
+                state['worker'] = None
+
         def find_text():
-            search_text = search_entry.get()
-            content = self.text_editor.get("1.0", tk.END)
-            start = "1.0"
-            
-            while True:
-                start = self.text_editor.search(search_text, start, tk.END)
-                if not start:
-                    break
-                end = f"{start}+{len(search_text)}c"
-                self.text_editor.tag_add("search", start, end)
-                start = end
-            
-            self.text_editor.tag_config("search", background="yellow")
-        
+            cancel_search()
+            if not search_entry.get():
+                return
+            pattern = get_pattern()
+            if pattern is None:
+                return
+            self.text_editor.tag_remove("search", "1.0", tk.END)
+            self.text_editor.tag_remove("search_current", "1.0", tk.END)
+            match_list.delete(0, tk.END)
+            state['matches'] = []
+            state['current'] = -1
+
+            # Sans modification non sauvegardée on lit directement le fichier
+            if self.current_file_path and not self.file_modified:
+                file_path = self.current_file_path
+                lines = lambda: file_lines(file_path)
+            else:
+                snapshot = self.text_editor.get("1.0", "end-1c").split('\n')
+                lines = lambda: iter(snapshot)
+
+            worker = SearchWorker(lines, pattern)
+            state['worker'] = worker
+            worker.start()
+            count_var.set("Recherche...")
+            poll_results(worker)
+
+        def poll_results(worker):
+            if state['worker'] is not worker or not search_window.winfo_exists():
+                return
+            done = False
+            try:
+                for _ in range(20):  # nombre de lots traités par passage
+                    batch = worker.results.get_nowait()
+                    if batch is None:
+                        done = True
+                        break
+                    for line_num, start, end in batch:
+                        self.text_editor.tag_add("search", f"{line_num}.{start}", f"{line_num}.{end}")
+                        if len(state['matches']) < MAX_LISTED:
+                            excerpt = self.text_editor.get(f"{line_num}.{max(0, start - 20)}", f"{line_num}.{end + 20}")
+                            match_list.insert(tk.END, f"{line_num}: {excerpt}")
+                        state['matches'].append((line_num, start, end))
+            except queue.Empty:
+                pass
+
+            if done:
+                state['worker'] = None
+                if worker.error is not None:
+                    self.show_error(f"Error searching: {worker.error}")
+                count_var.set(f"{len(state['matches']):,} résultat(s)")
+            else:
+                count_var.set(f"Recherche... {len(state['matches']):,} résultat(s)")
+                search_window.after(50, poll_results, worker)
+
+        def go_to_match(index):
+            matches = state['matches']
+            if not matches:
+                return
+            state['current'] = index % len(matches)
+            line_num, start, end = matches[state['current']]
+            self.text_editor.tag_remove("search_current", "1.0", tk.END)
+            self.text_editor.tag_add("search_current", f"{line_num}.{start}", f"{line_num}.{end}")
+            self.text_editor.mark_set("insert", f"{line_num}.{start}")
+            self.text_editor.see(f"{line_num}.{start}")
+            self.on_scroll()
+            count_var.set(f"{state['current'] + 1:,} / {len(matches):,} résultat(s)")
+            if state['current'] < MAX_LISTED:
+                match_list.selection_clear(0, tk.END)
+                match_list.selection_set(state['current'])
+                match_list.see(state['current'])
+
+        def on_list_select(event=None):
+            selection = match_list.curselection()
+            if selection and selection[0] != state['current']:
+                go_to_match(selection[0])
+
         def replace_text():
-            search_text = search_entry.get()
-            replace_text = replace_entry.get()
-            content = self.text_editor.get("1.0", tk.END)
-            new_content = content.replace(search_text, replace_text)
-            self.text_editor.delete("1.0", tk.END)
-            self.text_editor.insert("1.0", new_content)
-        
-        # Boutons
-        ttk.Button(search_frame, text="Rechercher", command=find_text).grid(row=2, column=0, pady=10)
-        ttk.Button(search_frame, text="Remplacer tout", command=replace_text).grid(row=2, column=1, pady=10)
+            cancel_search()
+            if not search_entry.get():
+                return
+            pattern = get_pattern()
+            if pattern is None:
+                return
+            # Le remplacement se fait sur le fichier : il doit être sauvegardé
+            if self.file_modified or not self.current_file_path:
+                if not messagebox.askyesno("Remplacer tout",
+                                           "Le fichier doit être sauvegardé avant le remplacement. Sauvegarder ?",
+                                           parent=search_window):
+                    return
+                self.save_file()
+                if self.file_modified or not self.current_file_path:
+                    return
+
+            worker = ReplaceWorker(self.current_file_path, pattern, replace_entry.get(), regex_var.get())
+            state['worker'] = worker
+            worker.start()
+            count_var.set("Remplacement...")
+            poll_replace(worker)
+
+        def poll_replace(worker):
+            if worker.is_alive():
+                search_window.after(50, poll_replace, worker)
+                return
+            state['worker'] = None
+            if worker.error is not None:
+                self.show_error(f"Error replacing: {worker.error}")
+                return
+            if worker.result is None:
+                count_var.set("Remplacement annulé")
+                return
+
+            total, changed = worker.result
+            self.text_editor.tag_remove("search", "1.0", tk.END)
+            match_list.delete(0, tk.END)
+            state['matches'] = []
+            if changed is None:
+                # Trop de lignes touchées : on recharge le fichier réécrit
+                self.open_file(self.current_file_path)
+                if self.on_save is not None:
+                    self.on_save(self.current_file_path, None, None)
+            else:
+                blank_lines = list(self.line_index.original_blank)
+                # Seules les lignes modifiées sont remplacées dans l'éditeur
+                for line_num, new_line in changed.items():
+                    self.text_editor.delete(f"{line_num}.0", f"{line_num}.end")
+                    self.text_editor.insert(f"{line_num}.0", new_line)
+                    self.line_index.set_original(line_num - 1, new_line)
+                    self.apply_syntax_highlighting(line_num, line_num)
+                if changed and min(changed) == 1:
+                    self.update_field_headers()
+                    self.apply_syntax_highlighting()
+                self.file_modified = self.line_index.is_modified()
+                if self.current_file_path.lower().endswith('.csv'):
+                    self.validate_csv_format()
+                if changed and self.on_save is not None:
+                    self.on_save(self.current_file_path,
+                                 [(line_num - 1, line_num, [new_line]) for line_num, new_line in changed.items()],
+                                 blank_lines)
+            count_var.set(f"{total:,} remplacement(s)")
+            self.update_status(f"{total:,} remplacement(s) dans {os.path.basename(self.current_file_path)}")
+
+        def on_close():
+            cancel_search()
+            search_window.destroy()
+
+        match_list.bind("<<ListboxSelect>>", on_list_select)
+        search_entry.bind("<Return>", lambda event: find_text())
+        search_window.protocol("WM_DELETE_WINDOW", on_close)
 
-    def apply_syntax_highlighting(self):
-        """Applique la coloration syntaxique pour les fichiers"""
+        # Boutons
+        ttk.Button(search_frame, text="Rechercher", command=find_text).grid(row=3, column=0, pady=10)
+        ttk.Button(search_frame, text="Précédent", command=lambda: go_to_match(max(state['current'], 0) - 1)).grid(row=3, column=1, pady=10)
+        ttk.Button(search_frame, text="Suivant", command=lambda: go_to_match(state['current'] + 1)).grid(row=3, column=2, pady=10)
+        ttk.Button(search_frame, text="Annuler", command=cancel_search).grid(row=3, column=3, pady=10)
+        ttk.Button(search_frame, text="Remplacer tout", command=replace_text).grid(row=4, column=1, columnspan=2, pady=5)
+
+    def apply_syntax_highlighting(self, first=None, last=None):
+        """Applique la coloration syntaxique pour les fichiers (toutes les lignes ou first..last)"""
         if not self.current_file_path:
             return
 
-        # Supprimer tous les tags de coloration existants
+        if first is None:
+            first, last = 1, self.get_line_count()
+        if last < first:
+            return
+
+        # Supprimer les tags de coloration existants sur la plage
         for tag in ["header", "separator", "number", "date", "string", "error"]:
-            self.text_editor.tag_remove(tag, "1.0", tk.END)
+            self.text_editor.tag_remove(tag, f"{first}.0", f"{last}.end")
 
-        content = self.text_editor.get("1.0", tk.END)
-        lines = content.splitlines()
-        
-        if not lines:
-            return
+        lines = self.text_editor.get(f"{first}.0", f"{last}.end").split('\n')
 
         # Pattern pour la reconnaissance des dates (format: dd/mm/yyyy HH:MM:SS)
         date_pattern = r'\d{2}/\d{2}/\d{4}\s\d{2}:\d{2}:\d{2}'
         
         # Colorer l'en-tête (première ligne)
-        first_line = lines[0]
-        line_end = f"1.{len(first_line)}"
-        self.text_editor.tag_add("header", "1.0", line_end)
+        if first == 1:
+            self.text_editor.tag_add("header", "1.0", "1.end")
         
         # Nombre de colonnes attendu (basé sur la première ligne)
-        expected_columns = first_line.count(';') + 1
+        expected_columns = self.text_editor.get("1.0", "1.end").count(';') + 1
         
         # Traiter chaque ligne
-        for i, line in enumerate(lines, 1):
+        for i, line in enumerate(lines, first):
             pos = 0
             in_quotes = False
             current_field = ""
@@ -591,15 +799,26 @@ class Calendar(tk.Toplevel):
         self.destroy() # Destroy the window
 
 class ComparisonWindow:                       
+    MAX_LISTED_EVENTS = 1000  # lignes de la liste des événements
+    EVENT_MARGIN_SECONDS = 30  # marge autour d'un événement sélectionné
+
     @staticmethod
     def lissage(signal_brut,L):
-        res = np.copy(signal_brut) # duplication des valeurs
-        for i in range (1,len(signal_brut)-1): # toutes les valeurs sauf la première et la dernière
-            L_g = min(i,L) # nombre de valeurs disponibles à gauche
-            L_d = min(len(signal_brut)-i-1,L) # nombre de valeurs disponibles à droite
-            Li=min(L_g,L_d)
-            res[i]=np.sum(signal_brut[i-Li:i+Li+1])/(2*Li+1)
-        return res
+        # Moyenne sur 2L+1 points centrés (moins aux extrémités), par sommes cumulées
+        return centered_mean(signal_brut, L)
+
+    def get_smoothing_points(self):
+        try:
+            return max(int(self.input_field.get()), 1)  # fenêtre d'au moins un point
+        except ValueError:
+            return 10
+
+    def rolling_overlay(self, values):
+        """Rolling statistic chosen next to the "Moyenne" checkbox"""
+        return rolling(values, self.get_smoothing_points(), STATISTICS[self.rolling_var.get()])
+
+    def rolling_label(self, label):
+        return f"{self.rolling_var.get()} glissant(e) {label}"
         
     def resources_path(self,relative_path):
         try:
@@ -612,32 +831,32 @@ class ComparisonWindow:
         cal = Calendar(self.window, self.min_time, self.max_time)  # Pass min/max dates
         self.selected_calendar_date = cal.selected_date # Retrieve selected date
         if self.selected_calendar_date:
-            position_slider_start=self.start_slider.get()  
-            old_start_date= self.min_time + pd.Timedelta(seconds=int(position_slider_start))
-
             date_object = datetime.combine(self.selected_calendar_date, time(0, 0, 0))                     
-            new_start_date = date_object + pd.Timedelta(seconds=int(0))
-                       
-            # si la date selectionnée calendrier est inférieure à la date de début des données
-            if (new_start_date-self.min_time).total_seconds() < 0:
-                new_start_date = self.min_time
-                            
-            # nombre de secondes entre le début des données et la date selectionnée dans le calendrier
-            diff_begin_seconds = int((new_start_date-self.min_time).total_seconds())
-                          
-            # date selectionnée dans le calendrier plus 24 heures en secondes
-            new_end_date = date_object + pd.Timedelta(seconds=int(24*3600-1))
-            diff_end_seconds = int((new_end_date - new_start_date).total_seconds()) 
-                       
-            # si la date selectionnée calendrier est supérieure à la date de fin des données alors on deplace slider end d'abord (et inversement)
-            if (new_start_date - old_start_date).total_seconds() < 0:         
-                self.start_slider.set(diff_begin_seconds) 
-                self.end_slider.set(diff_begin_seconds + diff_end_seconds)
-            else:
-                self.end_slider.set(diff_begin_seconds + diff_end_seconds)
-                self.start_slider.set(diff_begin_seconds)                                        
+            # date selectionnée dans le calendrier plus 24 heures
+            self.set_time_range(date_object, date_object + pd.Timedelta(seconds=int(24*3600-1)))
+
+    def set_time_range(self, new_start_date, new_end_date):
+        """Move the time sliders to show new_start_date .. new_end_date"""
+        position_slider_start=self.start_slider.get()  
+        old_start_date= self.min_time + pd.Timedelta(seconds=int(position_slider_start))
+                   
+        # si la date demandée est inférieure à la date de début des données
+        if (new_start_date-self.min_time).total_seconds() < 0:
+            new_start_date = self.min_time
+                        
+        # nombre de secondes entre le début des données et la date demandée
+        diff_begin_seconds = int((new_start_date-self.min_time).total_seconds())
+        diff_end_seconds = int((new_end_date - new_start_date).total_seconds()) 
+                   
+        # si la date demandée est supérieure à la date de début affichée alors on deplace slider end d'abord (et inversement)
+        if (new_start_date - old_start_date).total_seconds() < 0:         
+            self.start_slider.set(diff_begin_seconds) 
+            self.end_slider.set(diff_begin_seconds + diff_end_seconds)
+        else:
+            self.end_slider.set(diff_begin_seconds + diff_end_seconds)
+            self.start_slider.set(diff_begin_seconds)                                        
                     
-    def __init__(self, parent, data, plot_type):
+    def __init__(self, parent, dataset, plot_type):
         
         # Inside ComparisonWindow's __init__:
         self.selected_calendar_date = None
@@ -657,10 +876,19 @@ class ComparisonWindow:
         # Keep a reference to prevent garbage collection
         self.photo = photo
 
-        # Store data and type
-        self.data = data.copy()  # Make a copy to prevent modifications to original data
-        self.filtered_data = self.data.copy()
+        # Store data and type (les données sont partagées entre les fenêtres, elles ne sont pas modifiées ici)
+        self.dataset = dataset
         self.plot_type = plot_type
+        self.dataset.ensure_columns(self.get_column_names())
+        self.data = dataset.data
+        self.filtered_data = self.data
+        self.filter_key = None  # filtres de valeurs de filtered_data
+        # Résultats des vues récentes (lignes, statistiques, courbes), voir update_plot
+        self.view_cache = LRUCache()
+        # Événements des colonnes de la fenêtre (creux de tension, surintensités...)
+        self.events = EventDetector(self.event_rules(), gap_ns=self.dataset.quality().gap_ns)
+        self.events.update(self.data)
+        self.distribution_window = None  # histogrammes de la plage affichée
         
         # Checkbox for adding all phases data (only for Current and Power windows)
         if self.plot_type in ["Current", "Power"]:
@@ -668,17 +896,8 @@ class ComparisonWindow:
             self.all_phases_var.trace_add('write', lambda *args: self.on_phase_toggle())                  
 
         try:
-            # Convert time column           
-            self.data['time'] = pd.to_datetime(self.data['time'], format='%d/%m/%Y %H:%M:%S')
-
-            # Get time range
-            self.min_time = self.data['time'].min()
-            self.max_time = self.data['time'].max()
-            self.total_seconds = int((self.max_time - self.min_time).total_seconds())
-
-            # Calculate global value across all phases
-            self.global_min = self.data[self.get_column_names()].min().min()
-            self.global_max = self.data[self.get_column_names()].max().max()
+            # Get time range and global value across all phases
+            self.compute_ranges()
 
             # Initialize GUI components
             self.initialize_gui()
@@ -688,6 +907,59 @@ class ComparisonWindow:
             self.window.destroy()
             raise
 
+        # Rafraîchissement quand les données partagées sont modifiées (éditeur)
+        self.dataset.add_listener(self.on_data_changed)
+        self.window.bind("<Destroy>", self.on_destroy)
+
+    def compute_ranges(self):
+        """Time range and global value range of the data"""
+        self.min_time = self.data['time'].min()
+        self.max_time = self.data['time'].max()
+        self.total_seconds = int((self.max_time - self.min_time).total_seconds())
+
+        self.global_min = self.data[self.get_column_names()].min().min()
+        self.global_max = self.data[self.get_column_names()].max().max()
+
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.dataset.remove_listener(self.on_data_changed)
+
+    def on_data_changed(self, dataset):
+        """Redraw with the new rows, keeping the current time range and value filters"""
+        start_time = pd.to_datetime(self.start_var.get())
+        end_time = pd.to_datetime(self.end_var.get())
+        lower_val = self.min_slider.get()
+        upper_val = self.max_slider.get()
+
+        self.data = dataset.data
+        self.view_cache.clear()  # résultats des anciennes lignes
+        self.compute_ranges()
+
+        # Sliders de temps : mêmes instants, bornés aux nouvelles données
+        self.start_slider.configure(to=self.total_seconds)
+        self.end_slider.configure(to=self.total_seconds)
+        start_seconds = min(max(int((start_time - self.min_time).total_seconds()), 0), self.total_seconds)
+        end_seconds = min(max(int((end_time - self.min_time).total_seconds()), 0), self.total_seconds)
+        self.end_slider.set(self.total_seconds)
+        self.start_slider.set(start_seconds)
+        self.end_slider.set(end_seconds)
+
+        # Sliders de valeurs : mêmes filtres
+        min_val, max_val = self.get_visible_value()
+        self.max_slider.configure(from_=max_val, to=min_val)
+        self.min_slider.configure(from_=max_val, to=min_val)
+        self.max_slider.set(upper_val)
+        self.min_slider.set(lower_val)
+
+        # Les redessins des sliders ont gardé des lignes de l'ancien filtrage
+        # sous la nouvelle version : on repart d'un cache vide
+        self.view_cache.clear()
+        self.update_filtered_data()
+
+        # Lignes ajoutées : seules les nouvelles lignes sont analysées
+        self.events.update(dataset.data, dataset.unchanged_rows)
+        self.refresh_event_list()
+
     def initialize_gui(self):
         """Initialize all GUI components in the correct order"""
         # Main container
@@ -698,6 +970,11 @@ class ComparisonWindow:
         self.controls_frame = ttk.Frame(self.main_frame)
         self.controls_frame.pack(fill=tk.X, side=tk.TOP)
 
+        # Barre d'état (exports) puis liste des événements sous la courbe
+        self.status_bar = ttk.Label(self.main_frame, text="", relief=tk.SUNKEN)
+        self.status_bar.pack(fill=tk.X, side=tk.BOTTOM)
+        self.create_event_list(self.main_frame)
+
         self.plot_frame = ttk.Frame(self.main_frame)
         self.plot_frame.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
 
@@ -720,6 +997,11 @@ class ComparisonWindow:
         try:
             self.fig = Figure(figsize=(10, 8))
             self.ax = self.fig.add_subplot(111)
+            self.derived_ax = None  # second axe de la série dérivée
+            # Rendu rapide : image numpy affichée dans un Canvas Tk (raster.py)
+            self.raster = None
+            self.raster_canvas = None
+            self.raster_photo = None
 
             self.canvas = FigureCanvasTkAgg(self.fig, self.plot_frame)
             self.canvas.draw()
@@ -768,6 +1050,37 @@ class ComparisonWindow:
         
         # Checkboxes
         self.create_checkboxes(time_frame)        
+
+        # Résolution des courbes : mesures brutes ou moyennes par intervalle
+        resolution_frame = ttk.Frame(time_frame)
+        resolution_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(resolution_frame, text="Résolution:", font=('Arial', 10)).pack(side=tk.LEFT, padx=(1,5))
+        self.resolution_var = tk.StringVar(value="Brut")
+        resolution_box = ttk.Combobox(resolution_frame, textvariable=self.resolution_var,
+                                      values=["Brut"] + list(RESOLUTIONS), state="readonly", width=8)
+        resolution_box.pack(side=tk.LEFT)
+        resolution_box.bind("<<ComboboxSelected>>", lambda event: self.on_phase_toggle())
+
+        # Série calculée (derived.REGISTRY) tracée sur un second axe
+        ttk.Label(resolution_frame, text="Série dérivée:", font=('Arial', 10)).pack(side=tk.LEFT, padx=(15,5))
+        self.derived_names = {metric.title: name for name, metric in REGISTRY.items()}
+        self.derived_var = tk.StringVar(value="Aucune")
+        derived_box = ttk.Combobox(resolution_frame, textvariable=self.derived_var,
+                                   values=["Aucune"] + list(self.derived_names), state="readonly", width=30)
+        derived_box.pack(side=tk.LEFT)
+        derived_box.bind("<<ComboboxSelected>>", lambda event: self.on_phase_toggle())
+        ttk.Button(resolution_frame, text="Distribution...", command=self.open_distribution).pack(side=tk.LEFT, padx=(15,5))
+        ttk.Button(resolution_frame, text="Export sélection...", command=self.export_range).pack(side=tk.LEFT, padx=5)
+        self.fast_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(resolution_frame, text="Rendu rapide", variable=self.fast_var,
+                        command=self.on_render_mode).pack(side=tk.LEFT, padx=5)
+
+        # Énergie par période tarifaire (plages de tariff.json)
+        if self.plot_type == "Power":
+            self.tariff_schedule = TariffSchedule.load()
+            self.tariff_var = tk.StringVar(value="")
+            ttk.Label(resolution_frame, textvariable=self.tariff_var, font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=15)
+            ttk.Button(resolution_frame, text="Export tarifs...", command=self.export_tariffs).pack(side=tk.LEFT, padx=5)
         
     def create_checkboxes(self, parent):
         # *******************************Checkboxes Frame in time_frame-> visibility_frame
@@ -811,6 +1124,13 @@ class ComparisonWindow:
         # Create colored label next to checkbox
         color_label = ttk.Label(visibility_frame, text="■", foreground="purple")
         color_label.pack(side=tk.LEFT, padx=(0, 10))  
+        
+        # Statistique glissante tracée : moyenne, min, max, écart-type, percentiles...
+        self.rolling_var = tk.StringVar(value="Moyenne")
+        rolling_box = ttk.Combobox(visibility_frame, textvariable=self.rolling_var, values=list(STATISTICS),
+                                   state="readonly", width=11)
+        rolling_box.pack(side=tk.LEFT, padx=(1,1))
+        rolling_box.bind("<<ComboboxSelected>>", lambda event: self.on_phase_toggle())
                                     
                                     
         self.input_field = ttk.Entry(visibility_frame,width=4,textvariable="n")
@@ -891,12 +1211,7 @@ class ComparisonWindow:
 
     def get_column_names(self):
         """Get the column names based on plot type"""
-        if self.plot_type == "Voltage":
-            return ["voltagemoy1", "voltagemoy2", "voltagemoy3", "voltagemoy4"]
-        elif self.plot_type == "Current":
-            return ["currentmoy1", "currentmoy2", "currentmoy3", "currentmoy4"]
-        else:  # Power
-            return ["powermoy1", "powermoy2", "powermoy3", "powermoy4"]
+        return comparison_columns(self.plot_type)
 
     def on_min_slide(self, value):
         """Handle minimum slider movement"""
@@ -924,12 +1239,15 @@ class ComparisonWindow:
         columns = [self.get_filter_column(phase=phase[-1]) for phase in self.selected_phases]
         
         # Filter the data for each selected phase
-        filtered_data = self.data.copy()       
-                    
-        for column in columns:
-            filtered_data = filtered_data[(filtered_data[column] >= min_val) & (filtered_data[column] <= max_val)]
-            
-        self.filtered_data = filtered_data
+        def filter_rows():
+            keep = np.ones(len(self.data), dtype=bool)
+            for column in columns:
+                keep &= ((self.data[column] >= min_val) & (self.data[column] <= max_val)).to_numpy()
+            return self.keep_rows(self.data, keep)
+
+        self.filter_key = (min_val, max_val, tuple(columns))
+        self.filtered_data = self.view_cache.memo((self.dataset.version, 'filter') + self.filter_key, filter_rows,
+                                                  self.cached_bytes)
         
         # Update max and min values                                 
         self.max_value_var.set(f"Max: {float(max_val):.2f}")
@@ -940,6 +1258,8 @@ class ComparisonWindow:
     def update_plot(self):
         """Update the plot with current time range"""
         try:
+            started = perf_counter()
+            ax = self.plot_axes()
             # Get time range
             start_time = pd.to_datetime(self.start_var.get())
             end_time = pd.to_datetime(self.end_var.get())
@@ -948,9 +1268,13 @@ class ComparisonWindow:
             time_elapsed = end_time - start_time
             self.time_elapsed_var.set(f"Time Elapsed: {time_elapsed}")
 
-            # Filter data
-            mask = (self.filtered_data['time'] >= start_time) & (self.filtered_data['time'] <= end_time)
-            plot_data = self.filtered_data.loc[mask]
+            # Filter data (résultats de la vue gardés : version, filtres et plage)
+            view = (self.dataset.version, self.filter_key, start_time, end_time)
+            memo = lambda key, compute: self.view_cache.memo(view + key, compute)
+            plot_data = self.view_cache.memo(view + ('rows',), lambda: self.keep_rows(self.filtered_data, (
+                (self.filtered_data['time'] >= start_time) & (self.filtered_data['time'] <= end_time)).to_numpy()),
+                self.cached_bytes)
+            self.update_distribution(plot_data)
 
             if plot_data.empty:
                 self.points_var.set("Points: 0")
@@ -961,7 +1285,7 @@ class ComparisonWindow:
             self.points_var.set(f"Points: {num_points:,}")
 
             # Clear plot
-            self.ax.clear()
+            ax.clear()
 
             # Plot data for each phase
             columns = self.get_column_names()
@@ -969,20 +1293,35 @@ class ComparisonWindow:
             labels = ['Phase 1', 'Phase 2', 'Phase 3','Phase 4']
             
             total_energy = 0 # Initialisation de total_energy
+            gap_ns = self.dataset.quality().gap_ns  # les courbes sont coupées aux trous
+
+            # Courbes rééchantillonnées (moyenne par intervalle) si une résolution est choisie
+            seconds = RESOLUTIONS.get(self.resolution_var.get())
+            # Courbes brutes réduites à la largeur du tracé (min et max de chaque colonne de pixels)
+            width = self.plot_width(ax)
+            line_points = lambda values: decimate(plot_data['time'].to_numpy(), values, max(width, 100), gap_ns)
+            profile = memo(('profile', seconds), lambda: resample(plot_data, columns, seconds, gap_ns)) if seconds else None
 
             for col, color, label in zip(columns, colors, labels):
                 if self.phase_visibility[label].get():  # Only plot if phase is visible
                     # Plot the line
-                    self.ax.plot(plot_data['time'], plot_data[col], 
-                                color=color, label=label, linewidth=1)
+                    if profile is None:
+                        ax.plot(*memo(('raw_line', col, width), lambda: line_points(plot_data[col].to_numpy())),
+                                    color=color, label=label, linewidth=1)
+                    else:
+                        ax.plot(*memo(('profile_line', col, seconds),
+                                      lambda: with_breaks(profile['time'], profile[col], seconds * 1e9)),
+                                    color=color, label=f"{label} ({self.resolution_var.get()})",
+                                    linewidth=1, drawstyle='steps-post')
+                    stats = memo(('stats', col), lambda: self.column_stats(plot_data, col, gap_ns))
                     
                     # Calculate and display average 
-                    avg_value = plot_data[col].mean()                        
+                    avg_value = stats['avg']
                     # Add horizontal line for average
-                    self.ax.axhline(y=avg_value, color=color, linestyle='--', alpha=0.5)
+                    ax.axhline(y=avg_value, color=color, linestyle='--', alpha=0.5)
 
                     # Add text annotation for average
-                    self.ax.annotate(
+                    ax.annotate(
                         f'Avg {label}: {avg_value:.2f}',
                         xy=(0.02, 0.98 - (0.05 * list(columns).index(col))),  # Position text at top-left, stacked
                         xycoords='axes fraction',
@@ -992,26 +1331,19 @@ class ComparisonWindow:
                     )
                     
                     # Mise  à jour les labels Max and Min                                
-                    max_idx = plot_data[col].idxmax()  # This returns the index du maximum dans la colone col
-                    max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
-                    datetime_str = max_time.strftime('%d/%m %H:%M:%S')             
-                    self.max_value_var.set(f"Max: {float(plot_data[col].max()):.2f}"+f" ({datetime_str})"+f" ({max_idx})")   
+                    datetime_str = stats['max_time'].strftime('%d/%m %H:%M:%S')             
+                    self.max_value_var.set(f"Max: {stats['max']:.2f}"+f" ({datetime_str})"+f" ({stats['max_idx']})")   
                      
-                    self.ax.plot(max_time, plot_data[col].max(), 'o', color=color, markeredgecolor='black', markerfacecolor='purple', markersize=6)                     
+                    ax.plot(stats['max_time'], stats['max'], 'o', color=color, markeredgecolor='black', markerfacecolor='purple', markersize=6)                     
                                             
-                    min_idx = plot_data[col].idxmin()  # This returns the index label
-                    min_time = plot_data['time'].loc[min_idx]  # Use .loc to access by index label instead of position
-                    datetime_str = min_time.strftime('%d/%m %H:%M:%S') 
-                    self.min_value_var.set(f"Min: {float(plot_data[col].min()):.2f}"+f" ({datetime_str})"+f" ({min_idx})")  
+                    datetime_str = stats['min_time'].strftime('%d/%m %H:%M:%S') 
+                    self.min_value_var.set(f"Min: {stats['min']:.2f}"+f" ({datetime_str})"+f" ({stats['min_idx']})")  
                       
-                    self.ax.plot(min_time, plot_data[col].min(), 'o', color=color, markeredgecolor='black', markerfacecolor='yellow', markersize=6)                                                                               
+                    ax.plot(stats['min_time'], stats['min'], 'o', color=color, markeredgecolor='black', markerfacecolor='yellow', markersize=6)                                                                               
             
                     # Calculate energy for the phase
                     if self.plot_type=="Power":
-                        time_sec = plot_data['time'].astype(np.int64) / 1e9  # Convert nanoseconds to seconds
-                        time_diff = np.diff(time_sec)  # Compute time differences (in seconds)
-                        power_values = plot_data[col].values
-                        energy = np.sum((power_values[:-1] + power_values[1:]) / 2 * time_diff) / 3600000  # Convert to kWh
+                        energy = stats['energy']  # trous exclus
                         if col!="powermoy4":
                             total_energy += energy
                         else:
@@ -1019,36 +1351,263 @@ class ComparisonWindow:
                 # ****************************************Ajout du tracé moyenne glissante
                 # Calculate and display average  
                     if self.mean_var.get():  
-                        nombre_points=int(self.input_field.get())
-                        signal_lisse = self.lissage(plot_data[col],nombre_points)
-            
-                        self.ax.plot(plot_data['time'], signal_lisse, 
-                                color="purple", label="moyenne glissante"+label, linewidth=1.5)
+                        smoothing = (self.rolling_var.get(), self.get_smoothing_points())
+                        ax.plot(*memo(('rolling', col, width) + smoothing,
+                                      lambda: line_points(self.rolling_overlay(plot_data[col]))),
+                                color="purple", label=self.rolling_label(label), linewidth=1.5)
                             
                 if self.plot_type=="Power":
-                    self.energy_var.set(f"Energy: {total_energy:.2f} kWh")
+                    gaps = memo(('gaps',), lambda: len(gap_breaks(plot_data['time'], gap_ns)))
+                    self.energy_var.set(f"Energy: {total_energy:.2f} kWh" + (f" ({gaps} trou(s) exclus)" if gaps else ""))
+                    self.tariff_var.set(memo(('tariff',) + tuple(self.tariff_columns()), lambda: self.tariff_text(plot_data, start_time, end_time, gap_ns)))
                                                        
                 # Configure plot
-                self.ax.set_title(f'{self.plot_type} Comparison - All Phases')
+                ax.set_title(f'{self.plot_type} Comparison - All Phases')
             
-            self.ax.set_ylabel(f'{self.plot_type} ' + 
+            # Série dérivée (déséquilibre, courant de neutre...) sur un second axe
+            self.plot_derived(ax, plot_data, seconds, gap_ns, memo, width)
+
+            ax.set_ylabel(f'{self.plot_type} ' + 
                              ('(V)' if self.plot_type == 'Voltage' else 
                               '(A)' if self.plot_type == 'Current' else '(W)'))
-            self.ax.grid(True)
-            self.ax.legend()
+            ax.grid(True)
+            ax.legend()
 
-            # Format x-axis
-            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
-            self.ax.tick_params(axis='x', rotation=30,  labelsize=8)     
+            if ax is self.raster:
+                self.show_raster()
+                mode = "Rendu rapide"
+            else:
+                # Format x-axis
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
+                ax.tick_params(axis='x', rotation=30,  labelsize=8)     
 
-            # Update display
-            self.fig.tight_layout()
-            self.canvas.draw()
+                # Update display
+                self.fig.tight_layout()
+                self.canvas.draw()
+                mode = "Tracé"
+            self.status_bar.config(text=f"{mode} : {1000 * (perf_counter() - started):.0f} ms "
+                                        f"({num_points:,} points) - {self.view_cache.summary()}")
 
         except Exception as e:
             # messagebox.showerror("Plot Error", f"Error creating plot: {str(e)}")
             raise
         
+    def plot_axes(self):
+        """Axes drawn by update_plot: matplotlib, or the raster image in
+        "Rendu rapide" mode"""
+        return self.raster if self.raster is not None and self.fast_var.get() else self.ax
+
+    def on_render_mode(self):
+        """Switch between the matplotlib figure and the raster image"""
+        if self.fast_var.get():
+            if self.raster is None:
+                self.raster = RasterAxes()
+                self.raster_canvas = tk.Canvas(self.plot_frame, background='white', highlightthickness=0)
+                self.raster_canvas.bind("<Configure>", self.on_raster_resize)
+            self.canvas.get_tk_widget().pack_forget()
+            self.raster_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        else:
+            self.raster_canvas.pack_forget()
+            self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.update_plot()
+
+    def on_raster_resize(self, event):
+        if (event.width, event.height) != (self.raster.width, self.raster.height):
+            self.update_plot()  # courbes réduites à la nouvelle largeur
+
+    def plot_width(self, ax):
+        """Pixel columns of the plot: the raw curves are reduced to them"""
+        if ax is self.raster:
+            self.raster.resize(self.raster_canvas.winfo_width(), self.raster_canvas.winfo_height())
+            return self.raster.width
+        return int(ax.bbox.width)
+
+    def show_raster(self):
+        """Draw the raster axes into the single PhotoImage of the window"""
+        image = self.raster.render()
+        if self.raster_photo is not None and (self.raster_photo.width(), self.raster_photo.height()) == image.size:
+            self.raster_photo.paste(image)
+        else:
+            self.raster_photo = ImageTk.PhotoImage(image)
+            self.raster_canvas.delete("all")
+            self.raster_canvas.create_image(0, 0, anchor=tk.NW, image=self.raster_photo)
+
+    @staticmethod
+    def keep_rows(frame, keep):
+        """Rows of frame where keep is True; frame itself (no copy) when all are kept"""
+        return frame if keep.all() else frame.loc[keep]
+
+    def cached_bytes(self, frame):
+        """Memory of a cached frame: nothing when it is the loaded rows themselves"""
+        return 0 if frame is self.data else nbytes(frame)
+
+    def column_stats(self, plot_data, col, gap_ns):
+        """Average, dated Max and Min and energy (Power) of a column of the rows shown"""
+        values = plot_data[col]
+        max_idx = values.idxmax()  # This returns the index du maximum dans la colone col
+        min_idx = values.idxmin()
+        stats = {'avg': values.astype(np.float64).mean(),  # float64 même en mode compact
+                 'max': float(values.max()), 'max_idx': max_idx, 'max_time': plot_data['time'].loc[max_idx],
+                 'min': float(values.min()), 'min_idx': min_idx, 'min_time': plot_data['time'].loc[min_idx]}
+        if self.plot_type == "Power":
+            times_ns = plot_data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            stats['energy'] = trapezoid_energy(times_ns, values, gap_ns) / JOULES_PER_KWH
+        return stats
+
+    def plot_derived(self, ax, plot_data, seconds, gap_ns, memo, width):
+        """Plot the selected derived series over the rows shown, raw or
+        resampled like the phases (points kept by memo, see update_plot)"""
+        if self.derived_ax is not None:
+            self.derived_ax.remove()
+            self.derived_ax = None
+        name = self.derived_names.get(self.derived_var.get())
+        if name is None:
+            return
+        metric = REGISTRY[name]
+
+        def derived_points():
+            # Valeurs calculées une fois pour toutes les lignes, prises aux lignes affichées
+            values = derived_values(self.dataset, name)[self.data.index.get_indexer(plot_data.index)]
+            series = pd.DataFrame({'time': plot_data['time'].to_numpy(), name: values})
+            label = f"{metric.label} (moy. {np.nanmean(values):.2f})"
+            if seconds:
+                profile = resample(series, [name], seconds, gap_ns)
+                return with_breaks(profile['time'], profile[name], seconds * 1e9), label
+            return decimate(series['time'].to_numpy(), values, max(width, 100), gap_ns), label
+
+        points, label = memo(('derived', name, seconds, width), derived_points)
+        self.derived_ax = ax.twinx()
+        self.derived_ax.plot(*points, color='darkorange', label=label, linewidth=1, alpha=0.7,
+                             drawstyle='steps-post' if seconds else 'default')
+        self.derived_ax.set_ylabel(metric.title)
+        self.derived_ax.legend(loc='upper right')
+
+    def open_distribution(self):
+        """Histograms and duration curve of the rows shown, following the sliders"""
+        if self.distribution_window is not None:
+            self.distribution_window.window.lift()
+            return
+        self.distribution_window = DistributionWindow(self.window, self.dataset, self.plot_type,
+                                                      on_close=self.on_distribution_close)
+        self.update_plot()
+
+    def on_distribution_close(self):
+        self.distribution_window = None
+
+    def row_mask(self, rows_data):
+        """Boolean mask over all the rows of the rows in rows_data"""
+        rows = np.zeros(len(self.data), dtype=bool)
+        rows[self.data.index.get_indexer(rows_data.index)] = True
+        return rows
+
+    def update_distribution(self, plot_data):
+        if self.distribution_window is None:
+            return
+        rows = self.row_mask(plot_data)
+        columns = [col for col, label in zip(self.get_column_names(), self.phase_visibility)
+                   if self.phase_visibility[label].get()]
+        self.distribution_window.show(rows, columns)
+
+    def export_range(self):
+        """Write the rows of the time range and value filters to a file, with
+        the derived series and at the resolution shown"""
+        path = filedialog.asksaveasfilename(parent=self.window, title="Export de la sélection",
+                                            defaultextension=".parquet", filetypes=FILE_TYPES)
+        if not path:
+            return
+        # Filtres de valeurs : seules les lignes retenues sont écrites
+        keep = self.row_mask(self.filtered_data) if len(self.filtered_data) < len(self.data) else None
+        name = self.derived_names.get(self.derived_var.get())
+        resolution = self.resolution_var.get() if self.resolution_var.get() in RESOLUTIONS else None
+        try:
+            result = export_selection(self.dataset, path, pd.to_datetime(self.start_var.get()),
+                                      pd.to_datetime(self.end_var.get()), self.get_column_names(), keep,
+                                      [name] if name else [], resolution)
+        except (ImportError, ValueError, OSError) as e:
+            messagebox.showerror("Export Error", str(e), parent=self.window)
+            return
+        self.status_bar.config(text=result.summary())
+
+    def event_rules(self):
+        """Event kinds shown by the window (events.EVENT_RULES of its columns)"""
+        return [rule for rule in EVENT_RULES if rule.prefix == PLOT_PREFIXES[self.plot_type]]
+
+    def create_event_list(self, parent):
+        """List of the detected events; selecting one shows it"""
+        self.events_frame = ttk.LabelFrame(parent, text="Événements", padding="5")
+        self.events_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=5, pady=5)
+        columns = ("start", "duration", "phase", "event", "peak")
+        self.event_tree = ttk.Treeview(self.events_frame, columns=columns, show="headings", height=5)
+        for col, title, width in zip(columns, ("Début", "Durée (s)", "Phase", "Événement", "Pointe"),
+                                     (160, 80, 60, 160, 100)):
+            self.event_tree.heading(col, text=title)
+            self.event_tree.column(col, width=width, anchor=tk.W)
+        scrollbar = ttk.Scrollbar(self.events_frame, orient=tk.VERTICAL, command=self.event_tree.yview)
+        self.event_tree.configure(yscrollcommand=scrollbar.set)
+        self.event_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.event_tree.bind("<<TreeviewSelect>>", self.on_event_select)
+        self.refresh_event_list()
+
+    def refresh_event_list(self):
+        """Show the most recent events (at most MAX_LISTED_EVENTS)"""
+        table = self.events.table()
+        self.event_table = table.iloc[-self.MAX_LISTED_EVENTS:]
+        shown = f", {len(self.event_table):,} derniers affichés" if len(table) > len(self.event_table) else ""
+        self.events_frame.config(text=f"Événements ({len(table):,}{shown})")
+        self.event_tree.delete(*self.event_tree.get_children())
+        for i, row in enumerate(self.event_table.itertuples()):
+            self.event_tree.insert("", tk.END, iid=str(i), values=(
+                row.start.strftime('%d/%m/%Y %H:%M:%S'), f"{row.duration:g}" + (" +" if row.open else ""),
+                row.phase, row.event, f"{row.peak:.2f}"))
+
+    def on_event_select(self, event=None):
+        """Move the time sliders to the selected event, with a margin around it"""
+        selection = self.event_tree.selection()
+        if not selection:
+            return
+        row = self.event_table.iloc[int(selection[0])]
+        margin = pd.Timedelta(seconds=max(self.EVENT_MARGIN_SECONDS, row['duration']))
+        self.set_time_range(row['start'] - margin, row['end'] + margin)
+
+    def tariff_columns(self):
+        """Power columns counted in the energy label: phase 4 (total) if visible,
+        else the visible phases"""
+        if self.phase_visibility['Phase 4'].get():
+            return ["powermoy4"]
+        return [f"powermoy{phase}" for phase in range(1, 4) if self.phase_visibility[f'Phase {phase}'].get()]
+
+    def tariff_text(self, plot_data, start_time, end_time, gap_ns):
+        """Energy of the time range per tariff, over the rows kept by the
+        value filters like the Energy label"""
+        columns = self.tariff_columns()
+        if not columns:
+            return ""
+        if self.filtered_data is self.data:
+            # Sans filtre : énergie cumulée gardée par le dataset
+            table = dataset_breakdown(self.dataset, self.tariff_schedule, start_time, end_time, columns,
+                                      max_step_ns=gap_ns)
+        else:
+            times = plot_data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            curves = {col: EnergyCurve(times, plot_data[col].to_numpy(), gap_ns) for col in columns}
+            table = breakdown(curves, self.tariff_schedule, start_time, end_time)
+        totals = table[[f"{col}_kwh" for col in columns]].sum(axis=1)
+        return " | ".join(f"{name} {total:.2f} kWh" for name, total in zip(table['tariff'], totals))
+
+    def export_tariffs(self):
+        """Save the energy of each phase per day and tariff over the time range"""
+        file_path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                                 filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            table = dataset_breakdown(self.dataset, self.tariff_schedule, pd.to_datetime(self.start_var.get()),
+                                      pd.to_datetime(self.end_var.get()), by="Jour",
+                                      max_step_ns=self.dataset.quality().gap_ns)
+            export_breakdown(table, file_path)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Error exporting tariffs: {str(e)}")
+
     def on_start_slide(self, value):
         """Handle start slider movement"""
         # self.min_time = self.data['time'].min()       
@@ -1132,6 +1691,555 @@ class ComparisonWindow:
         self.update_plot()
 
 
+class AnimationDriver:
+    """Appelle draw_frame à cadence fixe, indépendamment de l'arrivée des données"""
+
+    def __init__(self, widget, draw_frame, fps=5):
+        self.widget = widget
+        self.draw_frame = draw_frame
+        self.fps = fps
+        self.running = False
+
+    def set_fps(self, fps):
+        self.fps = min(max(fps, 0.5), 60)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.widget.after(0, self.tick)
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        if not self.running or not self.widget.winfo_exists():
+            return
+        start = perf_counter()
+        self.draw_frame()
+        # Le temps de rendu est déduit de la période pour tenir la cadence
+        elapsed_ms = (perf_counter() - start) * 1000
+        self.widget.after(max(1, int(1000 / self.fps - elapsed_ms)), self.tick)
+
+
+class LiveComparisonWindow(ComparisonWindow):
+    """Comparaison en direct : les N dernières minutes reçues du microcontrôleur.
+
+    Rows are read from the ring buffer once per frame and appended to the
+    window (stats_engine.WindowStats: labels and markers follow the rows shown
+    without going over them again), the persistent lines are redrawn by
+    blitting. When the x-axis scrolls or the values leave the y range, only
+    the limits change and the background is drawn again.
+    """
+
+    X_MARGIN = 0.1  # marge à droite (fraction de la fenêtre) avant défilement
+
+    def __init__(self, parent, receiver, plot_type, minutes=10, fps=5):
+        self.receiver = receiver
+        self.buffer = receiver.buffer
+        self.plot_type = plot_type
+        self.selected_calendar_date = None
+
+        # Create window
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"{plot_type} Live - All Phases")
+        self.window.geometry("1200x800")
+
+        decoded_data = base64.b64decode(resources.bolt64x64)
+        self.image = Image.open(io.BytesIO(decoded_data))
+        self.photo = ImageTk.PhotoImage(self.image)
+        self.window.iconphoto(False, self.photo)
+
+        self.minutes_var = tk.StringVar(value=str(minutes))
+        self.fps_var = tk.StringVar(value=str(fps))
+        self.animated = []
+        self.background = None
+
+        # Seuil des trous des fichiers : l'énergie n'est pas intégrée sur les coupures
+        self.cursor, times, values = self.buffer.read_since(0)
+        self.gap_ns = gap_threshold(np.diff(times))[0]
+        # Événements depuis le début de la réception, complétés à chaque image
+        self.events = EventDetector(self.event_rules())
+        self.events.feed(times, values)
+        self.recent = self.new_window()
+        self.append_rows(times, values)
+
+        self.initialize_gui()
+        self.update_plot()
+        self.driver = AnimationDriver(self.window, self.draw_frame, fps)
+        self.driver.start()
+
+    def initialize_gui(self):
+        """Plot, live controls and phase checkboxes (no time or value sliders)"""
+        self.main_frame = ttk.Frame(self.window)
+        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.controls_frame = ttk.Frame(self.main_frame)
+        self.controls_frame.pack(fill=tk.X, side=tk.TOP)
+
+        self.plot_frame = ttk.Frame(self.main_frame)
+        self.plot_frame.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+
+        live_frame = ttk.LabelFrame(self.controls_frame, text="Direct", padding="5")
+        live_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        entry_frame = ttk.Frame(live_frame)
+        entry_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(entry_frame, text="Dernières minutes:").pack(side=tk.LEFT, padx=5)
+        minutes_entry = ttk.Entry(entry_frame, textvariable=self.minutes_var, width=6)
+        minutes_entry.pack(side=tk.LEFT, padx=5)
+        minutes_entry.bind("<Return>", lambda event: self.on_window_change())
+        ttk.Label(entry_frame, text="Images/s:").pack(side=tk.LEFT, padx=5)
+        fps_entry = ttk.Entry(entry_frame, textvariable=self.fps_var, width=4)
+        fps_entry.pack(side=tk.LEFT, padx=5)
+        fps_entry.bind("<Return>", lambda event: self.on_fps_change())
+
+        self.points_var = tk.StringVar(value="Points: 0")
+        ttk.Label(entry_frame, textvariable=self.points_var, font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=15)
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(entry_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=15)
+
+        self.create_event_list(self.main_frame)
+        self.create_plot()
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.create_checkboxes(live_frame)
+
+    def get_minutes(self):
+        try:
+            return max(float(self.minutes_var.get()), 0.1)
+        except ValueError:
+            return 10
+
+    def on_fps_change(self):
+        try:
+            self.driver.set_fps(float(self.fps_var.get()))
+        except ValueError:
+            pass
+
+    def on_window_change(self):
+        # Fenêtre plus longue : on relit le buffer
+        last = self.buffer.last_time()
+        since = last - int(self.get_minutes() * 60 * 1e9) if last is not None else 0
+        times, values = self.buffer.latest(since)
+        self.recent = self.new_window()
+        self.append_rows(times, values)
+        self.update_plot()
+
+    def new_window(self):
+        """Empty window: the columns, their rolling overlay and the x positions"""
+        columns = self.get_column_names()
+        return WindowStats(columns, self.gap_ns, extra=['x'] + [f"{col}_rolling" for col in columns])
+
+    def append_rows(self, times, values):
+        """Add received rows to the window and drop the rows that left it"""
+        if len(times) == 0:
+            return
+        since = int(times[-1]) - int(self.get_minutes() * 60 * 1e9)
+        first = int(np.searchsorted(times, since))
+        times = times[first:]
+        self.recent.append(times, {col: values[col][first:] for col in self.recent.columns},
+                           x=mdates.date2num(times.view('datetime64[ns]')))
+        self.recent.expire(since)
+
+    def update_rolling(self, new=None):
+        """Rolling overlay of the visible columns: only the last rows, whose
+        centered windows reach the `new` rows, are computed again (all the
+        rows without `new`)"""
+        if not self.mean_var.get():
+            return
+        half = self.get_smoothing_points()
+        statistic = STATISTICS[self.rolling_var.get()]
+        old = 0 if new is None else max(len(self.recent) - new, 0)
+        # Moyenne exponentielle : mémoire infinie, assez de lignes précédentes
+        # pour que l'écart soit négligeable
+        lookback = 10 * (2 * half + 1) if statistic == "ewma" else 2 * half
+        start = max(old - lookback, 0)
+        first = max(old - half, 0)
+        for col in self.visible_columns():
+            overlay = self.recent[f"{col}_rolling"]
+            overlay[first:] = rolling(self.recent[col][start:], half, statistic)[first - start:]
+
+    def draw_frame(self):
+        """One frame: append the rows received since the previous frame"""
+        self.status_var.set(self.receiver.status())
+        self.cursor, times, values = self.buffer.read_since(self.cursor)
+        if len(times) == 0:
+            return
+
+        count = len(self.events.table())
+        self.events.feed(times, values)
+        if len(self.events.table()) != count or self.event_table['open'].any():
+            self.refresh_event_list()
+        self.append_rows(times, values)
+        self.update_rolling(len(times))
+        self.update_labels()
+        if self.background is None:
+            self.update_plot()
+            return
+
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        low, high = self.value_range()
+        self.update_artists()
+        if self.recent['x'][-1] > x_max or (low is not None and (low < y_min or high > y_max)):
+            # Défilement : nouvelles limites et nouveau fond, mêmes courbes
+            self.set_limits()
+            self.canvas.draw()  # déclenche on_draw
+            return
+
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+    def visible_columns(self):
+        return [col for col, label in zip(self.get_column_names(), self.phase_visibility)
+                if self.phase_visibility[label].get()]
+
+    def value_range(self):
+        """Min and max of the visible columns over the window, (None, None) without rows"""
+        stats = [self.recent.stats(col) for col in self.visible_columns()]
+        stats = [stat for stat in stats if stat.count]
+        if not stats:
+            return None, None
+        return min(stat.min for stat in stats), max(stat.max for stat in stats)
+
+    def update_labels(self):
+        """Points, Max/Min and Energy labels of the displayed window"""
+        self.points_var.set(f"Points: {len(self.recent):,}")
+        total_energy = 0
+        for col in self.visible_columns():
+            stats = self.recent.stats(col)
+            if stats.count == 0:
+                continue
+            max_time = pd.Timestamp(stats.max_time).strftime('%d/%m %H:%M:%S')
+            min_time = pd.Timestamp(stats.min_time).strftime('%d/%m %H:%M:%S')
+            self.max_value_var.set(f"Max: {stats.max:.2f} ({max_time})")
+            self.min_value_var.set(f"Min: {stats.min:.2f} ({min_time})")
+            if col != "powermoy4":
+                total_energy += stats.energy_kwh
+            else:
+                total_energy = stats.energy_kwh
+        if self.plot_type == "Power":
+            self.energy_var.set(f"Energy: {total_energy:.2f} kWh")
+
+    def update_artists(self):
+        """Give the rows of the window to the persistent artists"""
+        labels = dict(zip(self.get_column_names(), self.phase_visibility))
+        x = self.recent['x']
+        for col, (line, avg_line, avg_text, max_marker, min_marker, mean_line) in self.artists.items():
+            stats = self.recent.stats(col)
+            line.set_data(x, self.recent[col])
+            if mean_line is not None:
+                mean_line.set_data(x, self.recent[f"{col}_rolling"])
+            if stats.count == 0:
+                continue
+            avg_line.set_ydata([stats.mean, stats.mean])
+            avg_text.set_text(f'Avg {labels[col]}: {stats.mean:.2f}')
+            max_marker.set_data([mdates.date2num(np.datetime64(stats.max_time, 'ns'))], [stats.max])
+            min_marker.set_data([mdates.date2num(np.datetime64(stats.min_time, 'ns'))], [stats.min])
+
+    def set_limits(self):
+        """Sliding x range with a margin on the right, y range of the visible values"""
+        window = self.get_minutes() / (24 * 60)
+        x = self.recent['x']
+        end = x[-1] if len(x) else mdates.date2num(np.datetime64('now'))
+        self.ax.set_xlim(end - window, end + window * self.X_MARGIN)
+        low, high = self.value_range()
+        if low is not None:
+            margin = (high - low) * 0.1 or 1
+            self.ax.set_ylim(low - margin, high + margin)
+
+    def update_plot(self):
+        """Full redraw: axes limits, grid, legend and new persistent artists"""
+        self.ax.clear()
+        self.artists = {}
+        self.animated = []
+        self.background = None
+        self.ax.xaxis_date()
+
+        columns = self.get_column_names()
+        colors = ['blue', 'red', 'green', 'grey']
+        labels = ['Phase 1', 'Phase 2', 'Phase 3', 'Phase 4']
+        self.update_rolling()
+
+        for col, color, label in zip(columns, colors, labels):
+            if not self.phase_visibility[label].get():
+                continue
+            line, = self.ax.plot([], [], color=color, label=label, linewidth=1, animated=True)
+            avg_line = self.ax.axhline(y=0, color=color, linestyle='--', alpha=0.5, animated=True)
+            avg_text = self.ax.annotate(
+                '', xy=(0.02, 0.98 - (0.05 * columns.index(col))), xycoords='axes fraction',
+                color=color, bbox=dict(boxstyle='round,pad=0.5', facecolor='white', alpha=0.8),
+                verticalalignment='top', animated=True)
+            max_marker, = self.ax.plot([], [], 'o', color=color, markeredgecolor='black',
+                                       markerfacecolor='purple', markersize=6, animated=True)
+            min_marker, = self.ax.plot([], [], 'o', color=color, markeredgecolor='black',
+                                       markerfacecolor='yellow', markersize=6, animated=True)
+            mean_line = None
+            if self.mean_var.get():
+                mean_line, = self.ax.plot([], [], color="purple", label=self.rolling_label(label),
+                                          linewidth=1.5, animated=True)
+            self.artists[col] = (line, avg_line, avg_text, max_marker, min_marker, mean_line)
+            self.animated += [artist for artist in self.artists[col] if artist is not None]
+
+        # Axe des x : fenêtre glissante avec une marge pour limiter les défilements
+        self.set_limits()
+
+        self.ax.set_title(f'{self.plot_type} Live - All Phases')
+        self.ax.set_ylabel(f'{self.plot_type} ' +
+                           ('(V)' if self.plot_type == 'Voltage' else
+                            '(A)' if self.plot_type == 'Current' else '(W)'))
+        self.ax.grid(True)
+        if self.artists:
+            self.ax.legend(loc='upper right')
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
+        self.ax.tick_params(axis='x', rotation=30, labelsize=8)
+
+        self.update_artists()
+        self.update_labels()
+        self.fig.tight_layout()
+        self.canvas.draw()  # déclenche on_draw
+
+    def on_draw(self, event):
+        """After a full draw: keep the static background and draw the animated artists"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+    def draw_animated(self):
+        for artist in self.animated:
+            self.ax.draw_artist(artist)
+
+    def on_phase_toggle(self):
+        """Handle phase visibility toggle"""
+        self.update_plot()
+
+    def on_event_select(self, event=None):
+        """No sliders here: lengthen the displayed window back to the selected event"""
+        selection = self.event_tree.selection()
+        if not selection or len(self.recent) == 0:
+            return
+        row = self.event_table.iloc[int(selection[0])]
+        since = (self.recent['time'][-1] - row['start'].value) / 60e9 + self.EVENT_MARGIN_SECONDS / 60
+        self.minutes_var.set(f"{max(since, self.get_minutes()):.1f}")
+        self.on_window_change()
+
+
+class DistributionWindow:
+    """Time-weighted histogram and duration curve of each visible phase over
+    the rows chosen by a comparison window (time range and value filters).
+    The rows are picked in the sorted order of each column, kept by the
+    dataset (distribution.SortedColumn), so nothing is sorted again when
+    the sliders move."""
+
+    COLORS = {'1': 'blue', '2': 'red', '3': 'green', '4': 'grey'}
+
+    def __init__(self, parent, dataset, plot_type, on_close=None):
+        self.dataset = dataset
+        self.plot_type = plot_type
+        self.on_close = on_close
+        self.rows = None
+        self.columns = []
+        self.unit = 'V' if plot_type == 'Voltage' else 'A' if plot_type == 'Current' else 'W'
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"{plot_type} Distribution")
+        self.window.geometry("1000x750")
+        self.photo = ImageTk.PhotoImage(Image.open(io.BytesIO(base64.b64decode(resources.bolt64x64))))
+        self.window.iconphoto(False, self.photo)
+
+        controls = ttk.Frame(self.window, padding="5")
+        controls.pack(fill=tk.X)
+        ttk.Label(controls, text="Classes :").pack(side=tk.LEFT, padx=5)
+        self.bins_var = tk.StringVar(value="50")
+        bins_entry = ttk.Entry(controls, textvariable=self.bins_var, width=5)
+        bins_entry.pack(side=tk.LEFT, padx=5)
+        bins_entry.bind("<Return>", lambda event: self.update_plot())
+        self.info_var = tk.StringVar(value="")
+        ttk.Label(controls, textvariable=self.info_var, font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=15)
+
+        self.fig = Figure(figsize=(10, 7))
+        self.hist_ax = self.fig.add_subplot(211)
+        self.duration_ax = self.fig.add_subplot(212)
+        self.canvas = FigureCanvasTkAgg(self.fig, self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        toolbar = NavigationToolbar2Tk(self.canvas, self.window)
+        toolbar.update()
+        self.window.bind("<Destroy>", self.on_destroy)
+
+    def on_destroy(self, event):
+        if event.widget is self.window and self.on_close is not None:
+            self.on_close()
+
+    def get_bins(self):
+        try:
+            return min(max(int(self.bins_var.get()), 1), 1000)
+        except ValueError:
+            return 50
+
+    def show(self, rows, columns):
+        """New selection: boolean mask over the dataset rows and columns to show"""
+        self.rows = rows
+        self.columns = columns
+        self.update_plot()
+
+    def update_plot(self):
+        self.hist_ax.clear()
+        self.duration_ax.clear()
+        gap_ns = self.dataset.quality().gap_ns
+        distributions = {col: SortedColumn.for_dataset(self.dataset, col, gap_ns).select(self.rows)
+                         for col in self.columns}
+        distributions = {col: d for col, d in distributions.items() if len(d)}
+        details = []
+        if distributions:
+            # Mêmes classes pour toutes les phases
+            low = min(d.values[0] for d in distributions.values())
+            high = max(d.values[-1] for d in distributions.values())
+            width = max(int(self.canvas.get_tk_widget().winfo_width()), 500)
+            for col, d in distributions.items():
+                color = self.COLORS[col[-1]]
+                label = f"Phase {col[-1]}"
+                hours, edges = d.histogram(self.get_bins(), (low, high))
+                self.hist_ax.stairs(hours, edges, color=color, label=label, linewidth=1.5)
+                percent, values = d.duration_curve(width)
+                self.duration_ax.plot(percent, values, color=color, label=label, linewidth=1.5)
+                details.append(f"{label} : {d.total_seconds / 3600:.1f} h")
+            self.hist_ax.legend()
+            self.duration_ax.legend()
+        self.info_var.set("  ".join(details) or "Aucune donnée")
+
+        self.hist_ax.set_title("Histogramme (temps passé par classe)")
+        self.hist_ax.set_xlabel(f"{self.plot_type} ({self.unit})")
+        self.hist_ax.set_ylabel("Durée (h)")
+        self.duration_ax.set_title("Monotone (valeurs classées)")
+        self.duration_ax.set_xlabel("Temps (%)")
+        self.duration_ax.set_ylabel(f"{self.plot_type} ({self.unit})")
+        self.duration_ax.set_xlim(0, 100)
+        for ax in (self.hist_ax, self.duration_ax):
+            ax.grid(True)
+        self.fig.tight_layout()
+        self.canvas.draw()
+
+
+class SummaryWindow:
+    """Energy and peak demand of every phase per day, week or month, from
+    the period table (periods.PeriodTable) kept up to date with the data.
+    Clicking a bar calls on_select(start, end) with the bounds of its period."""
+
+    def __init__(self, parent, dataset, on_select=None):
+        self.dataset = dataset
+        self.on_select = on_select
+        self.dataset.ensure_columns(POWER_COLUMNS)
+        self.table = PeriodTable(POWER_COLUMNS, dataset.quality().gap_ns)
+        self.table.build(dataset.data)
+        self.summary = None
+        self.bar_periods = {}  # barre -> ligne du bilan
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Consumption Summary")
+        self.window.geometry("1100x750")
+        self.photo = ImageTk.PhotoImage(Image.open(io.BytesIO(base64.b64decode(resources.bolt64x64))))
+        self.window.iconphoto(False, self.photo)
+
+        controls = ttk.Frame(self.window, padding="5")
+        controls.pack(fill=tk.X)
+        ttk.Label(controls, text="Période :").pack(side=tk.LEFT, padx=5)
+        self.period_var = tk.StringVar(value=PERIODS[0])
+        period_box = ttk.Combobox(controls, textvariable=self.period_var, values=PERIODS, state="readonly", width=10)
+        period_box.pack(side=tk.LEFT, padx=5)
+        period_box.bind("<<ComboboxSelected>>", lambda event: self.update_plot())
+        self.info_var = tk.StringVar(value="")
+        ttk.Label(controls, textvariable=self.info_var, font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=15)
+
+        self.fig = Figure(figsize=(11, 7))
+        self.energy_ax = self.fig.add_subplot(211)
+        self.peak_ax = self.fig.add_subplot(212, sharex=self.energy_ax)
+        self.canvas = FigureCanvasTkAgg(self.fig, self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        toolbar = NavigationToolbar2Tk(self.canvas, self.window)
+        toolbar.update()
+        self.canvas.mpl_connect('pick_event', self.on_pick)
+
+        self.dataset.add_listener(self.on_data_changed)
+        self.window.bind("<Destroy>", self.on_destroy)
+        self.update_plot()
+
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.dataset.remove_listener(self.on_data_changed)
+
+    def on_data_changed(self, dataset):
+        # Lignes ajoutées : seuls les derniers intervalles sont recalculés
+        self.table.update(dataset.data, dataset.unchanged_rows)
+        self.update_plot()
+
+    def period_label(self, start):
+        period = self.period_var.get()
+        if period == "Mois":
+            return start.strftime('%m/%Y')
+        if period == "Semaine":
+            return "sem. " + start.strftime('%d/%m')
+        return start.strftime('%d/%m')
+
+    def update_plot(self):
+        """Grouped bars of the energy and of the peak demand of phases 1 to 3"""
+        self.summary = self.table.summary(self.period_var.get())
+        self.bar_periods = {}
+        self.energy_ax.clear()
+        self.peak_ax.clear()
+        x = np.arange(len(self.summary))
+        width = 0.8 / 3
+        colors = ['blue', 'red', 'green']
+        for i, color in enumerate(colors):
+            col = f"powermoy{i + 1}"
+            if f"{col}_kwh" not in self.summary:
+                continue
+            offset = (i - 1) * width
+            energy_bars = self.energy_ax.bar(x + offset, self.summary[f"{col}_kwh"], width, color=color,
+                                             label=f"Phase {i + 1}", picker=True)
+            peak_bars = self.peak_ax.bar(x + offset, self.summary[f"{col}_peak"] / 1000, width, color=color,
+                                         label=f"Phase {i + 1}", picker=True)
+            for k, (energy_bar, peak_bar) in enumerate(zip(energy_bars, peak_bars)):
+                self.bar_periods[energy_bar] = k
+                self.bar_periods[peak_bar] = k
+
+        self.energy_ax.set_title(f"Énergie par {self.period_var.get().lower()}")
+        self.energy_ax.set_ylabel("Énergie (kWh)")
+        self.peak_ax.set_title("Pointe (puissance moyenne 15 min maximale)")
+        self.peak_ax.set_ylabel("Puissance (kW)")
+        step = max(1, len(x) // 20)  # au plus une vingtaine d'étiquettes
+        self.peak_ax.set_xticks(x[::step])
+        self.peak_ax.set_xticklabels([self.period_label(pd.Timestamp(start))
+                                      for start in self.summary['start'][::step]], rotation=30, fontsize=8)
+        for ax in (self.energy_ax, self.peak_ax):
+            ax.grid(True, axis='y')
+            if len(x):
+                ax.legend()
+
+        if "powermoy4_kwh" in self.summary and len(x):
+            self.info_var.set(f"Total : {self.summary['powermoy4_kwh'].sum():.2f} kWh, "
+                              f"pointe {np.nanmax(self.summary['powermoy4_peak']) / 1000:.2f} kW")
+        self.fig.tight_layout()
+        self.canvas.draw()
+
+    def on_pick(self, event):
+        """Bar clicked: details of its period and time range of the other windows"""
+        k = self.bar_periods.get(event.artist)
+        if k is None:
+            return
+        row = self.summary.iloc[k]
+        start = pd.Timestamp(row['start'])
+        end = pd.Timestamp(row['end']) - pd.Timedelta(seconds=1)
+        details = [f"{self.period_label(start)} :"]
+        for phase in range(1, 5):
+            col = f"powermoy{phase}"
+            if f"{col}_kwh" in row:
+                peak_time = pd.Timestamp(row[f"{col}_peak_time"]).strftime('%d/%m %H:%M')
+                details.append(f"P{phase} {row[f'{col}_kwh']:.2f} kWh / {row[f'{col}_peak'] / 1000:.2f} kW ({peak_time})")
+        self.info_var.set("  ".join(details))
+        if self.on_select is not None:
+            self.on_select(start, end)
+
+
 class PowerMonitorApp:
             
     def __init__(self):
@@ -1154,7 +2262,7 @@ class PowerMonitorApp:
 
         self.root = tk.Tk()
         self.root.title("Power Monitor")
-        self.root.geometry("400x400") 
+        self.root.geometry("400x430") 
         self.root.resizable(False, False)        
         # First decode the base64 string into binary data
         decoded_data = base64.b64decode(resources.bolt64x64)
@@ -1182,6 +2290,9 @@ class PowerMonitorApp:
         author_label = ttk.Label(main_frame, text=self.versionning, font=('Arial', 9, 'italic'))
         author_label.pack(pady=5)
         
+        # Mode compact : mesures en float32
+        self.compact_var = tk.BooleanVar(value=False)
+
         # Crée la barre des menus   
         self.create_menu()      
         
@@ -1189,11 +2300,19 @@ class PowerMonitorApp:
         self.create_display_options(main_frame)
         
         # Add load button
-        load_btn = ttk.Button(main_frame, text="Load File", command=self.load_file)
-        load_btn.pack(pady=10)
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=10)
+        load_btn = ttk.Button(button_frame, text="Load File", command=self.load_file)
+        load_btn.pack(side=tk.LEFT, padx=5)
+        windows_btn = ttk.Button(button_frame, text="Open Windows", command=self.open_selected_windows)
+        windows_btn.pack(side=tk.LEFT, padx=5)
         
         self.loaded_file_path = None  # Store the loaded file path
+        self.dataset = None  # Données partagées par les fenêtres
         self.text_editor = None
+        self.receiver = None  # Réception en direct
+        self.archive_path = None  # Archive SQLite des mesures
+        self.range_targets = []  # fenêtres dont la plage de temps suit le bilan
         
     def create_menu(self): 
         menu_bar = tk.Menu(self.root)
@@ -1201,8 +2320,19 @@ class PowerMonitorApp:
         file_menu = tk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open", command=self.load_file)
+        file_menu.add_command(label="Open day...", command=self.load_day)
         file_menu.add_command(label="Edit Data", command=self.open_text_editor)  # New menu item
+        file_menu.add_command(label="Statistics (large file)...", command=self.open_file_statistics)
+        file_menu.add_checkbutton(label="Compact mode (float32)", variable=self.compact_var)
+        file_menu.add_command(label="Memory report", command=self.show_memory_report)
+        file_menu.add_command(label="Data quality", command=self.show_quality)
         file_menu.add_separator() # Add a separator
+        file_menu.add_command(label="Import into archive...", command=self.import_into_archive)
+        file_menu.add_command(label="Open from archive...", command=self.open_from_archive)
+        file_menu.add_separator()
+        file_menu.add_command(label="Live...", command=self.open_live_dialog)
+        file_menu.add_command(label="Stop Live", command=self.stop_live)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
 
         help_menu = tk.Menu(menu_bar, tearoff=0)
@@ -1257,8 +2387,27 @@ class PowerMonitorApp:
             cb.pack(anchor=tk.W, padx=15)
         self.comparison_vars["Power"].set(True)  # Default to Power comparison"]            
 
-    def create_phase_window(self, phase_num, data):
+        # Bilan par jour / semaine / mois
+        self.summary_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(comparison_frame, text="Summary", variable=self.summary_var).pack(anchor=tk.W, padx=15)
+
+    def add_range_target(self, window, set_time_range):
+        """Let the summary window set the time range of `window` until it is closed"""
+        self.range_targets.append(set_time_range)
+        def on_destroy(event):
+            if event.widget is window and set_time_range in self.range_targets:
+                self.range_targets.remove(set_time_range)
+        window.bind("<Destroy>", on_destroy, add="+")
+
+    def set_time_range(self, start, end):
+        """Show the period start .. end in every open phase and comparison window"""
+        for set_time_range in list(self.range_targets):
+            set_time_range(start, end)
+
+    def create_phase_window(self, phase_num, dataset):
         # Create new window for phase
+        dataset.ensure_columns(phase_columns(phase_num))
+        data = dataset.data
         phase_window = tk.Toplevel(self.root)
         phase_window.title(f"Phase {phase_num}")
         phase_window.geometry("1100x800")
@@ -1269,7 +2418,6 @@ class PowerMonitorApp:
         main_frame.pack(fill=tk.BOTH, expand=True)
         
         # Calculate time range
-        data['time'] = pd.to_datetime(data['time'], format='%d/%m/%Y %H:%M:%S')
         min_time = data['time'].min()
         max_time = data['time'].max()
         total_seconds = int((max_time - min_time).total_seconds())
@@ -1359,8 +2507,8 @@ class PowerMonitorApp:
         fig = Figure(figsize=(12, 10))
         fig.subplots_adjust(bottom=0.15, hspace=0.4)
         voltage_ax = fig.add_subplot(311)
-        current_ax = fig.add_subplot(312)
-        power_ax = fig.add_subplot(313)
+        current_ax = fig.add_subplot(312, sharex=voltage_ax)
+        power_ax = fig.add_subplot(313, sharex=voltage_ax)
         
         canvas = FigureCanvasTkAgg(fig, main_frame)
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, pady=5)
@@ -1375,147 +2523,165 @@ class PowerMonitorApp:
             cal = Calendar(phase_window, min_time, max_time)  # Pass min/max dates
             selected_calendar_date = cal.selected_date # Retrieve selected date
             if selected_calendar_date:
-                position_slider_start=start_slider.get()  
-                old_start_date= min_time + pd.Timedelta(seconds=int(position_slider_start))
-
                 date_object = datetime.combine(selected_calendar_date, time(0, 0, 0))                     
-                new_start_date = date_object + pd.Timedelta(seconds=int(0))
-                        
-                # si la date selectionnée calendrier est inférieure à la date de début des données
-                if (new_start_date-min_time).total_seconds() < 0:
-                    new_start_date = min_time
-                                
-                # nombre de secondes entre le début des données et la date selectionnée dans le calendrier
-                diff_begin_seconds = int((new_start_date-min_time).total_seconds())
+                # date selectionnée dans le calendrier plus 24 heures
+                set_time_range(date_object, date_object + pd.Timedelta(seconds=int(24*3600-1)))
+
+        def set_time_range(new_start_date, new_end_date):
+            position_slider_start=start_slider.get()  
+            old_start_date= min_time + pd.Timedelta(seconds=int(position_slider_start))
+                    
+            # si la date demandée est inférieure à la date de début des données
+            if (new_start_date-min_time).total_seconds() < 0:
+                new_start_date = min_time
                             
-                # date selectionnée dans le calendrier plus 24 heures en secondes
-                new_end_date = date_object + pd.Timedelta(seconds=int(24*3600-1))
-                diff_end_seconds = int((new_end_date - new_start_date).total_seconds()) 
-                        
-                # si la date selectionnée calendrier est supérieure à la date de fin des données alors on deplace slider end d'abord (et inversement)
-                if (new_start_date - old_start_date).total_seconds() < 0: 
-                    start_slider.set(diff_begin_seconds)                             
-                    end_slider.set(diff_begin_seconds + diff_end_seconds)
-                else:
-                    end_slider.set(diff_begin_seconds + diff_end_seconds)
-                    start_slider.set(diff_begin_seconds)                                        
+            # nombre de secondes entre le début des données et la date demandée
+            diff_begin_seconds = int((new_start_date-min_time).total_seconds())
+            diff_end_seconds = int((new_end_date - new_start_date).total_seconds()) 
+                    
+            # si la date demandée est supérieure à la date de début affichée alors on deplace slider end d'abord (et inversement)
+            if (new_start_date - old_start_date).total_seconds() < 0: 
+                start_slider.set(diff_begin_seconds)                             
+                end_slider.set(diff_begin_seconds + diff_end_seconds)
+            else:
+                end_slider.set(diff_begin_seconds + diff_end_seconds)
+                start_slider.set(diff_begin_seconds)                                        
                            
+        # Courbes de la phase : axe, colonne, couleur, moyenne, unité
+        suffix = str(phase_num)
+        curves = [
+            (voltage_ax, f'voltagemoy{suffix}', 'b-', 'r', 'Voltage', 'V', '.2f'),
+            (current_ax, f'currentmoy{suffix}', 'r-', 'b', 'Current', 'A', '.2f'),
+            (power_ax, f'powermoy{suffix}', 'g-', 'r', 'Power', 'W', '.0f'),
+        ]
+        # Zoom/déplacement de la barre d'outils : relecture des lignes de la
+        # nouvelle plage à la résolution de l'écran, après une courte pause
+        ZOOM_DELAY_MS = 200  # pause après le dernier changement de limites
+        zoom = {'job': None, 'xlim': None, 'lines': []}
+
+        def select_rows(start_time, end_time):
+            mask = (data['time'] >= start_time) & (data['time'] <= end_time)
+            return data.loc[mask]
+
+        def curve_points(plot_data, col, gap_ns):
+            """Points of a curve: one min/max group per pixel column of the axes"""
+            columns = max(int(voltage_ax.bbox.width), 100)
+            return decimate(plot_data['time'].to_numpy(), plot_data[col].to_numpy(), columns, gap_ns)
+
+        def update_values(plot_data, gap_ns):
+            """Average, Max/Min and Energy labels of the rows shown"""
+            voltage_avg = plot_data[f'voltagemoy{suffix}'].astype(np.float64).mean()
+            current_avg = plot_data[f'currentmoy{suffix}'].astype(np.float64).mean()
+            power_avg = plot_data[f'powermoy{suffix}'].astype(np.float64).mean()
+
+            voltage_avg_var.set(f"Voltage Average: {voltage_avg:.2f} V")
+            current_avg_var.set(f"Current Average: {current_avg:.2f} A")
+            power_avg_var.set(f"Power Average: {power_avg:.0f} W")
+
+            # Mise  à jour les labels Max and Min
+            max_idx = plot_data[f'voltagemoy{suffix}'].idxmax()  # This returns the index label
+            max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
+            datetime_str = max_time.strftime('%d/%m %H:%M:%S')
+            voltage_max_var.set(f"Volatge Max: {float(plot_data[f'voltagemoy{suffix}'].max()):.2f} V"+f" ({datetime_str})")
+
+            max_idx = plot_data[f'currentmoy{suffix}'].idxmax()  # This returns the index label
+            max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
+            datetime_str = max_time.strftime('%d/%m %H:%M:%S')
+            current_max_var.set(f"Current Max: {float(plot_data[f'currentmoy{suffix}'].max()):.2f} A"+f" ({datetime_str})")
+
+            max_idx = plot_data[f'powermoy{suffix}'].idxmax()  # This returns the index label
+            max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
+            datetime_str = max_time.strftime('%d/%m %H:%M:%S')
+            power_max_var.set(f"Power Max: {float(plot_data[f'powermoy{suffix}'].max()):.2f} W"+f" ({datetime_str})")
+
+            min_idx = plot_data[f'powermoy{suffix}'].idxmin()  # This returns the index label
+            min_time = plot_data['time'].loc[min_idx]  # Use .loc to access by index label instead of position
+            datetime_str = min_time.strftime('%d/%m %H:%M:%S')
+            power_min_var.set(f"Power Min: {float(plot_data[f'powermoy{suffix}'].min()):.2f} W"+f" ({datetime_str})")
+
+            # Calculate energy in kWh using trapezoidal rule (les trous de l'enregistrement sont exclus)
+            times_ns = plot_data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            energy = trapezoid_energy(times_ns, plot_data[f'powermoy{suffix}'], gap_ns) / JOULES_PER_KWH
+            gaps = len(gap_breaks(plot_data['time'], gap_ns))
+            energy_var.set(f"Energy: {energy:.2f} kWh" + (f" ({gaps} trou(s) exclus)" if gaps else ""))
+
+        def on_xlim_changed(ax):
+            if zoom['job'] is not None:
+                phase_window.after_cancel(zoom['job'])
+            zoom['job'] = phase_window.after(ZOOM_DELAY_MS, refetch_zoom)
+
+        def refetch_zoom():
+            """Redraw the curves and the labels for the x-limits of the axes"""
+            zoom['job'] = None
+            xlim = voltage_ax.get_xlim()
+            if zoom['xlim'] is None or np.allclose(xlim, zoom['xlim'], rtol=0, atol=1e-9):
+                return  # limites posées par update_plots
+            zoom['xlim'] = xlim
+            try:
+                start_time, end_time = (pd.Timestamp(mdates.num2date(x)).tz_localize(None) for x in xlim)
+                plot_data = select_rows(start_time, end_time)
+                if plot_data.empty:
+                    status_bar.config(text="Aucune donnée dans la zone affichée")
+                    return
+                gap_ns = dataset.quality().gap_ns
+                update_values(plot_data, gap_ns)
+                for (ax, col, style, avg_color, name, unit, fmt), (line, avg_line) in zip(curves, zoom['lines']):
+                    line.set_data(*curve_points(plot_data, col, gap_ns))
+                    avg = plot_data[col].astype(np.float64).mean()
+                    avg_line.set_ydata([avg, avg])
+                    avg_line.set_label(f'Avg: {avg:{fmt}}{unit}')
+                    ax.legend()
+                canvas.draw_idle()
+                status_bar.config(
+                    text=f"Zoom: {start_time.strftime('%Y-%m-%d %H:%M:%S')} "
+                        f"to {end_time.strftime('%Y-%m-%d %H:%M:%S')} ({len(plot_data):,} points)"
+                )
+            except Exception as e:
+                messagebox.showerror("Error", f"Error updating plots: {str(e)}")
+
         # Function to update plots
         def update_plots():
             try:
                 start_time = pd.to_datetime(start_var.get())
                 end_time = pd.to_datetime(end_var.get())
-                
+
                 # Filter data
-                mask = (data['time'] >= start_time) & (data['time'] <= end_time)
-                plot_data = data.loc[mask]
-                
-                # Clear plots
-                voltage_ax.clear()
-                current_ax.clear()
-                power_ax.clear()
-                
-                # Suffix for column names
-                suffix = str(phase_num)
-                
-                # Calculate and update averages
-                voltage_avg = plot_data[f'voltagemoy{suffix}'].mean()
-                current_avg = plot_data[f'currentmoy{suffix}'].mean()
-                power_avg = plot_data[f'powermoy{suffix}'].mean()
-                
-                voltage_avg_var.set(f"Voltage Average: {voltage_avg:.2f} V")
-                current_avg_var.set(f"Current Average: {current_avg:.2f} A")
-                power_avg_var.set(f"Power Average: {power_avg:.0f} W")
-                            
-                # Mise  à jour les labels Max and Min                                
-                max_idx = plot_data[f'voltagemoy{suffix}'].idxmax()  # This returns the index label
-                max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
-                datetime_str = max_time.strftime('%d/%m %H:%M:%S')       
-                voltage_max_var.set(f"Volatge Max: {float(plot_data[f'voltagemoy{suffix}'].max()):.2f} V"+f" ({datetime_str})")   
-
-                max_idx = plot_data[f'currentmoy{suffix}'].idxmax()  # This returns the index label
-                max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
-                datetime_str = max_time.strftime('%d/%m %H:%M:%S')       
-                current_max_var.set(f"Current Max: {float(plot_data[f'currentmoy{suffix}'].max()):.2f} A"+f" ({datetime_str})")   
-                
-                max_idx = plot_data[f'powermoy{suffix}'].idxmax()  # This returns the index label
-                max_time = plot_data['time'].loc[max_idx]  # Use .loc to access by index label instead of position
-                datetime_str = max_time.strftime('%d/%m %H:%M:%S')       
-                power_max_var.set(f"Power Max: {float(plot_data[f'powermoy{suffix}'].max()):.2f} W"+f" ({datetime_str})")                   
-                
-                min_idx = plot_data[f'powermoy{suffix}'].idxmin()  # This returns the index label
-                min_time = plot_data['time'].loc[min_idx]  # Use .loc to access by index label instead of position
-                datetime_str = min_time.strftime('%d/%m %H:%M:%S')       
-                power_min_var.set(f"Power Min: {float(plot_data[f'powermoy{suffix}'].min()):.2f} W"+f" ({datetime_str})")                                    
-                               
-                voltage_avg = plot_data[f'voltagemoy{suffix}'].mean()
-                current_avg = plot_data[f'currentmoy{suffix}'].mean()
-                power_avg = plot_data[f'powermoy{suffix}'].mean()
-                
-                voltage_avg_var.set(f"Voltage Average: {voltage_avg:.2f} V")
-                current_avg_var.set(f"Current Average: {current_avg:.2f} A")
-                power_avg_var.set(f"Power Average: {power_avg:.0f} W")                
-
-                # Calculate energy in kWh using trapezoidal rule
-                # Step 1: Convert time to seconds and compute time differences
-                time_sec = plot_data['time'].astype(np.int64) / 1e9  # Convert nanoseconds to seconds
-                time_diff = np.diff(time_sec)  # Compute time differences (in seconds)
-
-                # Step 2: Extract power values
-                power_values = plot_data[f'powermoy{suffix}'].values
-
-                # Step 3: Perform numerical integration using time differences
-                # Align power_values with time_diff (exclude the last power value)
-
-                energy = np.sum((power_values[:-1] + power_values[1:]) / 2 * time_diff) / 3600000  # Convert to kWh
-
-                # Step 4: Update energy variable
-                energy_var.set(f"Energy: {energy:.2f} kWh")
-
-                # Plot voltage with average line
-                voltage_ax.plot(plot_data['time'], plot_data[f'voltagemoy{suffix}'], 
-                            'b-', linewidth=1, label='Voltage')
-                voltage_ax.axhline(y=voltage_avg, color='r', linestyle='--', 
-                                label=f'Avg: {voltage_avg:.2f}V')
-                voltage_ax.set_title(f'Voltage - Phase {phase_num}')
-                voltage_ax.set_ylabel('Voltage (V)')
-                voltage_ax.grid(True)
-                voltage_ax.legend()
-                
-                # Plot current with average line
-                current_ax.plot(plot_data['time'], plot_data[f'currentmoy{suffix}'], 
-                            'r-', linewidth=1, label='Current')
-                current_ax.axhline(y=current_avg, color='b', linestyle='--', 
-                                label=f'Avg: {current_avg:.2f}A')
-                current_ax.set_title(f'Current - Phase {phase_num}')
-                current_ax.set_ylabel('Current (A)')
-                current_ax.grid(True)
-                current_ax.legend()
-                
-                # Plot power with average line
-                power_ax.plot(plot_data['time'], plot_data[f'powermoy{suffix}'], 
-                            'g-', linewidth=1, label='Power')
-                power_ax.axhline(y=power_avg, color='r', linestyle='--', 
-                            label=f'Avg: {power_avg:.0f}W')
-                power_ax.set_title(f'Power - Phase {phase_num}')
-                power_ax.set_ylabel('Power (W)')
-                power_ax.grid(True)
-                power_ax.legend()
-                
+                plot_data = select_rows(start_time, end_time)
+                gap_ns = dataset.quality().gap_ns
+                update_values(plot_data, gap_ns)
+
+                # Plot voltage, current and power with average line
+                zoom['lines'] = []
+                for ax, col, style, avg_color, name, unit, fmt in curves:
+                    ax.clear()
+                    line, = ax.plot(*curve_points(plot_data, col, gap_ns), style, linewidth=1, label=name)
+                    avg = plot_data[col].astype(np.float64).mean()
+                    avg_line = ax.axhline(y=avg, color=avg_color, linestyle='--', label=f'Avg: {avg:{fmt}}{unit}')
+                    zoom['lines'].append((line, avg_line))
+                    ax.set_title(f'{name} - Phase {phase_num}')
+                    ax.set_ylabel(f'{name} ({unit})')
+                    ax.grid(True)
+                    ax.legend()
+
                 # Format x-axis
                 for ax in [voltage_ax, current_ax, power_ax]:
                     ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
                     ax.tick_params(axis='x', rotation=30,  labelsize=8)
-                
+
                 canvas.draw()
+                # Vue complète de la plage : point de départ du zoom ("Home")
+                zoom['xlim'] = voltage_ax.get_xlim()
+                toolbar.update()
+                for ax in [voltage_ax, current_ax, power_ax]:
+                    ax.callbacks.connect('xlim_changed', on_xlim_changed)
                 status_bar.config(
                     text=f"Showing data from {start_time.strftime('%Y-%m-%d %H:%M:%S')} "
                         f"to {end_time.strftime('%Y-%m-%d %H:%M:%S')}"
                 )
-                
+
             except Exception as e:
                 messagebox.showerror("Error", f"Error updating plots: {str(e)}")
-        
+
         def on_start_slide(value):
             seconds = float(value)
             if seconds < end_slider.get():
@@ -1560,17 +2726,219 @@ class PowerMonitorApp:
         ttk.Button(entry_frame, text="Reset", command=reset_range).pack(side=tk.LEFT, padx=5)  
             
         ttk.Button(entry_frame, text="Calendar", command=open_calendar).pack(side=tk.LEFT, padx=5)          
+
+        def export_range():
+            path = filedialog.asksaveasfilename(parent=phase_window, title="Export de la sélection",
+                                                defaultextension=".parquet", filetypes=FILE_TYPES)
+            if not path:
+                return
+            try:
+                result = export_selection(dataset, path, pd.to_datetime(start_var.get()), pd.to_datetime(end_var.get()),
+                                          phase_columns(phase_num))
+            except (ImportError, ValueError, OSError) as e:
+                messagebox.showerror("Export Error", str(e), parent=phase_window)
+                return
+            status_bar.config(text=result.summary())
+
+        ttk.Button(entry_frame, text="Export sélection...", command=export_range).pack(side=tk.LEFT, padx=5)
+
+        def on_data_changed(dataset):
+            # Nouvelles lignes : on garde la plage de temps affichée
+            nonlocal data, min_time, max_time, total_seconds
+            start_time = pd.to_datetime(start_var.get())
+            end_time = pd.to_datetime(end_var.get())
+
+            data = dataset.data
+            min_time = data['time'].min()
+            max_time = data['time'].max()
+            total_seconds = int((max_time - min_time).total_seconds())
+
+            start_slider.configure(to=total_seconds)
+            end_slider.configure(to=total_seconds)
+            start_seconds = min(max(int((start_time - min_time).total_seconds()), 0), total_seconds)
+            end_seconds = min(max(int((end_time - min_time).total_seconds()), 0), total_seconds)
+            end_slider.set(total_seconds)
+            start_slider.set(start_seconds)
+            end_slider.set(end_seconds)
+            update_labels()
+            update_plots()
+
+        def on_destroy(event):
+            if event.widget is phase_window:
+                dataset.remove_listener(on_data_changed)
+                if zoom['job'] is not None:
+                    phase_window.after_cancel(zoom['job'])
+
+        dataset.add_listener(on_data_changed)
+        phase_window.bind("<Destroy>", on_destroy)
+        self.add_range_target(phase_window, set_time_range)
             
         # Initial plot
         update_plots()
 
+    def open_live_dialog(self):
+        """Choose the live source and open the live comparison windows"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Live")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+
+        protocol_var = tk.StringVar(value="tcp")
+        address_var = tk.StringVar(value="127.0.0.1")
+        port_var = tk.StringVar(value="5005")
+        minutes_var = tk.StringVar(value="10")
+
+        ttk.Label(dialog, text="Protocole:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Combobox(dialog, textvariable=protocol_var, values=["tcp", "udp", "serial"],
+                     state="readonly", width=17).grid(row=0, column=1, padx=5, pady=5)
+        ttk.Label(dialog, text="Adresse / port série:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(dialog, textvariable=address_var, width=20).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Label(dialog, text="Port / bauds:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(dialog, textvariable=port_var, width=20).grid(row=2, column=1, padx=5, pady=5)
+        ttk.Label(dialog, text="Dernières minutes:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(dialog, textvariable=minutes_var, width=20).grid(row=3, column=1, padx=5, pady=5)
+
+        def start():
+            try:
+                self.stop_live()
+                self.receiver = create_receiver(protocol_var.get(), address_var.get(), port_var.get())
+                self.receiver.start()
+                for comp_type in ["Voltage", "Current", "Power"]:
+                    if self.comparison_vars[comp_type].get():
+                        LiveComparisonWindow(self.root, self.receiver, comp_type, float(minutes_var.get()))
+                self.error_label.config(text="")
+            except Exception as e:
+                self.error_label.config(text=f"Error: {str(e)}")
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Démarrer", command=start).grid(row=4, column=0, columnspan=2, pady=10)
+
+    def open_file_statistics(self):
+        """Statistics of a file too large to be loaded, read block by block"""
+        file_path = filedialog.askopenfilename(
+            title="Select File",
+            filetypes=[("txt files", "*.txt"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title(f"Statistiques - {os.path.basename(file_path)}")
+        window.iconphoto(False, self.photo)
+        main_frame = ttk.Frame(window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Plage de temps facultative (vide = tout le fichier)
+        entry_frame = ttk.Frame(main_frame)
+        entry_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(entry_frame, text="Start:").pack(side=tk.LEFT, padx=5)
+        start_var = tk.StringVar()
+        ttk.Entry(entry_frame, textvariable=start_var, width=20).pack(side=tk.LEFT, padx=5)
+        ttk.Label(entry_frame, text="End:").pack(side=tk.LEFT, padx=5)
+        end_var = tk.StringVar()
+        ttk.Entry(entry_frame, textvariable=end_var, width=20).pack(side=tk.LEFT, padx=5)
+        compute_btn = ttk.Button(entry_frame, text="Calculer")
+        compute_btn.pack(side=tk.LEFT, padx=5)
+
+        result_text = tk.Text(main_frame, width=110, height=16, font=('Courier', 10))
+        result_text.pack(fill=tk.BOTH, expand=True, pady=5)
+        status_bar = ttk.Label(main_frame, text="", relief=tk.SUNKEN)
+        status_bar.pack(fill=tk.X, pady=5)
+
+        def show(totals, elapsed):
+            def at(ns):
+                return pd.Timestamp(ns).strftime('%d/%m %H:%M:%S') if ns is not None else "--"
+            lines = []
+            for phase in range(1, 5):
+                voltage = totals.get(f'voltagemoy{phase}')
+                current = totals.get(f'currentmoy{phase}')
+                power = totals.get(f'powermoy{phase}')
+                if voltage is None or current is None or power is None or power.count == 0:
+                    continue
+                lines.append(f"Phase {phase}  ({power.count:,} points)")
+                lines.append(f"  Voltage Average: {voltage.mean:.2f} V   Current Average: {current.mean:.2f} A"
+                             f"   Power Average: {power.mean:.0f} W   Energy: {power.energy_kwh:.2f} kWh")
+                lines.append(f"  Voltage Max: {voltage.max:.2f} V ({at(voltage.max_time)})"
+                             f"   Current Max: {current.max:.2f} A ({at(current.max_time)})")
+                lines.append(f"  Power Max: {power.max:.2f} W ({at(power.max_time)})"
+                             f"   Power Min: {power.min:.2f} W ({at(power.min_time)})")
+                lines.append("")
+            result_text.delete(1.0, tk.END)
+            result_text.insert(tk.END, "\n".join(lines) if lines else "Aucune donnée dans la plage")
+            status_bar.config(text=f"Calcul terminé en {elapsed:.1f} s")
+
+        def compute():
+            try:
+                time_range = None
+                if start_var.get().strip() or end_var.get().strip():
+                    start = pd.to_datetime(start_var.get()) if start_var.get().strip() else pd.Timestamp.min
+                    end = pd.to_datetime(end_var.get()) if end_var.get().strip() else pd.Timestamp.max
+                    time_range = (start, end)
+            except Exception as e:
+                messagebox.showerror("Error", f"Plage de temps invalide: {str(e)}", parent=window)
+                return
+
+            result = {}
+            def run():
+                started = perf_counter()
+                try:
+                    result['totals'] = file_statistics(file_path, time_range=time_range,
+                                                       workers=os.cpu_count() or 1)
+                except Exception as e:
+                    result['error'] = e
+                result['elapsed'] = perf_counter() - started
+
+            worker = threading.Thread(target=run, daemon=True)
+            worker.start()
+            compute_btn.config(state=tk.DISABLED)
+            status_bar.config(text="Calcul en cours...")
+
+            def poll():
+                if not window.winfo_exists():
+                    return
+                if worker.is_alive():
+                    window.after(200, poll)
+                    return
+                compute_btn.config(state=tk.NORMAL)
+                if 'error' in result:
+                    status_bar.config(text=f"Error: {str(result['error'])}")
+                else:
+                    show(result['totals'], result['elapsed'])
+            poll()
+
+        compute_btn.config(command=compute)
+        compute()
+
+    def stop_live(self):
+        if self.receiver is not None:
+            self.receiver.stop()
+            self.receiver = None
+
     def open_text_editor(self):
         if self.loaded_file_path:
             if self.text_editor is None or not tk.Toplevel.winfo_exists(self.text_editor.root):
                 #Create a new instance of the TextFileEditor
-                self.text_editor = TextFileEditor(self.root, self.loaded_file_path)
+                self.text_editor = TextFileEditor(self.root, self.loaded_file_path, on_save=self.on_file_saved)
         else:
             messagebox.showinfo("Info", "Charger d'abord le fichier !")
+
+    def on_file_saved(self, file_path, changes, blank_lines):
+        """Report the lines saved by the editor into the open windows"""
+        if self.dataset is None or self.dataset.file_path is None \
+                or os.path.abspath(file_path) != os.path.abspath(self.dataset.file_path):
+            return
+        try:
+            if changes is None:
+                self.dataset.reload()
+            else:
+                try:
+                    self.dataset.patch_lines(changes, blank_lines)
+                except ValueError:
+                    # L'en-tête a changé : relecture complète
+                    self.dataset.reload()
+            self.error_label.config(text="")
+        except Exception as e:
+            self.error_label.config(text=f"Error: {str(e)}")
         
     def load_file(self):
         try:
@@ -1582,27 +2950,225 @@ class PowerMonitorApp:
             if not file_path:
                 return
 
-            data = pd.read_csv(file_path, sep=';')
+            self.dataset = PhaseDataset.from_csv(file_path, self.selected_columns(),
+                                                 self.compact_var.get())
+            self.open_windows(file_path)
 
-            # Create individual phase windows based on checkbox selection
-            for phase in range(1, 4):
-                if self.phase_vars[phase].get():
-                    self.create_phase_window(phase, data)
+        except MemoryError:
+            self.error_label.config(text="Fichier trop volumineux pour être chargé : "
+                                         "utiliser File > Statistics (large file)")
+        except Exception as e:
+            self.error_label.config(text=f"Error: {str(e)}")
+    def load_day(self):
+        """Load a single day chosen in the calendar, reading only its lines"""
+        try:
+            file_path = filedialog.askopenfilename(
+                title="Select File",
+                filetypes=[("txt files", "*.txt"), ("CSV files", "*.csv"), ("All files", "*.*")]
+            )
+            if not file_path:
+                return
 
-            # Create comparison windows based on checkbox selection
-            for comp_type in ["Voltage", "Current", "Power"]:
-                if self.comparison_vars[comp_type].get():
-                    ComparisonWindow(self.root, data, comp_type)
+            first_time, last_time = file_time_bounds(file_path)
+            cal = Calendar(self.root, first_time, last_time)
+            if not cal.selected_date:
+                return
+            start = pd.Timestamp(cal.selected_date)
+            end = start + pd.Timedelta(seconds=24*3600-1)
+
+            self.dataset = PhaseDataset.from_range(file_path, start, end, self.selected_columns(),
+                                                   self.compact_var.get())
+            if self.dataset.data.empty:
+                self.error_label.config(text="Aucune donnée ce jour-là")
+                return
+            self.open_windows(file_path)
 
+            # Index du fichier construit en arrière-plan pour les jours suivants
+            if TimeIndex.load(file_path) is None:
+                threading.Thread(target=TimeIndex.for_file, args=(file_path,), daemon=True).start()
+        except Exception as e:
+            self.error_label.config(text=f"Error: {str(e)}")
+
+    def choose_archive(self, must_exist=False):
+        """Path of the SQLite archive, asked the first time"""
+        if self.archive_path is None or (must_exist and not os.path.exists(self.archive_path)):
+            if must_exist:
+                path = filedialog.askopenfilename(
+                    title="Select Archive", filetypes=[("Archive", "*.db"), ("All files", "*.*")])
+            else:
+                path = filedialog.asksaveasfilename(
+                    title="Archive", defaultextension=".db", initialfile="phases.db",
+                    confirmoverwrite=False, filetypes=[("Archive", "*.db"), ("All files", "*.*")])
+            self.archive_path = path or None
+        return self.archive_path
+
+    def import_into_archive(self):
+        """Append log files to the archive in the background"""
+        file_paths = filedialog.askopenfilenames(
+            title="Select Files",
+            filetypes=[("txt files", "*.txt"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not file_paths or not self.choose_archive():
+            return
+        archive_path = self.archive_path
+        progress = {'file': "", 'read': 0, 'inserted': 0, 'same_second': 0, 'done': False, 'error': None}
+
+        def run():
+            try:
+                with closing(PhaseArchive(archive_path)) as archive:
+                    for file_path in file_paths:
+                        progress['file'] = os.path.basename(file_path)
+                        base_read, base_inserted = progress['read'], progress['inserted']
+
+                        def report(read, inserted):
+                            progress['read'] = base_read + read
+                            progress['inserted'] = base_inserted + inserted
+                        progress['same_second'] += archive.import_csv(file_path, report)[2]
+            except Exception as e:
+                progress['error'] = e
+            progress['done'] = True
+
+        threading.Thread(target=run, daemon=True).start()
+
+        def poll():
+            if not progress['done']:
+                self.error_label.config(text=f"Import {progress['file']} : {progress['read']:,} lignes")
+                self.root.after(500, poll)
+                return
             self.error_label.config(text="")
-            self.loaded_file_path = file_path  # Store the file path
-            if self.text_editor is not None : self.text_editor.open_file(self.loaded_file_path)
+            if progress['error'] is not None:
+                messagebox.showerror("Error", f"Import: {str(progress['error'])}")
+            else:
+                messagebox.showinfo("Archive",
+                    f"{progress['read']:,} lignes lues, {progress['inserted']:,} ajoutées, "
+                    f"{progress['read'] - progress['inserted'] - progress['same_second']:,} déjà présentes, "
+                    f"{progress['same_second']:,} ignorées (même seconde qu'une ligne précédente)")
+                if isinstance(self.dataset, ArchiveDataset) and self.dataset.db_path == archive_path:
+                    self.dataset.reload()
+        poll()
+
+    def open_from_archive(self):
+        """Open the selected windows on a time range of the archive"""
+        if not self.choose_archive(must_exist=True):
+            return
+        try:
+            with closing(PhaseArchive(self.archive_path)) as archive:
+                first_time, last_time = archive.bounds()
+        except Exception as e:
+            self.error_label.config(text=f"Error: {str(e)}")
+            return
+        if first_time is None:
+            messagebox.showinfo("Info", "L'archive est vide")
+            return
 
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Archive")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        start_var = tk.StringVar(value=first_time.strftime('%Y-%m-%d %H:%M:%S'))
+        end_var = tk.StringVar(value=last_time.strftime('%Y-%m-%d %H:%M:%S'))
+        level_var = tk.StringVar(value="auto")
+        ttk.Label(dialog, text="Start:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(dialog, textvariable=start_var, width=20).grid(row=0, column=1, padx=5, pady=5)
+        ttk.Label(dialog, text="End:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(dialog, textvariable=end_var, width=20).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Label(dialog, text="Résolution:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Combobox(dialog, textvariable=level_var, values=["auto", "raw", "minute", "hour"],
+                     state="readonly", width=17).grid(row=2, column=1, padx=5, pady=5)
+
+        def open_range():
+            try:
+                self.dataset = ArchiveDataset(self.archive_path, pd.to_datetime(start_var.get()),
+                                              pd.to_datetime(end_var.get()), self.selected_columns(),
+                                              level_var.get())
+                if self.dataset.data.empty:
+                    self.error_label.config(text="Aucune donnée dans la plage")
+                else:
+                    self.open_windows(None)
+            except Exception as e:
+                self.error_label.config(text=f"Error: {str(e)}")
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Ouvrir", command=open_range).grid(row=3, column=0, columnspan=2, pady=10)
+
+    def show_quality(self):
+        """Summary of the data quality scan of the loaded data"""
+        if self.dataset is None:
+            messagebox.showinfo("Info", "Charger d'abord le fichier !")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Qualité des données")
+        window.iconphoto(False, self.photo)
+        text = scrolledtext.ScrolledText(window, width=70, height=30, font=('Courier', 10))
+        text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        text.insert(tk.END, describe(self.dataset.quality()))
+        text.config(state=tk.DISABLED)
+
+    def show_memory_report(self):
+        """Memory per million rows of the loaded data, standard and compact"""
+        if self.dataset is None:
+            messagebox.showinfo("Info", "Charger d'abord le fichier !")
+            return
+        report = memory_report(self.dataset)
+        mode = "compact" if self.dataset.compact else "standard"
+        messagebox.showinfo("Mémoire", 
+            f"Lignes chargées : {report['rows']:,}\n"
+            f"Colonnes : {', '.join(report['columns'])}\n\n"
+            f"Mémoire par million de lignes :\n"
+            f"  standard (float64) : {report['standard'] / 2**20:.1f} Mo\n"
+            f"  compact (float32) : {report['compact'] / 2**20:.1f} Mo\n"
+            f"  actuel ({mode}) : {report['current'] / 2**20:.1f} Mo")
+
+    def selected_columns(self):
+        """Columns needed by the windows selected in the display options"""
+        columns = []
+        for phase in range(1, 4):
+            if self.phase_vars[phase].get():
+                columns += phase_columns(phase)
+        for comp_type in ["Voltage", "Current", "Power"]:
+            if self.comparison_vars[comp_type].get():
+                columns += comparison_columns(comp_type)
+        if self.summary_var.get():
+            columns += POWER_COLUMNS
+        return columns
+
+    def open_selected_windows(self):
+        """Open the selected windows on the data already loaded (the missing
+        columns are read on demand)"""
+        if self.dataset is None:
+            messagebox.showinfo("Info", "Charger d'abord le fichier !")
+            return
+        try:
+            self.open_windows(self.dataset.file_path)
         except Exception as e:
             self.error_label.config(text=f"Error: {str(e)}")
+
+    def open_windows(self, file_path):
+        """Open the selected windows on the loaded dataset"""
+        # Create individual phase windows based on checkbox selection
+        for phase in range(1, 4):
+            if self.phase_vars[phase].get():
+                self.create_phase_window(phase, self.dataset)
+
+        # Create comparison windows based on checkbox selection
+        for comp_type in ["Voltage", "Current", "Power"]:
+            if self.comparison_vars[comp_type].get():
+                window = ComparisonWindow(self.root, self.dataset, comp_type)
+                self.add_range_target(window.window, window.set_time_range)
+
+        if self.summary_var.get():
+            SummaryWindow(self.root, self.dataset, self.set_time_range)
+
+        # Résumé du contrôle de qualité (vide si rien à signaler)
+        self.error_label.config(text=self.dataset.quality().short_summary())
+        if file_path is not None:
+            self.loaded_file_path = file_path  # Store the file path
+            if self.text_editor is not None : self.text_editor.open_file(self.loaded_file_path)
+
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # processus de calcul dans l'exécutable
     app = PowerMonitorApp()
     app.run()
@@ -0,0 +1,287 @@
+# *******************************************
+# Données de phases partagées entre les fenêtres
+# - Un seul chargement du fichier pour toutes les fenêtres
+# - Mise à jour partielle après édition du fichier
+#********************************************
+
+import bisect
+import io
+
+import numpy as np
+import pandas as pd
+
+TIME_FORMAT = '%d/%m/%Y %H:%M:%S'
+MEASURE_PREFIXES = ("voltagemoy", "currentmoy", "powermoy")
+
+
+def measure_columns(columns):
+    """Measurement columns (voltage, current, power of each phase)"""
+    return [col for col in columns if col.startswith(MEASURE_PREFIXES)]
+
+
+def phase_columns(phase):
+    """Columns shown by the window of one phase"""
+    return [f"voltagemoy{phase}", f"currentmoy{phase}", f"powermoy{phase}"]
+
+
+def comparison_columns(plot_type):
+    """Columns shown by a comparison window (phases 1 to 4)"""
+    prefix = {"Voltage": "voltagemoy", "Current": "currentmoy"}.get(plot_type, "powermoy")
+    return [f"{prefix}{phase}" for phase in range(1, 5)]
+
+
+def column_filter(columns):
+    """usecols argument of read_csv: the time column and `columns`, or
+    None to read every column"""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda col: col == 'time' or col in wanted
+
+
+# Position des caractères de 'jj/mm/aaaa hh:mm:ss' dans 'aaaa-mm-jjThh:mm:ss'
+ISO_ORDER = [6, 7, 8, 9, 5, 3, 4, 2, 0, 1, 10, 11, 12, 13, 14, 15, 16, 17, 18]
+
+
+def parse_times(times):
+    """Parse a column of TIME_FORMAT strings into datetime64[ns].
+
+    The characters are reordered to ISO 8601 in one numpy operation, much
+    faster than to_datetime with a format; any string not laid out exactly
+    like TIME_FORMAT falls back to to_datetime.
+    """
+    try:
+        raw = np.frombuffer(times.to_numpy(dtype='S20').tobytes(), np.uint8).reshape(-1, 20)
+        layout = ((raw[:, 19] == 0).all() and (raw[:, [2, 5]] == ord('/')).all()
+                  and (raw[:, 10] == ord(' ')).all() and (raw[:, [13, 16]] == ord(':')).all())
+        if not layout:
+            raise ValueError
+        iso = raw[:, ISO_ORDER]
+        iso[:, [4, 7]] = ord('-')
+        iso[:, 10] = ord('T')
+        return pd.Series(iso.copy().view('S19').ravel().astype('datetime64[ns]'), index=times.index)
+    except (ValueError, TypeError, UnicodeEncodeError):
+        return pd.to_datetime(times, format=TIME_FORMAT).astype('datetime64[ns]')
+
+
+def measure_dtype(compact=False):
+    """Storage type of the measurements: float32 in compact mode (the sensors
+    give 2 decimals, float32 keeps 7 significant digits)"""
+    return np.float32 if compact else np.float64
+
+
+def read_dtypes(file_columns, compact=False):
+    """dtype argument of read_csv, so that compact columns are never
+    parsed into float64 first"""
+    return {col: measure_dtype(compact) for col in measure_columns(file_columns)}
+
+
+def prepare_data(data, compact=False):
+    """Convert the raw columns read from the file (time, float measurements).
+
+    In compact mode the measurements are stored as float32 and every other
+    column (UNIX time...) is dropped. Sums and means must then be computed
+    in float64 (astype(np.float64)) to give the same figures.
+    """
+    # Toujours en nanosecondes (les calculs d'énergie divisent par 1e9)
+    if 'time' in data.columns and data['time'].dtype.kind != 'M':
+        data['time'] = parse_times(data['time'])
+    dtype = measure_dtype(compact)
+    for col in measure_columns(data.columns):
+        if data[col].dtype != dtype:
+            data[col] = data[col].astype(dtype)
+    if compact:
+        kept = ['time'] + measure_columns(data.columns)
+        if len(kept) != len(data.columns):
+            data = data[[col for col in data.columns if col in kept]]
+    return data
+
+
+def bytes_per_million_rows(data):
+    """Memory used by the rows of `data`, scaled to one million rows"""
+    if len(data) == 0:
+        return 0
+    return int(data.memory_usage(index=False, deep=True).sum() * 1_000_000 / len(data))
+
+
+def memory_report(dataset):
+    """Memory per million rows of the loaded measurements: standard storage
+    (float64, other columns of the file kept), compact storage and actual"""
+    measures = measure_columns(dataset.data.columns)
+    others = [col for col in dataset.file_columns if col != 'time' and col not in measure_columns([col])]
+    kept_others = len(others) if dataset.columns is None else 0
+    return {
+        'rows': len(dataset.data),
+        'columns': list(dataset.data.columns),
+        'standard': (8 + 8 * len(measures) + 8 * kept_others) * 1_000_000,
+        'compact': (8 + 4 * len(measures)) * 1_000_000,
+        'current': bytes_per_million_rows(dataset.data),
+    }
+
+
+class PhaseDataset:
+    """Phase data loaded once and shared by every window.
+
+    `data` holds the rows of the file in order with the 'time' column already
+    converted. Windows register a listener with add_listener() and are called
+    back with the dataset whenever its rows change; `version` is incremented
+    and `cache` (results derived from the rows) is emptied at the same time.
+    `unchanged_rows` tells how many leading rows the change left as they were
+    (rows appended at the end), for the windows that update incrementally;
+    `row_cache` holds series with one value per row (derived.py), cut back to
+    these rows so that only the new ones are computed again.
+
+    Only the columns used by the open windows may be loaded (`columns`, None
+    when every column is); the others are parsed when a window asks for them
+    with ensure_columns(). In `compact` mode the measurements are float32 and
+    the UNIX time column is not kept (see prepare_data).
+    """
+
+    def __init__(self, data, file_path=None, file_columns=None, time_range=None, columns=None,
+                 compact=False):
+        self.data = data
+        self.file_path = file_path
+        self.file_columns = list(file_columns if file_columns is not None else data.columns)
+        self.time_range = time_range  # (début, fin) si seule une plage du fichier est chargée
+        self.columns = set(columns) if columns is not None else None
+        self.compact = compact
+        self.version = 0
+        self.cache = {}
+        self.unchanged_rows = 0
+        self.row_cache = {}
+        self.listeners = []
+
+    @classmethod
+    def from_csv(cls, file_path, columns=None, compact=False):
+        """Load the file; with `columns`, only them and the time column"""
+        from loader import read_parallel
+        file_columns = list(pd.read_csv(file_path, sep=';', nrows=0).columns)
+        data = read_parallel(file_path, column_filter(columns), compact)
+        return cls(data, file_path, file_columns, columns=columns, compact=compact)
+
+    @classmethod
+    def from_range(cls, file_path, start, end, columns=None, compact=False):
+        """Load only the rows between the times start and end"""
+        from loader import load_range, read_header
+        data = load_range(file_path, start, end, usecols=column_filter(columns), compact=compact)
+        return cls(data, file_path, read_header(file_path)[0], (start, end), columns, compact)
+
+    def quality(self):
+        """Quality report of the rows (quality.scan), kept until they change"""
+        if 'quality' not in self.cache:
+            from quality import scan
+            self.cache['quality'] = scan(self.data)
+        return self.cache['quality']
+
+    def ensure_columns(self, columns):
+        """Parse the columns of the file that are not loaded yet"""
+        if self.columns is None:
+            return
+        missing = [col for col in columns if col in self.file_columns and col not in self.data.columns]
+        if not missing:
+            return
+        self.cache.pop('quality', None)  # valeurs des nouvelles colonnes à contrôler
+        self.columns.update(missing)
+        if self.time_range is not None:
+            from loader import load_range
+            data = load_range(self.file_path, *self.time_range, usecols=column_filter(missing),
+                              compact=self.compact)
+        else:
+            from loader import read_parallel
+            data = read_parallel(self.file_path, missing, self.compact)
+        if len(data) != len(self.data):
+            # Le fichier a changé depuis le chargement : relecture complète
+            self.reload()
+            return
+        for col in missing:
+            self.data[col] = data[col].to_numpy()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def changed(self, unchanged_rows=0):
+        """Rows were modified: invalidate derived results and tell the windows"""
+        self.version += 1
+        self.unchanged_rows = unchanged_rows
+        self.cache.clear()
+        self.row_cache = {key: values[:unchanged_rows] for key, values in self.row_cache.items()
+                          if unchanged_rows}
+        for listener in list(self.listeners):
+            listener(self)
+
+    def reload(self):
+        """Parse the whole file (or the loaded time range) again"""
+        if self.time_range is not None:
+            from loader import load_range, read_header
+            self.file_columns = read_header(self.file_path)[0]
+            self.data = load_range(self.file_path, *self.time_range, usecols=column_filter(self.columns),
+                                   compact=self.compact)
+        else:
+            from loader import read_parallel
+            self.file_columns = list(pd.read_csv(self.file_path, sep=';', nrows=0).columns)
+            self.data = read_parallel(self.file_path, column_filter(self.columns), self.compact)
+        self.changed()
+
+    def parse_lines(self, lines):
+        """Parse data lines of the file (without header) into rows"""
+        text = "\n".join(line for line in lines if line.strip())
+        if not text:
+            return self.data.iloc[0:0]
+        rows = pd.read_csv(io.StringIO(text), sep=';', header=None, names=self.file_columns,
+                           dtype=read_dtypes(self.file_columns, self.compact))
+        rows = prepare_data(rows, self.compact)
+        return rows[list(self.data.columns)]
+
+    def append_lines(self, lines):
+        """Rows of lines written at the end of the file since the load"""
+        rows = self.parse_lines(lines)
+        if not len(rows):
+            return
+        unchanged = len(self.data)
+        self.data = pd.concat([self.data, rows], ignore_index=True)
+        self.changed(unchanged_rows=unchanged)
+
+    def patch_lines(self, changes, blank_lines=()):
+        """Re-parse only the lines changed in the file and patch the rows.
+
+        `changes` holds (old_first, old_end, new_lines) hunks where old_first and
+        old_end are 0-based line numbers of the file before the change (line 0
+        is the header) and new_lines the text now in their place. `blank_lines`
+        lists the empty lines of the old file, which hold no row.
+        Raises ValueError if the header changed or only a time range of the
+        file is loaded: the rows must be reloaded.
+        """
+        if self.time_range is not None:
+            raise ValueError("Partial dataset")
+        def row_of(line):
+            return line - 1 - bisect.bisect_left(blank_lines, line)
+
+        patches = []
+        for old_first, old_end, new_lines in sorted(changes, key=lambda change: change[0]):
+            if old_first == 0:
+                raise ValueError("Header changed")
+            patches.append((row_of(old_first), row_of(old_end), self.parse_lines(new_lines)))
+        if not patches:
+            return
+
+        if all(len(rows) == end - start for start, end, rows in patches):
+            # Même nombre de lignes : modification en place
+            for start, end, rows in patches:
+                if end > start:
+                    for i, col in enumerate(self.data.columns):
+                        self.data.iloc[start:end, i] = rows[col].to_numpy()
+        else:
+            pieces = []
+            position = 0
+            for start, end, rows in patches:
+                pieces.append(self.data.iloc[position:start])
+                pieces.append(rows)
+                position = end
+            pieces.append(self.data.iloc[position:])
+            self.data = pd.concat(pieces, ignore_index=True)
+        # Les lignes avant la première modification sont inchangées
+        self.changed(unchanged_rows=patches[0][0])
@@ -0,0 +1,116 @@
+# *******************************************
+# Grandeurs calculées à partir des mesures des phases
+# - Déséquilibre de tension et de courant (%), courant de neutre estimé,
+#   rapport max/min des courants, part de chaque phase dans la puissance
+# - Définies une fois dans REGISTRY, calculées à la première utilisation
+#   sur toutes les lignes (numpy) et gardées par le PhaseDataset : après un
+#   ajout de lignes seules les nouvelles sont calculées
+#********************************************
+
+import numpy as np
+import pandas as pd
+
+from dataset import measure_dtype
+
+REGISTRY = {}
+
+
+class DerivedMetric:
+    """A series computed row by row from base columns"""
+
+    def __init__(self, name, label, unit, columns, compute):
+        self.name = name
+        self.label = label
+        self.unit = unit
+        self.columns = columns
+        self.compute = compute  # compute(*colonnes en float64) -> valeurs
+
+    @property
+    def title(self):
+        return f"{self.label} ({self.unit})" if self.unit else self.label
+
+
+def register(name, label, unit, columns):
+    """Decorator adding a metric to the registry"""
+    def decorate(compute):
+        REGISTRY[name] = DerivedMetric(name, label, unit, columns, compute)
+        return compute
+    return decorate
+
+
+def imbalance(*phases):
+    """Largest deviation from the mean of the phases, in % of the mean"""
+    values = np.stack(phases)
+    mean = values.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.abs(values - mean).max(axis=0) / mean * 100
+
+
+VOLTAGES = [f"voltagemoy{phase}" for phase in range(1, 4)]
+CURRENTS = [f"currentmoy{phase}" for phase in range(1, 4)]
+POWERS = [f"powermoy{phase}" for phase in range(1, 4)]
+
+register("voltage_imbalance", "Déséquilibre tension", "%", VOLTAGES)(imbalance)
+register("current_imbalance", "Déséquilibre courant", "%", CURRENTS)(imbalance)
+
+
+@register("neutral_current", "Courant de neutre estimé", "A", CURRENTS)
+def neutral_current(i1, i2, i3):
+    # Courants déphasés de 120° avec le même facteur de puissance
+    return np.sqrt(np.maximum(i1 ** 2 + i2 ** 2 + i3 ** 2 - i1 * i2 - i2 * i3 - i3 * i1, 0))
+
+
+@register("current_ratio", "Rapport max/min des courants", "", CURRENTS)
+def current_ratio(i1, i2, i3):
+    values = np.stack((i1, i2, i3))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = values.max(axis=0) / values.min(axis=0)
+    ratio[~np.isfinite(ratio)] = np.nan
+    return ratio
+
+
+def power_share(phase):
+    def share(p1, p2, p3):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (p1, p2, p3)[phase - 1] / (p1 + p2 + p3) * 100
+    return share
+
+
+for _phase in range(1, 4):
+    register(f"power_share{_phase}", f"Part de puissance phase {_phase}", "%", POWERS)(power_share(_phase))
+
+
+def derived_values(dataset, name):
+    """Values of a metric for every row of the dataset, computed once.
+
+    They are kept in dataset.row_cache: when rows are appended only the new
+    rows are computed, when rows change everything is computed again."""
+    metric = REGISTRY[name]
+    dataset.ensure_columns(metric.columns)
+    cached = dataset.row_cache.get(('derived', name))
+    if cached is not None and len(cached) == len(dataset.data):
+        return cached
+    done = 0 if cached is None else len(cached)
+    tail = [dataset.data[col].iloc[done:].to_numpy(dtype=np.float64) for col in metric.columns]
+    values = metric.compute(*tail).astype(measure_dtype(dataset.compact))
+    if done:
+        values = np.concatenate((cached, values))
+    dataset.row_cache[('derived', name)] = values
+    return values
+
+
+def derived_frame(dataset, names, start=None, end=None):
+    """'time' and the metrics `names` between start and end (included, all
+    the rows without them) as a DataFrame like the base rows, for the plots
+    and resample()"""
+    data = dataset.data
+    columns = {name: derived_values(dataset, name) for name in names}
+    times = data['time'].to_numpy(dtype='datetime64[ns]')
+    if start is None or end is None:
+        rows = slice(None)
+    elif len(times) < 2 or (np.diff(times.view(np.int64)) >= 0).all():
+        rows = slice(int(np.searchsorted(times, np.datetime64(pd.Timestamp(start), 'ns'), 'left')),
+                     int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), 'ns'), 'right')))
+    else:
+        rows = (times >= np.datetime64(pd.Timestamp(start), 'ns')) & (times <= np.datetime64(pd.Timestamp(end), 'ns'))
+    return pd.DataFrame({'time': times[rows], **{name: values[rows] for name, values in columns.items()}})
@@ -0,0 +1,103 @@
+# *******************************************
+# Distribution des mesures sur une plage de temps
+# - Histogramme pondéré par le temps (heures passées dans chaque classe) et
+#   monotone de charge (puissance classée, en % du temps)
+# - Chaque ligne compte pour la moitié des intervalles qui l'entourent,
+#   trous exclus : un échantillonnage irrégulier ne fausse pas la durée
+# - Ordre de tri de chaque colonne calculé une fois et gardé dans le cache du
+#   PhaseDataset : une nouvelle plage ou un nouveau filtre ne demande qu'une
+#   sélection des lignes dans cet ordre, sans nouveau tri
+#********************************************
+
+import numpy as np
+
+
+def sample_seconds(times_ns, gap_ns=None):
+    """Time represented by each row (s): half the interval to the previous
+    row plus half the interval to the next one, intervals longer than gap_ns
+    (gaps) left out"""
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    if len(times_ns) < 2:
+        return np.zeros(len(times_ns))
+    steps = np.diff(times_ns).astype(np.float64) / 1e9
+    steps[steps < 0] = 0.0
+    if gap_ns is not None:
+        steps[steps > gap_ns / 1e9] = 0.0
+    half = steps / 2
+    return np.concatenate((half, [0.0])) + np.concatenate(([0.0], half))
+
+
+class SortedColumn:
+    """Values of a column in increasing order (missing values left out), with
+    the row of each value and its time weight"""
+
+    def __init__(self, values, weights):
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(values, kind='stable')
+        order = order[~np.isnan(values[order])]
+        self.rows = order
+        self.values = values[order]
+        self.weights = np.asarray(weights, dtype=np.float64)[order]
+
+    @classmethod
+    def for_dataset(cls, dataset, column, gap_ns=None):
+        """Sorted column of a PhaseDataset, kept in its cache until the rows change"""
+        key = ('sorted', column, gap_ns)
+        if key not in dataset.cache:
+            times = dataset.data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            dataset.cache[key] = cls(dataset.data[column].to_numpy(), sample_seconds(times, gap_ns))
+        return dataset.cache[key]
+
+    def select(self, rows=None):
+        """Distribution of the selected rows (boolean mask over all the rows,
+        None: all of them)"""
+        if rows is None:
+            return Distribution(self.values, self.weights)
+        keep = np.asarray(rows, dtype=bool)[self.rows]
+        return Distribution(self.values[keep], self.weights[keep])
+
+
+class Distribution:
+    """Sorted values and their time weights (s)"""
+
+    def __init__(self, values, weights):
+        self.values = values
+        # Temps cumulé jusqu'à chaque valeur incluse (le premier élément vaut 0)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(weights)))
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def total_seconds(self):
+        return float(self.cumulative[-1])
+
+    def histogram(self, bins=50, value_range=None):
+        """Hours spent in each class: (hours, edges). The classes are
+        [edge, next edge), the last one includes its upper edge."""
+        if value_range is None:
+            value_range = (self.values[0], self.values[-1]) if len(self) else (0.0, 1.0)
+        low, high = value_range
+        if high <= low:
+            high = low + 1.0
+        edges = np.linspace(low, high, bins + 1)
+        # Valeurs triées : limites des classes par recherche dichotomique
+        positions = np.searchsorted(self.values, edges, 'left')
+        positions[-1] = np.searchsorted(self.values, edges[-1], 'right')
+        return np.diff(self.cumulative[positions]) / 3600, edges
+
+    def duration_curve(self, points=1000):
+        """Load duration curve: (percent of time, value) with the values in
+        decreasing order, `points` points at most"""
+        if len(self) == 0 or self.total_seconds == 0:
+            return np.zeros(0), np.zeros(0)
+        # Temps passé au-dessus de chaque valeur, de la plus forte à la plus faible
+        above = self.total_seconds - self.cumulative[:-1]
+        percent = np.linspace(0.0, 100.0, min(points, len(self)))
+        # Valeur dépassée pendant `percent` % du temps
+        k = np.searchsorted(-above, -percent * self.total_seconds / 100, 'right') - 1
+        return percent, self.values[np.clip(k, 0, len(self) - 1)]
+
+    def time_above(self, value):
+        """Hours spent at or above value"""
+        return (self.total_seconds - self.cumulative[np.searchsorted(self.values, value, 'left')]) / 3600
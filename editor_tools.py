@@ -0,0 +1,282 @@
+# *******************************************
+# Outils de l'éditeur de fichiers CSV/TXT
+# - Suivi incrémental des lignes (nombre de champs, lignes modifiées)
+# - Recherche/remplacement en arrière-plan sur le fichier
+#********************************************
+
+import bisect
+import os
+import queue
+import re
+import threading
+from collections import Counter
+
+
+class LineIndex:
+    """Per-line bookkeeping of the editor content, updated edit by edit.
+
+    For every current line we keep the number of fields, a reference to the
+    original line it comes from (or None for an inserted line) and whether it
+    differs from that original. The original content is only kept as one hash
+    per line, so an edit costs time proportional to the lines it touches.
+    """
+
+    # Au-delà de ce nombre de comparaisons on aligne les lignes par position
+    MAX_ALIGN = 1_000_000
+
+    def __init__(self, lines=(), separator=';'):
+        self.separator = separator
+        self.reset(lines)
+
+    def reset(self, lines):
+        """Take `lines` as the new reference content (file opened or saved)"""
+        lines = list(lines)
+        self.original_hashes = [hash(line) for line in lines]
+        self.refs = list(range(len(lines)))
+        self.modified = [False] * len(lines)
+        self.modified_count = 0
+        self.dropped = []  # lignes d'origine supprimées (triées)
+        self.field_counts = [self.count_fields(line) for line in lines]
+        self.histogram = Counter(c for c in self.field_counts if c)
+        self.original_blank = [i for i, c in enumerate(self.field_counts) if not c]
+
+    def count_fields(self, line):
+        """Number of fields of a line, 0 for an empty line"""
+        return line.count(self.separator) + 1 if line.strip() else 0
+
+    @property
+    def line_count(self):
+        return len(self.refs)
+
+    def is_modified(self):
+        """True if the content differs from the reference content"""
+        return self.modified_count > 0 or bool(self.dropped)
+
+    def is_consistent(self):
+        """True if every non-empty line has the same number of fields"""
+        return len(self.histogram) <= 1
+
+    def expected_fields(self):
+        """Number of fields of the first line (header)"""
+        return self.field_counts[0] if self.field_counts else 0
+
+    def replace(self, first, old_count, new_lines):
+        """Replace lines [first, first + old_count) (0-based) by `new_lines`.
+
+        Returns the list of "modified" flags of the new lines.
+        """
+        end = first + old_count
+        new_lines = list(new_lines)
+
+        # Histogramme du nombre de champs
+        for count in self.field_counts[first:end]:
+            if count:
+                self.histogram[count] -= 1
+                if not self.histogram[count]:
+                    del self.histogram[count]
+        new_counts = [self.count_fields(line) for line in new_lines]
+        self.histogram.update(c for c in new_counts if c)
+        self.field_counts[first:end] = new_counts
+
+        # Alignement des nouvelles lignes sur les lignes d'origine remplacées et
+        # sur celles supprimées à cet endroit : une ligne retapée à l'identique
+        # ou une suppression annulée retrouve sa ligne d'origine
+        low = self._neighbour_ref(first - 1, -1, -1)
+        high = self._neighbour_ref(end, 1, len(self.original_hashes))
+        lo = bisect.bisect_right(self.dropped, low)
+        hi = bisect.bisect_left(self.dropped, high)
+        old_refs = sorted([r for r in self.refs[first:end] if r is not None] + self.dropped[lo:hi])
+        new_hashes = [hash(line) for line in new_lines]
+        new_refs = self._align(old_refs, new_hashes)
+        kept = set(new_refs)
+        self.dropped[lo:hi] = [r for r in old_refs if r not in kept]
+
+        new_modified = [ref is None or h != self.original_hashes[ref]
+                        for ref, h in zip(new_refs, new_hashes)]
+        self.modified_count += sum(new_modified) - sum(self.modified[first:end])
+        self.modified[first:end] = new_modified
+        self.refs[first:end] = new_refs
+        return new_modified
+
+    def set_original(self, index, line):
+        """Line `index` (0-based, unmodified) now holds `line` in the saved file"""
+        ref = self.refs[index]
+        self.original_hashes[ref] = hash(line)
+        old_count = self.field_counts[index]
+        if old_count:
+            self.histogram[old_count] -= 1
+            if not self.histogram[old_count]:
+                del self.histogram[old_count]
+        self.field_counts[index] = self.count_fields(line)
+        if self.field_counts[index]:
+            self.histogram[self.field_counts[index]] += 1
+
+        position = bisect.bisect_left(self.original_blank, ref)
+        is_blank = position < len(self.original_blank) and self.original_blank[position] == ref
+        if is_blank and self.field_counts[index]:
+            del self.original_blank[position]
+        elif not is_blank and not self.field_counts[index]:
+            self.original_blank.insert(position, ref)
+
+    def changed_ranges(self):
+        """Hunks (old_first, old_end, new_first, new_end) changed since the
+        reference content, as 0-based half-open line ranges"""
+        if not self.is_modified():
+            return []
+        hunks = []
+        prev_old = prev_new = -1
+        for new, (ref, modified) in enumerate(zip(self.refs, self.modified)):
+            if ref is None or modified:
+                continue
+            if ref != prev_old + 1 or new != prev_new + 1:
+                hunks.append((prev_old + 1, ref, prev_new + 1, new))
+            prev_old, prev_new = ref, new
+        if prev_old + 1 != len(self.original_hashes) or prev_new + 1 != len(self.refs):
+            hunks.append((prev_old + 1, len(self.original_hashes), prev_new + 1, len(self.refs)))
+        return hunks
+
+    def _neighbour_ref(self, index, step, default):
+        """First original line found from line `index` going by `step`"""
+        while 0 <= index < len(self.refs):
+            if self.refs[index] is not None:
+                return self.refs[index]
+            index += step
+        return default
+
+    def _align(self, old_refs, new_hashes):
+        """Match new lines with the original lines they replace"""
+        if len(old_refs) * len(new_hashes) > self.MAX_ALIGN:
+            return old_refs[:len(new_hashes)] + [None] * (len(new_hashes) - len(old_refs))
+
+        refs = []
+        j = 0
+        for k, h in enumerate(new_hashes):
+            match = None
+            for p in range(j, len(old_refs)):
+                if old_refs[p] is not None and self.original_hashes[old_refs[p]] == h:
+                    match = p
+                    break
+            if match is not None:
+                refs.append(old_refs[match])
+                j = match + 1
+            elif j < len(old_refs) and (k == 0 or len(old_refs) - j >= len(new_hashes) - k):
+                # Ligne modifiée sur place
+                refs.append(old_refs[j])
+                j += 1
+            else:
+                refs.append(None)
+        return refs
+
+
+def compile_pattern(text, regex=False, case_sensitive=True):
+    """Compile the search text (literal or regular expression)"""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(text if regex else re.escape(text), flags)
+
+
+def file_lines(file_path):
+    """Lines of a file without their line ending, read lazily"""
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        for line in file:
+            yield line.rstrip('\r\n')
+
+
+class SearchWorker(threading.Thread):
+    """Background search; matches (line, start column, end column) arrive
+    by batches in `results`, followed by None once the search is over."""
+
+    BATCH = 500
+
+    def __init__(self, lines, pattern):
+        super().__init__(daemon=True)
+        self.lines = lines  # fonction renvoyant un itérateur de lignes
+        self.pattern = pattern
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.error = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        batch = []
+        try:
+            for line_num, line in enumerate(self.lines(), 1):
+                if self.cancelled.is_set():
+                    break
+                for match in self.pattern.finditer(line):
+                    if match.end() > match.start():  # ignorer les correspondances vides
+                        batch.append((line_num, match.start(), match.end()))
+                if len(batch) >= self.BATCH:
+                    self.results.put(batch)
+                    batch = []
+        except Exception as e:
+            self.error = e
+        finally:
+            if batch:
+                self.results.put(batch)
+            self.results.put(None)
+
+
+def stream_replace(file_path, pattern, replacement, regex=False, cancelled=None, max_changes=100_000):
+    """Rewrite `file_path` line by line with every match replaced.
+
+    The result goes to a temporary file which then replaces the original, so
+    memory does not depend on the file size. Returns (number of replacements,
+    {line number: new line}) or None if cancelled; the dictionary is None when
+    too many lines changed (or a line was split) to patch the editor in place.
+    """
+    if not regex:
+        replacement = replacement.replace('\\', '\\\\')
+    tmp_path = file_path + ".tmp"
+    total = 0
+    changed = {}
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='') as src, \
+                open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+            for line_num, line in enumerate(src, 1):
+                if cancelled is not None and cancelled.is_set():
+                    raise InterruptedError
+                body = line.rstrip('\r\n')
+                new_body, count = pattern.subn(replacement, body)
+                if count:
+                    total += count
+                    if changed is not None:
+                        if len(changed) >= max_changes or '\n' in new_body or '\r' in new_body:
+                            changed = None
+                        else:
+                            changed[line_num] = new_body
+                dst.write(new_body + line[len(body):])
+    except InterruptedError:
+        os.remove(tmp_path)
+        return None
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, file_path)
+    return total, changed
+
+
+class ReplaceWorker(threading.Thread):
+    """Run stream_replace in the background; `result` is set when done"""
+
+    def __init__(self, file_path, pattern, replacement, regex=False):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.pattern = pattern
+        self.replacement = replacement
+        self.regex = regex
+        self.cancelled = threading.Event()
+        self.result = None
+        self.error = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            self.result = stream_replace(self.file_path, self.pattern, self.replacement,
+                                         self.regex, self.cancelled)
+        except Exception as e:
+            self.error = e
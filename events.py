@@ -0,0 +1,286 @@
+# *******************************************
+# Détection des événements (qualité de l'alimentation)
+# - Creux de tension, surtensions, surintensités et pics de puissance de
+#   chaque phase : franchissement d'un seuil avec hystérésis (l'événement
+#   commence au-delà du seuil et finit en revenant en deçà du seuil de
+#   retour) et durée minimale
+# - Une passe numpy par colonne : plages des lignes hors seuil de retour
+#   (codage par plages), début au premier franchissement du seuil, pointe
+# - Lecture par morceaux : un événement en cours à la fin d'un morceau
+#   continue dans le suivant (mode direct, lignes ajoutées au fichier)
+# - Mesure des performances (une année à 1 Hz) :
+#     python events.py bench --rows 31536000
+#********************************************
+
+import argparse
+import time as time_module
+
+import numpy as np
+import pandas as pd
+
+NS_PER_SECOND = 1_000_000_000
+EVENT_COLUMNS = ['start', 'end', 'duration', 'event', 'column', 'phase', 'peak', 'peak_time', 'open']
+
+
+class EventRule:
+    """One kind of event on the columns starting with `prefix`: the value goes
+    above (direction "above") or below ("below") `trigger`, the event lasts
+    until it comes back to `release`. Shorter events than `min_duration`
+    seconds are not reported."""
+
+    def __init__(self, name, prefix, direction, trigger, release, min_duration=0.0):
+        if direction not in ("above", "below"):
+            raise ValueError(f"Unknown direction: {direction}")
+        sign = 1 if direction == "above" else -1
+        if sign * release > sign * trigger:
+            raise ValueError(f"{name}: release threshold beyond the trigger threshold")
+        self.name = name
+        self.prefix = prefix
+        self.direction = direction
+        self.trigger = trigger
+        self.release = release
+        self.min_duration = min_duration
+
+    @property
+    def sign(self):
+        return 1.0 if self.direction == "above" else -1.0
+
+
+# Seuils par défaut : tension nominale 230 V +/- 10 %
+EVENT_RULES = [
+    EventRule("Creux de tension", "voltagemoy", "below", 207.0, 212.0),
+    EventRule("Surtension", "voltagemoy", "above", 253.0, 248.0),
+    EventRule("Surintensité", "currentmoy", "above", 32.0, 30.0, 1.0),
+    EventRule("Pic de puissance", "powermoy", "above", 7000.0, 6500.0),
+]
+# Événements montrés par chaque fenêtre de comparaison
+PLOT_PREFIXES = {"Voltage": "voltagemoy", "Current": "currentmoy", "Power": "powermoy"}
+
+
+def scan_column(times, values, rule, gap_ns=None, carry=None):
+    """Events of one column in a chunk of rows (times in ns, increasing).
+
+    `carry` is the state returned for the previous chunk: an event still in
+    progress at its end goes on in this one. Returns the closed events as
+    (start_ns, end_ns, peak, peak_time_ns) arrays and the new state. A gap
+    longer than `gap_ns` between two rows ends the event.
+    """
+    carry = carry or {'last_time': None, 'open': None}
+    empty = np.array([], dtype=np.int64)
+    closed = [(empty, empty, np.array([]), empty)]
+    n = len(times)
+    if n == 0:
+        return closed[0], carry
+
+    sign = rule.sign
+    values = np.asarray(values)
+    # Seule passe sur toutes les lignes : lignes au-delà du seuil de retour
+    # (valeurs manquantes : fin de l'événement), la suite ne porte que sur elles
+    with np.errstate(invalid='ignore'):
+        beyond = np.flatnonzero(values > rule.release if sign > 0 else values < rule.release)
+
+    opened = carry['open']
+    continues = opened is not None and not (gap_ns is not None and times[0] - carry['last_time'] > gap_ns)
+    forced = continues and len(beyond) > 0 and beyond[0] == 0  # suite de l'événement en cours
+    if opened is not None and not forced:
+        # L'événement en cours s'est terminé avec le morceau précédent
+        start, peak, peak_time = opened
+        closed.append((np.array([start]), np.array([carry['last_time']]), np.array([peak]),
+                       np.array([peak_time])))
+    open_event = None
+    if len(beyond):
+        signed = values[beyond].astype(np.float64) * sign  # "below" ramené à "above"
+
+        # Plages de lignes consécutives (sans trou) au-delà du seuil de retour
+        new_run = np.empty(len(beyond), dtype=bool)
+        new_run[0] = not forced
+        new_run[1:] = np.diff(beyond) > 1
+        if gap_ns is not None:
+            after = beyond > 0
+            new_run[after] |= (times[beyond[after]] - times[beyond[after] - 1]) > gap_ns
+        run_first = np.flatnonzero(new_run)
+        if forced:
+            run_first = np.concatenate(([0], run_first))
+        run_last = np.append(run_first[1:] - 1, len(beyond) - 1)
+
+        # Début de l'événement : premier franchissement du seuil dans la plage
+        entries = np.flatnonzero(signed > sign * rule.trigger)
+        k = np.searchsorted(entries, run_first)
+        first = entries[np.minimum(k, len(entries) - 1)] if len(entries) else np.zeros(len(k), dtype=np.intp)
+        valid = (k < len(entries)) & (first <= run_last)
+        if forced:
+            valid[0] = True
+            first[0] = 0
+        first, last = first[valid], run_last[valid]
+
+        if len(first):
+            # Pointe de chaque événement (la première en cas d'égalité)
+            bounds = np.column_stack((first, last + 1)).ravel()
+            maxima = np.maximum.reduceat(signed, bounds[bounds < len(signed)])[::2]
+            marks = np.zeros(len(signed) + 1, dtype=np.int64)
+            marks[first] += 1
+            marks[last + 1] -= 1
+            inside = np.cumsum(marks[:-1]) > 0
+            starts = np.zeros(len(signed), dtype=np.int64)
+            starts[first] = 1
+            number = np.cumsum(starts) - 1
+            hits = np.flatnonzero(inside & (signed == maxima[number]))
+            hits = hits[np.concatenate(([True], np.diff(number[hits]) != 0))]
+
+            event_start = times[beyond[first]].astype(np.int64)
+            event_end = times[beyond[last]].astype(np.int64)
+            peak = values[beyond[hits]].astype(np.float64)
+            peak_time = times[beyond[hits]].astype(np.int64)
+            if forced:
+                event_start[0] = opened[0]
+                if sign * opened[1] >= sign * peak[0]:
+                    peak[0], peak_time[0] = opened[1], opened[2]
+            if beyond[last[-1]] == n - 1:
+                # Toujours en cours à la fin du morceau
+                open_event = (int(event_start[-1]), float(peak[-1]), int(peak_time[-1]))
+                event_start, event_end, peak, peak_time = event_start[:-1], event_end[:-1], peak[:-1], peak_time[:-1]
+            closed.append((event_start, event_end, peak, peak_time))
+
+    result = tuple(np.concatenate(parts) for parts in zip(*closed))
+    return result, {'last_time': int(times[-1]), 'open': open_event}
+
+
+class EventDetector:
+    """Event table of the phase columns, fed chunk after chunk.
+
+    feed() scans new rows (live mode); update() follows a PhaseDataset after
+    a change, scanning only the appended rows when the rows fed before are
+    unchanged. table() gives the events, ordered by start time, including
+    the ones still in progress ('open').
+    """
+
+    def __init__(self, rules=EVENT_RULES, phases=(1, 2, 3), gap_ns=None):
+        self.rules = list(rules)
+        self.phases = list(phases)
+        self.gap_ns = gap_ns
+        self.reset()
+
+    def reset(self):
+        self.rows = 0
+        self.carry = {}
+        self.closed = {}  # événements terminés : (start, end, peak, peak_time) par morceau et par colonne
+        self.cached = None
+
+    def targets(self, columns):
+        """(rule, column, phase) scanned among the available columns"""
+        return [(rule, f"{rule.prefix}{phase}", phase) for rule in self.rules for phase in self.phases
+                if f"{rule.prefix}{phase}" in columns]
+
+    def feed(self, times_ns, values):
+        """Scan new rows: times in ns and {column: values}"""
+        times_ns = np.asarray(times_ns, dtype=np.int64)
+        if len(times_ns) == 0:
+            return
+        for rule, column, phase in self.targets(values):
+            key = (rule.name, column, phase)
+            events, self.carry[key] = scan_column(times_ns, values[column], rule, self.gap_ns,
+                                                  self.carry.get(key))
+            if len(events[0]):
+                self.closed.setdefault(key, []).append(events)
+        self.rows += len(times_ns)
+        self.cached = None
+
+    def update(self, data, unchanged_rows=0):
+        """Follow the rows of a dataset: only the rows after the ones already
+        scanned when these did not change, else everything again"""
+        if not self.rows or unchanged_rows < self.rows:
+            self.reset()
+        tail = data.iloc[self.rows:]
+        times = tail['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.feed(times, {col: tail[col].to_numpy() for col in tail.columns if col != 'time'})
+
+    @staticmethod
+    def records(rule, column, phase, start, end, peak, peak_time, is_open):
+        return pd.DataFrame({
+            'start': start.view('datetime64[ns]'),
+            'end': end.view('datetime64[ns]'),
+            'duration': (end - start) / NS_PER_SECOND,
+            'event': rule.name,
+            'column': column,
+            'phase': phase,
+            'peak': peak,
+            'peak_time': peak_time.view('datetime64[ns]'),
+            'open': is_open,
+        })
+
+    def table(self):
+        """All the events long enough, ordered by start time"""
+        if self.cached is None:
+            rules = {rule.name: rule for rule in self.rules}
+            parts = []
+            for (name, column, phase), chunks in self.closed.items():
+                arrays = [np.concatenate(parts) for parts in zip(*chunks)]
+                parts.append(self.records(rules[name], column, phase, *arrays, False))
+            for (name, column, phase), carry in self.carry.items():
+                if carry['open'] is not None:
+                    start, peak, peak_time = carry['open']
+                    parts.append(self.records(rules[name], column, phase, np.array([start]),
+                                              np.array([carry['last_time']]), np.array([peak]),
+                                              np.array([peak_time]), True))
+            parts = [part for part in parts if len(part)]
+            if parts:
+                table = pd.concat(parts, ignore_index=True)
+                minimum = table['event'].map({name: rule.min_duration for name, rule in rules.items()})
+                table = table[table['duration'] >= minimum]
+                self.cached = table.sort_values('start', kind='stable').reset_index(drop=True)
+            else:
+                self.cached = pd.DataFrame({col: [] for col in EVENT_COLUMNS})
+        return self.cached
+
+    def events_between(self, start, end, prefix=None):
+        """Events starting between start and end (on the `prefix` columns only)"""
+        table = self.table()
+        times = table['start'].to_numpy(dtype='datetime64[ns]')
+        first = int(np.searchsorted(times, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+        last = int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), 'ns'), 'right'))
+        table = table.iloc[first:last]
+        if prefix is not None:
+            table = table[table['column'].str.startswith(prefix)]
+        return table
+
+
+# ****************************************Mesure des performances
+
+def bench(rows, chunk_rows=None, events=2000):
+    """Scan time of synthetic 1 Hz rows (phases 1 to 3, float32 like the
+    compact mode) with `events` sags and as many swells per phase"""
+    rng = np.random.default_rng(0)
+    times = np.int64(1_735_689_600) * NS_PER_SECOND + np.arange(rows, dtype=np.int64) * NS_PER_SECOND
+    values = {}
+    for phase in range(1, 4):
+        voltage = 230 + 5 * np.sin(np.arange(rows) / 50000 + phase) + rng.normal(0, 1, rows)
+        for level in (195, 262):
+            for first in rng.integers(0, rows, events):
+                voltage[first:first + rng.integers(1, 30)] = level + rng.normal(0, 2)
+        values[f"voltagemoy{phase}"] = voltage.astype(np.float32)
+        values[f"currentmoy{phase}"] = rng.gamma(2.0, 2.0, rows).astype(np.float32)
+        values[f"powermoy{phase}"] = values[f"voltagemoy{phase}"] * values[f"currentmoy{phase}"]
+    print(f"{rows:,} lignes, {len(values)} colonnes")
+
+    detector = EventDetector(gap_ns=10 * NS_PER_SECOND)
+    started = time_module.perf_counter()
+    step = chunk_rows or rows
+    for first in range(0, rows, step):
+        detector.feed(times[first:first + step], {col: v[first:first + step] for col, v in values.items()})
+    table = detector.table()
+    elapsed = time_module.perf_counter() - started
+    print(f"{len(table):,} événements en {elapsed:.2f} s ({rows / elapsed / 1e6:.1f} M lignes/s)")
+    print(table.groupby('event').size().to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Détection des événements sur les mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    bench_parser = commands.add_parser("bench", help="temps de détection sur des données synthétiques")
+    bench_parser.add_argument("--rows", type=int, default=31_536_000)
+    bench_parser.add_argument("--chunk", type=int, help="lignes par morceau (mode direct)")
+    args = parser.parse_args()
+    if args.command == "bench":
+        bench(args.rows, args.chunk)
+    else:
+        parser.print_help()
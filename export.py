@@ -0,0 +1,206 @@
+# *******************************************
+# Export d'une plage de mesures vers un fichier
+# - Parquet et Arrow IPC (Feather) avec pyarrow (facultatif), CSV ';' au
+#   format des fichiers journaux
+# - Lignes de la plage de temps et des filtres de valeurs, séries dérivées
+#   en option, ou profil rééchantillonné (moyennes par intervalle)
+# - Écriture par paquets de lignes pris directement dans les tableaux en
+#   mémoire (vues numpy) : exporter un mois ne double pas la mémoire
+# - En ligne de commande :
+#     python export.py write fichier.csv extrait.parquet --start "2025-03-01" --end "2025-03-08"
+#********************************************
+
+import argparse
+import os
+import time as time_module
+
+import numpy as np
+import pandas as pd
+
+from dataset import measure_columns
+from derived import REGISTRY, derived_values
+from resample import RESOLUTIONS, resample
+
+try:
+    import pyarrow as pa  # Parquet et Feather seulement
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = {".parquet": "Parquet", ".feather": "Feather", ".arrow": "Feather", ".csv": "CSV"}
+FILE_TYPES = [("Parquet", "*.parquet"), ("Arrow IPC / Feather", "*.feather *.arrow"), ("CSV", "*.csv")]
+BATCH_ROWS = 65536
+
+
+class ExportResult:
+    """Rows and bytes written, and time taken"""
+
+    def __init__(self, path, rows, seconds):
+        self.path = path
+        self.rows = rows
+        self.seconds = seconds
+        self.bytes = os.path.getsize(path)
+
+    def summary(self):
+        rate = self.rows / self.seconds if self.seconds > 0 else float('inf')
+        return (f"{self.rows:,} lignes exportées dans {os.path.basename(self.path)} "
+                f"({self.bytes / 1e6:.1f} Mo, {self.seconds:.2f} s, {rate:,.0f} lignes/s)")
+
+
+def file_format(path):
+    """Format name from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Format de fichier non pris en charge : {extension or path}")
+    return FORMATS[extension]
+
+
+def format_times(times_ns):
+    """datetime64[ns] to TIME_FORMAT strings, by moving the bytes of the ISO
+    strings numpy writes (the reverse of dataset.parse_times)"""
+    iso = np.datetime_as_string(np.asarray(times_ns).astype('datetime64[s]')).astype('S19')
+    iso = iso.view(np.uint8).reshape(-1, 19)
+    # 'YYYY-MM-DDTHH:MM:SS' -> 'DD/MM/YYYY HH:MM:SS'
+    text = np.empty_like(iso)
+    text[:, 0:2] = iso[:, 8:10]
+    text[:, 3:5] = iso[:, 5:7]
+    text[:, 6:10] = iso[:, 0:4]
+    text[:, [2, 5]] = ord('/')
+    text[:, 10] = ord(' ')
+    text[:, 11:19] = iso[:, 11:19]
+    return text.view('S19').ravel().astype(str)
+
+
+def row_range(times, start=None, end=None):
+    """First and last+1 positions of the rows between start and end (both
+    included) of sorted times"""
+    first = 0 if start is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+    last = len(times) if end is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(end), 'ns'), 'right'))
+    return first, max(first, last)
+
+
+def selection_columns(dataset, columns=None, derived=()):
+    """{name: array with one value per row}: 'time', the measurement columns
+    and the derived series, without copies"""
+    if columns is None:
+        columns = measure_columns(dataset.data.columns)
+    dataset.ensure_columns(columns)
+    data = dataset.data
+    arrays = {'time': data['time'].to_numpy(dtype='datetime64[ns]')}
+    arrays.update((col, data[col].to_numpy()) for col in columns)
+    arrays.update((name, derived_values(dataset, name)) for name in derived)
+    return arrays
+
+
+def iter_batches(arrays, first, last, keep=None, batch_rows=BATCH_ROWS):
+    """{name: array} batches of the rows first..last-1: slices of the arrays
+    (views), with the rows where `keep` (mask over all the rows) is False
+    left out"""
+    for begin in range(first, last, batch_rows):
+        end = min(begin + batch_rows, last)
+        batch = {name: values[begin:end] for name, values in arrays.items()}
+        if keep is not None:
+            rows = keep[begin:end]
+            if not rows.all():
+                batch = {name: values[rows] for name, values in batch.items()}
+        if len(batch['time']):
+            yield batch
+
+
+def write_batches(batches, path, fmt=None):
+    """Write {name: array} batches, all with the same names, to path; returns
+    the number of rows"""
+    fmt = fmt or file_format(path)
+    if fmt != "CSV" and pa is None:
+        raise ImportError("pyarrow est nécessaire pour les formats Parquet et Feather (pip install pyarrow)")
+    rows = 0
+    writer = None
+    try:
+        for batch in batches:
+            if fmt == "CSV":
+                if writer is None:
+                    writer = open(path, "w", encoding="utf-8", newline="")
+                # Valeurs écrites au plus court (230.45 et non 230.44999999)
+                frame = pd.DataFrame({name: format_times(values) if name == 'time' else values
+                                      for name, values in batch.items()})
+                frame.to_csv(writer, sep=';', index=False, header=rows == 0)
+            else:
+                record = pa.record_batch([pa.array(values) for values in batch.values()], names=list(batch))
+                if writer is None:
+                    writer = (pq.ParquetWriter(path, record.schema) if fmt == "Parquet"
+                              else ipc.new_file(path, record.schema))
+                writer.write_batch(record)
+            rows += len(batch['time'])
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Aucune ligne à exporter")
+    return rows
+
+
+def export_selection(dataset, path, start=None, end=None, columns=None, keep=None, derived=(),
+                     resolution=None, batch_rows=BATCH_ROWS):
+    """Write the rows of a PhaseDataset between start and end (included) to
+    path, in the format of its extension.
+
+    `keep` is a boolean mask over all the rows (value filters), `derived`
+    names of derived.REGISTRY to add. With `resolution` (a key of
+    RESOLUTIONS) the profile of the rows is written instead of the rows.
+    """
+    started = time_module.perf_counter()
+    arrays = selection_columns(dataset, columns, derived)
+    times = arrays['time']
+    if len(times) > 1 and (np.diff(times.view(np.int64)) < 0).any():
+        # Dates non croissantes : plage prise par masque
+        inside = np.ones(len(times), dtype=bool)
+        if start is not None:
+            inside &= times >= np.datetime64(pd.Timestamp(start), 'ns')
+        if end is not None:
+            inside &= times <= np.datetime64(pd.Timestamp(end), 'ns')
+        keep = inside if keep is None else keep & inside
+        first, last = 0, len(times)
+    else:
+        first, last = row_range(times, start, end)
+
+    if resolution is not None:
+        # Profil : quelques lignes par intervalle, écrit en une fois
+        selection = next(iter_batches(arrays, first, last, keep, max(last - first, 1)), None)
+        if selection is None:
+            raise ValueError("Aucune ligne à exporter")
+        gap_ns = dataset.quality().gap_ns
+        profile = resample(pd.DataFrame(selection), [name for name in selection if name != 'time'],
+                           RESOLUTIONS[resolution], gap_ns)
+        batches = [{col: profile[col].to_numpy() for col in profile.columns}]
+    else:
+        batches = iter_batches(arrays, first, last, keep, batch_rows)
+    rows = write_batches(batches, path)
+    return ExportResult(path, rows, time_module.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export d'une plage de mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    write_parser = commands.add_parser("write", help="écrire une plage d'un fichier journal")
+    write_parser.add_argument("file")
+    write_parser.add_argument("out", help="fichier de sortie (.parquet, .feather, .arrow ou .csv)")
+    write_parser.add_argument("--start", help="début de la plage (inclus)")
+    write_parser.add_argument("--end", help="fin de la plage (incluse)")
+    write_parser.add_argument("--columns", nargs="+", help="colonnes de mesures (toutes par défaut)")
+    write_parser.add_argument("--derived", nargs="+", default=[], choices=list(REGISTRY), help="séries dérivées")
+    write_parser.add_argument("--resolution", choices=list(RESOLUTIONS), help="profil rééchantillonné")
+    write_parser.add_argument("--compact", action="store_true", help="mesures en float32")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        from dataset import PhaseDataset
+        dataset = PhaseDataset.from_csv(args.file, args.columns, compact=args.compact)
+        try:
+            result = export_selection(dataset, args.out, args.start, args.end, args.columns,
+                                      derived=args.derived, resolution=args.resolution)
+        except ImportError as e:
+            raise SystemExit(f"Erreur : {e}")  # pyarrow absent
+        print(result.summary())
+    else:
+        parser.print_help()
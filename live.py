@@ -0,0 +1,430 @@
+# *******************************************
+# Réception en direct des mesures du microcontrôleur
+# - Lignes au format des fichiers (séparateur ';') reçues en TCP, UDP
+#   ou sur un flux d'octets (liaison série, fichier qui grossit)
+# - Stockage dans un buffer circulaire de taille fixe
+# - Simulateur local pour les essais :
+#     python live.py --simulate --protocol tcp --port 5005 --rate 1
+#********************************************
+
+import argparse
+import math
+import random
+import socket
+import threading
+import time as time_module
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset import TIME_FORMAT, measure_columns
+
+try:
+    import serial  # pyserial, seulement pour la liaison série
+except ImportError:
+    serial = None
+
+DEFAULT_COLUMNS = ["unixtime", "time"] + [f"{name}{phase}"
+                                          for phase in range(1, 5)
+                                          for name in ("voltagemoy", "currentmoy", "powermoy")]
+DEFAULT_CAPACITY = 7 * 24 * 3600  # une semaine à 1 mesure par seconde
+
+
+class RingBuffer:
+    """Fixed-capacity circular buffer with one preallocated numpy array per
+    measurement column, so memory does not grow however long the stream runs.
+
+    `total` counts every row appended since the start; row number `k` lives at
+    position k % capacity as long as it has not been overwritten.
+    """
+
+    def __init__(self, columns, capacity=DEFAULT_CAPACITY):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.time = np.zeros(capacity, dtype=np.int64)  # ns
+        self.values = {col: np.full(capacity, np.nan) for col in self.columns}
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, times, values):
+        """Append rows: `times` in ns and `values` with one row per column"""
+        n = len(times)
+        if n == 0:
+            return
+        if values.shape != (len(self.columns), n):
+            raise ValueError(f"Lot de forme {values.shape}, attendu ({len(self.columns)}, {n})")
+        skipped = max(0, n - self.capacity)  # plus de lignes que de place : on garde les dernières
+        times = times[skipped:]
+        values = values[:, skipped:]
+        with self.lock:
+            start = (self.total + skipped) % self.capacity
+            first = min(len(times), self.capacity - start)
+            self.time[start:start + first] = times[:first]
+            self.time[:len(times) - first] = times[first:]
+            for i, col in enumerate(self.columns):
+                self.values[col][start:start + first] = values[i, :first]
+                self.values[col][:len(times) - first] = values[i, first:]
+            self.total += n
+
+    def _segments(self):
+        """Slices of the buffer holding rows, oldest first"""
+        if self.total <= self.capacity:
+            return [slice(0, self.total)]
+        start = self.total % self.capacity
+        return [slice(start, self.capacity), slice(0, start)]
+
+    def _copy(self, parts):
+        times = np.concatenate([self.time[part] for part in parts]) if parts else np.empty(0, np.int64)
+        values = {col: np.concatenate([self.values[col][part] for part in parts]) if parts else np.empty(0)
+                  for col in self.columns}
+        return times, values
+
+    def latest(self, since_ns):
+        """Copy of the rows whose time is >= since_ns, oldest first"""
+        with self.lock:
+            parts = []
+            for segment in reversed(self._segments()):
+                times = self.time[segment]
+                first = int(np.searchsorted(times, since_ns))
+                if first < len(times):
+                    parts.insert(0, slice(segment.start + first, segment.stop))
+                if first > 0:
+                    break
+            return self._copy(parts)
+
+    def read_since(self, cursor):
+        """Rows appended after row number `cursor` (those already overwritten
+        are lost). Returns (new cursor, times, values)."""
+        with self.lock:
+            cursor = max(cursor, self.total - self.capacity)
+            count = self.total - cursor
+            if count <= 0:
+                return self.total, np.empty(0, np.int64), {col: np.empty(0) for col in self.columns}
+            start = cursor % self.capacity
+            first = min(count, self.capacity - start)
+            parts = [slice(start, start + first)]
+            if count > first:
+                parts.append(slice(0, count - first))
+            times, values = self._copy(parts)
+            return self.total, times, values
+
+    def last_time(self):
+        """Time (ns) of the last row, None if empty"""
+        if self.total == 0:
+            return None
+        return int(self.time[(self.total - 1) % self.capacity])
+
+
+class RowParser:
+    """Parse the received bytes into rows; an incomplete line is kept until
+    the rest arrives. A header line (with a 'time' field) redefines the fields
+    of the lines; the measurement columns returned stay those of `columns`,
+    taken by name (NaN when the lines lack one, other fields ignored)."""
+
+    def __init__(self, columns=DEFAULT_COLUMNS, separator=';'):
+        self.separator = separator
+        self.remainder = b""
+        self.errors = 0
+        self.columns = measure_columns(columns)
+        self.set_columns(columns)
+
+    def set_columns(self, columns):
+        """Fields of the received lines"""
+        self.file_columns = list(columns)
+        self.time_position = self.file_columns.index('time')
+        self.positions = [self.file_columns.index(col) if col in self.file_columns else None
+                          for col in self.columns]
+
+    def feed(self, chunk):
+        """Parse the complete lines of `chunk`; returns (times, values) or None"""
+        lines = (self.remainder + chunk).split(b"\n")
+        self.remainder = lines.pop()
+        return self.parse_lines(lines)
+
+    def parse_lines(self, lines):
+        times = []
+        rows = []
+        for raw in lines:
+            line = raw.decode('utf-8', 'replace').strip()
+            if not line:
+                continue
+            fields = line.split(self.separator)
+            if 'time' in fields:
+                self.set_columns([field.strip() for field in fields])
+                continue
+            if len(fields) != len(self.file_columns):
+                self.errors += 1
+                continue
+            times.append(fields[self.time_position])
+            rows.append([fields[position] if position is not None else 'nan' for position in self.positions])
+        if not times:
+            return None
+
+        try:
+            return self.convert(times, rows)
+        except ValueError:
+            # Au moins une ligne invalide dans le lot : conversion ligne par ligne
+            parsed = []
+            for row_time, row in zip(times, rows):
+                try:
+                    parsed.append(self.convert([row_time], [row]))
+                except ValueError:
+                    self.errors += 1
+            if not parsed:
+                return None
+            return (np.concatenate([t for t, _ in parsed]),
+                    np.concatenate([v for _, v in parsed], axis=1))
+
+    def convert(self, times, rows):
+        t = pd.to_datetime(times, format=TIME_FORMAT).values.astype('datetime64[ns]').view(np.int64)
+        values = np.array(rows, dtype=np.float64).T.reshape(len(self.columns), len(rows))
+        return t, values
+
+
+class StreamReceiver(threading.Thread):
+    """Background reception loop feeding a RingBuffer.
+
+    Subclasses implement open(), read_chunk() (None when nothing arrived
+    before the timeout) and close(). On network errors the connection is
+    opened again until stop() is called.
+    """
+
+    RETRY_DELAY = 2.0
+
+    def __init__(self, buffer=None, parser=None):
+        super().__init__(daemon=True)
+        self.parser = parser or RowParser()
+        self.buffer = buffer or RingBuffer(self.parser.columns)
+        self.stop_event = threading.Event()
+        self.rows = 0
+        self.last_error = None
+
+    def open(self):
+        pass
+
+    def read_chunk(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.open()
+                self.last_error = None
+                while not self.stop_event.is_set():
+                    chunk = self.read_chunk()
+                    if chunk is None:
+                        continue
+                    if chunk == b"":
+                        raise ConnectionError("Connexion fermée")
+                    parsed = self.parser.feed(chunk)
+                    if parsed is not None:
+                        self.buffer.append(*parsed)
+                        self.rows += len(parsed[0])
+            except Exception as e:
+                self.last_error = e
+            finally:
+                self.close()
+            self.stop_event.wait(self.RETRY_DELAY)
+
+    def status(self):
+        text = f"Lignes reçues: {self.rows:,}  Erreurs: {self.parser.errors:,}"
+        if self.last_error is not None:
+            text += f"  ({self.last_error})"
+        return text
+
+
+class TcpReceiver(StreamReceiver):
+    """Connect to the device (or the simulator) and read its rows"""
+
+    def __init__(self, host, port, buffer=None, parser=None):
+        super().__init__(buffer, parser)
+        self.host = host
+        self.port = port
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=5)
+        self.sock.settimeout(0.5)
+        self.parser.remainder = b""
+
+    def read_chunk(self):
+        try:
+            return self.sock.recv(65536)
+        except socket.timeout:
+            return None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class UdpReceiver(StreamReceiver):
+    """Listen for datagrams holding one or more rows"""
+
+    def __init__(self, host, port, buffer=None, parser=None):
+        super().__init__(buffer, parser)
+        self.host = host
+        self.port = port
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((self.host, self.port))
+        self.sock.settimeout(0.5)
+
+    def read_chunk(self):
+        try:
+            datagram = self.sock.recv(65536)
+        except socket.timeout:
+            return None
+        # Un datagramme contient toujours des lignes complètes
+        return datagram if datagram.endswith(b"\n") else datagram + b"\n"
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class ByteStreamReceiver(StreamReceiver):
+    """Read any object with a read() method (serial port, growing file...).
+    An empty read means no data yet, not the end of the stream."""
+
+    def __init__(self, stream, buffer=None, parser=None):
+        super().__init__(buffer, parser)
+        self.stream = stream
+
+    def read_chunk(self):
+        chunk = self.stream.read(4096)
+        if not chunk:
+            self.stop_event.wait(0.2)
+            return None
+        return chunk
+
+
+class SerialReceiver(ByteStreamReceiver):
+    """Read the rows from a serial port (requires pyserial)"""
+
+    def __init__(self, port, baudrate=115200, buffer=None, parser=None):
+        if serial is None:
+            raise ImportError("pyserial est nécessaire pour la liaison série (pip install pyserial)")
+        super().__init__(None, buffer, parser)
+        self.port = port
+        self.baudrate = baudrate
+
+    def open(self):
+        self.stream = serial.Serial(self.port, self.baudrate, timeout=0.5)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def create_receiver(protocol, address, port=None, capacity=DEFAULT_CAPACITY):
+    """Receiver for the protocol chosen in the Live dialog ('tcp', 'udp' or 'serial')"""
+    parser = RowParser()
+    buffer = RingBuffer(parser.columns, capacity)
+    if protocol == "tcp":
+        return TcpReceiver(address, int(port), buffer, parser)
+    if protocol == "udp":
+        return UdpReceiver(address, int(port), buffer, parser)
+    if protocol == "serial":
+        return SerialReceiver(address, int(port or 115200), buffer, parser)
+    raise ValueError(f"Protocole inconnu : {protocol}")
+
+
+# ****************************************Simulateur du microcontrôleur
+
+def simulated_rows(rate=1.0):
+    """Endless rows in the file format, timestamped with the current time"""
+    step = 0
+    while True:
+        now = datetime.now()
+        voltages = [230 + 3 * math.sin(step / 600 + phase) + random.gauss(0, 0.5) for phase in range(3)]
+        currents = [max(0.0, 5 + 4 * math.sin(step / (300 * rate) + 2 * phase) + random.gauss(0, 0.3))
+                    for phase in range(3)]
+        powers = [v * c for v, c in zip(voltages, currents)]
+        # Phase 4 : moyenne des tensions, somme des courants et des puissances
+        voltages.append(sum(voltages) / 3)
+        currents.append(sum(currents))
+        powers.append(sum(powers))
+        fields = [str(int(now.timestamp())), now.strftime(TIME_FORMAT)]
+        for v, c, p in zip(voltages, currents, powers):
+            fields += [f"{v:.2f}", f"{c:.2f}", f"{p:.1f}"]
+        yield (";".join(fields) + "\n").encode()
+        step += 1
+
+
+def simulate(protocol="tcp", host="127.0.0.1", port=5005, rate=1.0, count=None):
+    """Send simulated rows at `rate` rows per second (TCP server or UDP sender)"""
+    rows = simulated_rows(rate)
+    batch_period = 0.1 if rate > 10 else 1.0 / rate
+    batch_size = max(1, int(rate * batch_period))
+    sent = 0
+
+    def batches():
+        nonlocal sent
+        next_time = time_module.monotonic()
+        while count is None or sent < count:
+            size = batch_size if count is None else min(batch_size, count - sent)
+            yield b"".join(next(rows) for _ in range(size))
+            sent += size
+            next_time += batch_period
+            time_module.sleep(max(0.0, next_time - time_module.monotonic()))
+
+    if protocol == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for data in batches():
+            # Des datagrammes de taille raisonnable, lignes entières
+            lines = data.splitlines(keepends=True)
+            for i in range(0, len(lines), 200):
+                sock.sendto(b"".join(lines[i:i + 200]), (host, port))
+        sock.close()
+        return
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    print(f"Simulateur en attente sur {host}:{port}")
+    try:
+        while count is None or sent < count:
+            client, address = server.accept()
+            print(f"Connexion de {address[0]}:{address[1]}")
+            try:
+                for data in batches():
+                    client.sendall(data)
+            except OSError:
+                print("Client déconnecté")
+            finally:
+                client.close()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulateur local du microcontrôleur")
+    parser.add_argument("--simulate", action="store_true", help="envoie des mesures simulées")
+    parser.add_argument("--protocol", choices=["tcp", "udp"], default="tcp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--rate", type=float, default=1.0, help="lignes par seconde")
+    parser.add_argument("--count", type=int, default=None, help="nombre de lignes à envoyer")
+    args = parser.parse_args()
+    if args.simulate:
+        simulate(args.protocol, args.host, args.port, args.rate, args.count)
+    else:
+        parser.print_help()
@@ -0,0 +1,380 @@
+# *******************************************
+# Lecture des fichiers de données
+# - En-tête, découpage en plages d'octets alignées sur les lignes
+# - Lecture par blocs de taille bornée
+# - Index temporel pour ne lire qu'une plage de temps
+#********************************************
+
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset import TIME_FORMAT, prepare_data, read_dtypes
+
+BLOCK_SIZE = 16 * 1024 * 1024  # taille des blocs lus (octets)
+
+
+def read_header(file_path):
+    """Column names of the file and offset of the first data line"""
+    with open(file_path, 'rb') as file:
+        header = file.readline()
+        offset = file.tell()
+    columns = [name.strip() for name in header.decode('utf-8').strip().split(';')]
+    return columns, offset
+
+
+def split_byte_ranges(file_path, parts):
+    """Split the data lines of the file into `parts` byte ranges (start, end)
+    beginning and ending on line boundaries"""
+    _, data_start = read_header(file_path)
+    size = os.path.getsize(file_path)
+    parts = max(1, parts)
+    bounds = [data_start]
+    with open(file_path, 'rb') as file:
+        for k in range(1, parts):
+            file.seek(data_start + (size - data_start) * k // parts)
+            file.readline()  # aller au début de la ligne suivante
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def iter_blocks(file_path, start, end, block_size=BLOCK_SIZE):
+    """Blocks of complete lines between the offsets start and end"""
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        position = start
+        remainder = b""
+        while position < end:
+            data = file.read(min(block_size, end - position))
+            if not data:
+                break
+            position += len(data)
+            data = remainder + data
+            cut = data.rfind(b"\n") + 1
+            remainder = data[cut:]
+            if cut:
+                yield data[:cut]
+        if remainder.strip():
+            yield remainder
+
+
+def parse_block(block, file_columns, usecols=None, compact=False):
+    """Parse a block of data lines (without header) like load_file does"""
+    data = pd.read_csv(io.BytesIO(block), sep=';', header=None, names=file_columns, usecols=usecols,
+                       dtype=read_dtypes(file_columns, compact))
+    return prepare_data(data, compact)
+
+
+def iter_frames(file_path, start=None, end=None, usecols=None, block_size=BLOCK_SIZE, compact=False):
+    """DataFrames of at most about `block_size` bytes of the file each"""
+    file_columns, data_start = read_header(file_path)
+    start = data_start if start is None else start
+    end = os.path.getsize(file_path) if end is None else end
+    for block in iter_blocks(file_path, start, end, block_size):
+        yield parse_block(block, file_columns, usecols, compact)
+
+
+# ****************************************Index temporel du fichier
+
+INDEX_STEP = 1000          # une entrée d'index toutes les INDEX_STEP lignes
+INDEX_SUFFIX = ".tidx"     # index enregistré à côté du fichier
+BISECT_SPAN = 64 * 1024    # fin de la recherche dichotomique (octets)
+
+
+def line_time(line, time_col):
+    """Timestamp (ns) of a raw data line, None if it has none"""
+    fields = line.split(b';')
+    if len(fields) <= time_col:
+        return None
+    try:
+        return pd.Timestamp(datetime.strptime(fields[time_col].decode('utf-8').strip(), TIME_FORMAT)).value
+    except ValueError:
+        return None
+
+
+def file_time_bounds(file_path):
+    """Timestamps of the first and last data lines, without reading the rest"""
+    columns, data_start = read_header(file_path)
+    time_col = columns.index('time')
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        file.seek(data_start)
+        first = None
+        for line in file:
+            first = line_time(line, time_col)
+            if first is not None:
+                break
+        last = None
+        span = BISECT_SPAN
+        while last is None and span < 2 * size:
+            file.seek(max(data_start, size - span))
+            for line in reversed(file.read().splitlines()):
+                last = line_time(line, time_col)
+                if last is not None:
+                    break
+            span *= 4
+    if first is None or last is None:
+        raise ValueError("No timestamped line in the file")
+    return pd.Timestamp(first), pd.Timestamp(last)
+
+
+def bisect_file(file_path, time_ns):
+    """Byte range (lo, hi) of the file, aligned on lines, which holds the
+    first line at or after `time_ns`: every line before lo is earlier and the
+    line starting at hi is later. Relies on increasing timestamps."""
+    columns, data_start = read_header(file_path)
+    time_col = columns.index('time')
+    lo, hi = data_start, os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        while hi - lo > BISECT_SPAN:
+            mid = (lo + hi) // 2
+            file.seek(mid)
+            file.readline()  # fin de la ligne coupée
+            position = file.tell()
+            line_ns = line_time(file.readline(), time_col) if position < hi else None
+            if line_ns is not None and line_ns < time_ns:
+                lo = position
+            else:
+                hi = mid
+        file.seek(hi)
+        if hi > lo:
+            file.readline()
+        hi = file.tell()
+    return lo, hi
+
+
+class TimeIndex:
+    """Sparse index of a file: timestamp and byte offset of every `step`-th
+    data line. Built by one scan of the file and saved next to it; the saved
+    index is used as long as the size and date of the file are unchanged."""
+
+    def __init__(self, times, offsets, step, size, mtime_ns):
+        self.times = times      # int64 ns
+        self.offsets = offsets  # int64, début des lignes
+        self.step = step
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def build(cls, file_path, step=INDEX_STEP, block_size=BLOCK_SIZE):
+        """Scan the file for line starts and sample one line every `step`"""
+        columns, data_start = read_header(file_path)
+        time_col = columns.index('time')
+        stat = os.stat(file_path)
+        samples = [data_start]
+        line_count = 1  # lignes dont le début est connu (la première en data_start)
+        with open(file_path, 'rb') as file:
+            file.seek(data_start)
+            position = data_start
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    break
+                starts = np.flatnonzero(np.frombuffer(block, np.uint8) == 10) + position + 1
+                numbers = np.arange(line_count, line_count + len(starts))
+                samples.extend(starts[numbers % step == 0].tolist())
+                line_count += len(starts)
+                position += len(block)
+
+            times, offsets = [], []
+            for offset in samples:
+                if offset >= stat.st_size:
+                    continue
+                file.seek(offset)
+                line_ns = line_time(file.readline(), time_col)
+                if line_ns is not None:
+                    times.append(line_ns)
+                    offsets.append(offset)
+        return cls(np.array(times, dtype=np.int64), np.array(offsets, dtype=np.int64),
+                   step, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def load(cls, file_path):
+        """Saved index of the file, None if missing or out of date"""
+        try:
+            with open(file_path + INDEX_SUFFIX, 'rb') as file:
+                saved = np.load(file)
+                index = cls(saved['times'], saved['offsets'], int(saved['step']),
+                            int(saved['size']), int(saved['mtime_ns']))
+        except (OSError, ValueError, KeyError):
+            return None
+        stat = os.stat(file_path)
+        if index.size != stat.st_size or index.mtime_ns != stat.st_mtime_ns:
+            return None
+        return index
+
+    def save(self, file_path):
+        try:
+            with open(file_path + INDEX_SUFFIX, 'wb') as file:
+                np.savez(file, times=self.times, offsets=self.offsets, step=self.step,
+                         size=self.size, mtime_ns=self.mtime_ns)
+        except OSError:
+            pass  # dossier en lecture seule : l'index sera reconstruit
+
+    @classmethod
+    def for_file(cls, file_path, step=INDEX_STEP):
+        """Saved index of the file, built and saved if needed"""
+        index = cls.load(file_path)
+        if index is None:
+            index = cls.build(file_path, step)
+            index.save(file_path)
+        return index
+
+    def locate(self, start_ns, end_ns):
+        """Byte range (start, end) holding every line between the two times"""
+        i = np.searchsorted(self.times, start_ns, 'left') - 1
+        j = np.searchsorted(self.times, end_ns, 'right')
+        start = int(self.offsets[max(i, 0)]) if len(self.offsets) else self.size
+        end = int(self.offsets[j]) if j < len(self.offsets) else self.size
+        return start, end
+
+
+def load_range(file_path, start, end, usecols=None, index=None, compact=False):
+    """Rows of the file between the times start and end (inclusive), reading
+    only the bytes that hold them. Uses `index` or the saved index of the
+    file when up to date, otherwise bisects the file."""
+    start_ns, end_ns = pd.Timestamp(start).value, pd.Timestamp(end).value
+    if index is None:
+        index = TimeIndex.load(file_path)
+    if index is not None:
+        first, last = index.locate(start_ns, end_ns)
+    else:
+        first = bisect_file(file_path, start_ns)[0]
+        last = bisect_file(file_path, end_ns + 1)[1]
+
+    file_columns, _ = read_header(file_path)
+    pieces = [data for data in iter_frames(file_path, first, last, usecols, compact=compact)]
+    if not pieces:
+        columns = [col for col in file_columns if usecols is None
+                   or (usecols(col) if callable(usecols) else col in usecols)]
+        return prepare_data(pd.DataFrame(columns=columns), compact)
+    data = pd.concat(pieces, ignore_index=True)
+    data = data[(data['time'] >= pd.Timestamp(start)) & (data['time'] <= pd.Timestamp(end))]
+    return data.reset_index(drop=True)
+
+
+# ****************************************Lecture parallèle d'un gros fichier
+
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024  # en dessous, la lecture simple est plus rapide
+
+
+class SchemaMismatch(Exception):
+    """A byte range gave a column type the shared arrays cannot hold"""
+
+
+def read_serial(file_path, usecols=None, compact=False):
+    """The whole file parsed in one read_csv call"""
+    file_columns, _ = read_header(file_path)
+    data = pd.read_csv(file_path, sep=';', usecols=usecols, dtype=read_dtypes(file_columns, compact))
+    return prepare_data(data, compact)
+
+
+def count_lines(file_path, start, end):
+    """Number of lines between two offsets (upper bound of the rows)"""
+    count = 0
+    last = b"\n"
+    for block in iter_blocks(file_path, start, end):
+        count += block.count(b"\n")
+        last = block[-1:]
+    return count + (last != b"\n")
+
+
+def attach_shared(name):
+    """Open a shared memory block created by the parent process"""
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        # Enregistré auprès du suivi des ressources du processus parent (déjà fait)
+        return shared_memory.SharedMemory(name=name)
+
+
+def parse_range_into(file_path, start, end, usecols, compact, schema, offset, capacity):
+    """Parse the bytes [start, end) and write the rows into the shared arrays
+    `schema` ({column: (shared memory name, dtype)}) from row `offset`.
+    Returns the number of rows written (runs in a worker process)."""
+    blocks = {}
+    arrays = {}
+    try:
+        for col, (name, dtype) in schema.items():
+            blocks[col] = attach_shared(name)
+            arrays[col] = np.ndarray(capacity, dtype=dtype, buffer=blocks[col].buf)
+        row = offset
+        for data in iter_frames(file_path, start, end, usecols, compact=compact):
+            if list(data.columns) != list(schema) or row + len(data) > capacity:
+                raise SchemaMismatch(str(list(data.columns)))
+            for col in schema:
+                values = data[col].to_numpy()
+                if values.dtype.kind == 'M':
+                    values = values.astype('datetime64[ns]').view(np.int64)
+                if not np.can_cast(values.dtype, arrays[col].dtype, 'safe'):
+                    raise SchemaMismatch(f"{col}: {values.dtype}")
+                arrays[col][row:row + len(data)] = values
+            row += len(data)
+        return row - offset
+    finally:
+        arrays.clear()
+        for block in blocks.values():
+            block.close()
+
+
+def read_parallel(file_path, usecols=None, compact=False, workers=None, min_bytes=PARALLEL_MIN_BYTES):
+    """Parse the whole file like read_serial, with the byte ranges of the file
+    parsed by a pool of processes into shared memory arrays (no pickled
+    DataFrames). Falls back to read_serial for small files or when a range
+    does not fit the column types found at the start of the file."""
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or os.path.getsize(file_path) < min_bytes:
+        return read_serial(file_path, usecols, compact)
+
+    if callable(usecols):
+        # Liste des noms : transmise aux processus de calcul
+        usecols = [col for col in read_header(file_path)[0] if usecols(col)]
+
+    # Types des colonnes d'après le début du fichier
+    sample = next(iter_frames(file_path, usecols=usecols, block_size=256 * 1024, compact=compact), None)
+    if sample is None or any(dtype.kind not in 'iufM' for dtype in sample.dtypes):
+        return read_serial(file_path, usecols, compact)
+    dtypes = {col: np.dtype(np.int64) if dtype.kind == 'M' else dtype for col, dtype in sample.dtypes.items()}
+
+    ranges = split_byte_ranges(file_path, workers)
+    if os.name == 'posix':
+        # Un seul suivi des blocs partagés, hérité par les processus de calcul :
+        # un processus qui se termine ne supprime pas les blocs du parent
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+    blocks = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(count_lines, [file_path] * len(ranges), *zip(*ranges)))
+            capacity = sum(counts)
+            for col, dtype in dtypes.items():
+                blocks[col] = shared_memory.SharedMemory(create=True, size=max(1, capacity * dtype.itemsize))
+            schema = {col: (blocks[col].name, dtypes[col].str) for col in dtypes}
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).tolist()
+            futures = [pool.submit(parse_range_into, file_path, start, end, usecols, compact, schema,
+                                   offset, capacity)
+                       for (start, end), offset in zip(ranges, offsets)]
+            written = [future.result() for future in futures]
+
+        # Copie des lignes de chaque plage, dans l'ordre du fichier
+        columns = {}
+        for col, dtype in dtypes.items():
+            shared = np.ndarray(capacity, dtype=dtype, buffer=blocks[col].buf)
+            values = np.concatenate([shared[offset:offset + n] for offset, n in zip(offsets, written)])
+            del shared
+            columns[col] = values.view('datetime64[ns]') if sample[col].dtype.kind == 'M' else values
+        return pd.DataFrame(columns)
+    except SchemaMismatch:
+        return read_serial(file_path, usecols, compact)
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
@@ -0,0 +1,103 @@
+# *******************************************
+# Bilans de consommation par jour, semaine et mois
+# - Table de base : profil 15 min de chaque phase (énergie et puissance
+#   moyenne) calculé en une passe (resample)
+# - Quand des lignes sont ajoutées, seuls les intervalles à partir de la
+#   première ligne modifiée sont recalculés
+# - Jours, semaines (du lundi) et mois regroupés à partir de la table de
+#   base : énergie (kWh) et pointe (puissance moyenne 15 min la plus élevée)
+#********************************************
+
+import numpy as np
+import pandas as pd
+
+from resample import resample
+
+DEMAND_SECONDS = 900  # pointe : puissance moyenne maximale sur 15 min
+PERIODS = ["Jour", "Semaine", "Mois"]
+POWER_COLUMNS = [f"powermoy{phase}" for phase in range(1, 5)]
+
+
+def period_starts(times, period):
+    """Start of the day, week (Monday) or month of each time"""
+    days = np.asarray(times, dtype='datetime64[ns]').astype('datetime64[D]')
+    if period == "Jour":
+        starts = days
+    elif period == "Semaine":
+        number = days.view(np.int64)
+        starts = (number - (number - 4) % 7).view('datetime64[D]')  # le 05/01/1970 est un lundi
+    elif period == "Mois":
+        starts = days.astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"Unknown period: {period}")
+    return starts.astype('datetime64[ns]')
+
+
+def period_ends(starts, period):
+    """End (excluded) of the periods beginning at `starts`"""
+    starts = np.asarray(starts, dtype='datetime64[ns]')
+    if period == "Mois":
+        return (starts.astype('datetime64[M]') + 1).astype('datetime64[ns]')
+    return starts + np.timedelta64(7 if period == "Semaine" else 1, 'D')
+
+
+class PeriodTable:
+    """Energy and peak demand per period of the power columns.
+
+    `base` is the 15 min profile of the rows (see resample.resample): the
+    periods are whole numbers of 15 min intervals, so their energy is the sum
+    of the interval energies and their peak demand the highest interval mean.
+    """
+
+    def __init__(self, columns=POWER_COLUMNS, max_step_ns=None):
+        self.columns = list(columns)
+        self.max_step_ns = max_step_ns  # trous exclus du calcul de l'énergie
+        self.base = None
+
+    def build(self, data):
+        """Compute the base table from all the rows"""
+        self.columns = [col for col in self.columns if col in data.columns]
+        self.base = resample(data, self.columns, DEMAND_SECONDS, self.max_step_ns)
+
+    def update(self, data, unchanged_rows=0):
+        """Follow a change of the rows when the first `unchanged_rows` rows are
+        the same as in the last call: only the intervals from the last of them
+        on are computed again. Otherwise the table is rebuilt."""
+        times = data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if self.base is None or not 0 < unchanged_rows <= len(times) or (np.diff(times) < 0).any():
+            self.build(data)
+            return
+        width = DEMAND_SECONDS * 1_000_000_000
+        # L'intervalle de la dernière ligne inchangée dépend des lignes suivantes
+        keep_until = times[unchanged_rows - 1] // width * width
+        # ... et son début de la ligne qui le précède (trapèze à cheval)
+        first = max(int(np.searchsorted(times, keep_until)) - 1, 0)
+        tail = resample(data.iloc[first:], self.columns, DEMAND_SECONDS, self.max_step_ns)
+        keep_until = np.int64(keep_until).view('datetime64[ns]')
+        self.base = pd.concat([self.base[self.base['time'] < keep_until],
+                               tail[tail['time'] >= keep_until]], ignore_index=True)
+
+    def summary(self, period):
+        """One row per period with data: 'start', 'end' (excluded) and for each
+        column '<col>_kwh', '<col>_peak' (W) and '<col>_peak_time' (start of
+        the 15 min interval of the peak)"""
+        base = self.base
+        times = base['time'].to_numpy(dtype='datetime64[ns]')
+        starts = period_starts(times, period)
+        new_period = np.diff(starts.view(np.int64)) != 0
+        first = np.concatenate(([0], np.flatnonzero(new_period) + 1)).astype(np.intp)
+        result = {'start': starts[first], 'end': period_ends(starts[first], period)}
+        if not len(base):
+            return pd.DataFrame(result)
+
+        group = np.concatenate(([0], np.cumsum(new_period)))
+        last = np.append(first[1:], len(base)) - 1
+        for col in self.columns:
+            result[f"{col}_kwh"] = np.add.reduceat(np.nan_to_num(base[f"{col}_kwh"].to_numpy()), first)
+            demand = base[col].to_numpy()
+            # Rangement par période puis par valeur : la pointe est la dernière de chaque période
+            order = np.lexsort((np.where(np.isnan(demand), -np.inf, demand), group))
+            peak = order[last]
+            result[f"{col}_peak"] = demand[peak]
+            result[f"{col}_peak_time"] = times[peak]
+        return pd.DataFrame(result)
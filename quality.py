@@ -0,0 +1,139 @@
+# *******************************************
+# Contrôle de la qualité des données chargées
+# - Dates non croissantes ou en double, trous dans l'enregistrement,
+#   valeurs manquantes ou hors plage, en quelques opérations numpy
+# - Index des trous utilisé pour couper les courbes et exclure les
+#   trous du calcul de l'énergie
+#********************************************
+
+import numpy as np
+import pandas as pd
+
+from dataset import measure_columns
+
+GAP_FACTOR = 5         # trou : intervalle plus long que GAP_FACTOR fois l'intervalle médian
+MIN_GAP_SECONDS = 10   # ... et au moins MIN_GAP_SECONDS
+# Plages de valeurs plausibles par type de mesure
+VALID_RANGES = {
+    "voltagemoy": (0.0, 400.0),
+    "currentmoy": (0.0, 300.0),
+    "powermoy": (-100000.0, 100000.0),
+}
+
+
+class QualityReport:
+    """Result of scan(): problems found in the rows and the gap index.
+
+    `gap_rows` holds, for every gap, the position of the first row after it;
+    `gap_ns` is the interval (ns) above which two consecutive rows are
+    considered separated by a gap.
+    """
+
+    def __init__(self, rows, gap_ns, median_ns, gap_rows, gap_starts, gap_durations, backwards, duplicates,
+                 nan_counts, out_of_range):
+        self.rows = rows
+        self.gap_ns = gap_ns
+        self.median_ns = median_ns
+        self.gap_rows = gap_rows
+        self.gap_starts = gap_starts        # date (ns) de la dernière ligne avant chaque trou
+        self.gap_durations = gap_durations  # ns
+        self.backwards = backwards          # positions des lignes plus anciennes que la précédente
+        self.duplicates = duplicates        # nombre de dates en double
+        self.nan_counts = nan_counts        # {colonne: nombre}
+        self.out_of_range = out_of_range    # {colonne: nombre}
+
+    def is_clean(self):
+        return not (len(self.gap_rows) or len(self.backwards) or self.duplicates
+                    or any(self.nan_counts.values()) or any(self.out_of_range.values()))
+
+    def missing_seconds(self):
+        """Time not recorded inside the gaps"""
+        return float((self.gap_durations - self.median_ns).clip(0).sum()) / 1e9
+
+    def short_summary(self):
+        """One line for the main window, empty if nothing was found"""
+        parts = []
+        if len(self.gap_rows):
+            parts.append(f"{len(self.gap_rows)} trou(s)")
+        if len(self.backwards) or self.duplicates:
+            parts.append(f"{len(self.backwards) + self.duplicates} date(s) incohérente(s)")
+        missing = sum(self.nan_counts.values())
+        if missing:
+            parts.append(f"{missing:,} valeur(s) manquante(s)")
+        outside = sum(self.out_of_range.values())
+        if outside:
+            parts.append(f"{outside:,} valeur(s) hors plage")
+        return "Qualité : " + ", ".join(parts) if parts else ""
+
+
+def gap_threshold(steps):
+    """(gap_ns, median_ns) of the time steps (ns) between consecutive rows:
+    a gap is a step longer than GAP_FACTOR median steps and MIN_GAP_SECONDS"""
+    steps = np.asarray(steps)
+    forward = steps[steps > 0]
+    median_ns = int(np.median(forward)) if len(forward) else 1_000_000_000
+    return max(GAP_FACTOR * median_ns, MIN_GAP_SECONDS * 1_000_000_000), median_ns
+
+
+def scan(data, gap_seconds=None, ranges=VALID_RANGES):
+    """Scan the rows once: time steps, gaps, NaN and out-of-range values.
+    Without `gap_seconds` the gap threshold follows the median time step."""
+    times = data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    steps = np.diff(times)
+    gap_ns, median_ns = gap_threshold(steps)
+    if gap_seconds is not None:
+        gap_ns = int(gap_seconds * 1e9)
+
+    gap_rows = np.flatnonzero(steps > gap_ns) + 1
+    nan_counts = {}
+    out_of_range = {}
+    for col in measure_columns(data.columns):
+        values = data[col].to_numpy()
+        nan_counts[col] = int(np.isnan(values).sum())
+        for prefix, (low, high) in ranges.items():
+            if col.startswith(prefix):
+                with np.errstate(invalid='ignore'):
+                    out_of_range[col] = int(((values < low) | (values > high)).sum())
+    return QualityReport(len(times), gap_ns, median_ns, gap_rows, times[gap_rows - 1], steps[gap_rows - 1],
+                         np.flatnonzero(steps < 0) + 1, int((steps == 0).sum()),
+                         nan_counts, out_of_range)
+
+
+def gap_breaks(times, gap_ns):
+    """Positions of the rows of `times` that follow a gap (or go back in time);
+    with gap_ns None only the steps back in time"""
+    steps = np.diff(np.asarray(times, dtype='datetime64[ns]').view(np.int64))
+    if gap_ns is None:
+        return np.flatnonzero(steps < 0) + 1
+    return np.flatnonzero((steps > gap_ns) | (steps < 0)) + 1
+
+
+def with_breaks(times, values, gap_ns):
+    """Times and values with a NaN point inserted at every gap, so that the
+    plotted line is interrupted instead of joining the two sides"""
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    breaks = gap_breaks(times, gap_ns)
+    if not len(breaks):
+        return times, values
+    return np.insert(times, breaks, times[breaks - 1]), np.insert(values, breaks, np.nan)
+
+
+def describe(report, top=20):
+    """Text of the quality summary panel"""
+    lines = [f"Lignes : {report.rows:,}",
+             f"Intervalle médian : {report.median_ns / 1e9:g} s",
+             f"Seuil de trou : {report.gap_ns / 1e9:g} s",
+             f"Trous : {len(report.gap_rows)} (durée non enregistrée : "
+             f"{pd.Timedelta(seconds=report.missing_seconds())})",
+             f"Dates plus anciennes que la précédente : {len(report.backwards)}",
+             f"Dates en double : {report.duplicates}", ""]
+    lines.append("Colonne            Manquantes   Hors plage")
+    for col in report.nan_counts:
+        lines.append(f"{col:<18} {report.nan_counts[col]:>10,} {report.out_of_range.get(col, 0):>12,}")
+    if len(report.gap_rows):
+        lines += ["", f"Plus longs trous (max {top}) :"]
+        for k in np.argsort(report.gap_durations)[::-1][:top]:
+            start = pd.Timestamp(int(report.gap_starts[k])).strftime('%d/%m/%Y %H:%M:%S')
+            lines.append(f"  {start} : {pd.Timedelta(int(report.gap_durations[k]))}")
+    return "\n".join(lines)
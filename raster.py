@@ -0,0 +1,340 @@
+# *******************************************
+# Rendu rapide des courbes dans une image (sans matplotlib)
+# - Courbes dessinées directement dans un tableau numpy RGBA : pour chaque
+#   colonne de pixels, le segment vertical couvert par la courbe (sommets de
+#   la colonne et passages aux bords), toutes les colonnes à la fois
+# - Le coût dépend de la taille de l'image et pas du nombre de points : pas
+#   de réduction préalable des séries, les min/max de chaque colonne restent
+# - Mêmes appels que les axes matplotlib de la fenêtre de comparaison
+#   (plot, axhline, annotate, legend, twinx...) ; textes par Pillow
+# - matplotlib reste utilisé pour les exports et les rapports
+#********************************************
+
+from functools import lru_cache
+
+import numpy as np
+from matplotlib import font_manager
+from matplotlib.colors import to_rgba
+from PIL import Image, ImageDraw, ImageFont
+
+TIME_STEPS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200,
+              86400, 2 * 86400, 7 * 86400, 14 * 86400, 28 * 86400]  # secondes entre deux graduations
+MARGINS = (62, 28, 12, 46)  # gauche, haut, droite, bas (pixels)
+DASH = 8  # longueur des tirets (pixels)
+
+
+def nice_ticks(low, high, count):
+    """About `count` round values (1, 2 or 5 x 10^n apart) between low and high"""
+    if not high > low:
+        return np.array([low])
+    raw = (high - low) / max(count, 1)
+    power = 10.0 ** np.floor(np.log10(raw))
+    step = next(power * m for m in (1, 2, 5, 10) if power * m >= raw)
+    return np.arange(np.ceil(low / step), np.floor(high / step) + 1) * step
+
+
+def time_ticks(low_ns, high_ns, count):
+    """Graduation times (ns) at most `count`, on round seconds, minutes,
+    hours or days"""
+    span = (high_ns - low_ns) / 1e9
+    step = next((s for s in TIME_STEPS if span / s <= count), TIME_STEPS[-1]) * 10**9
+    first = -(-int(low_ns) // step) * step
+    return np.arange(first, high_ns + 1, step, dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def label_font(size=11):
+    """Font of the matplotlib figures (accents included)"""
+    return ImageFont.truetype(font_manager.findfont('DejaVu Sans'), size)
+
+
+def as_float(x):
+    """Plot coordinates: times in ns, numbers unchanged; (values, is_time)"""
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').view(np.int64).astype(np.float64), True
+    if x.dtype == object and x.size and hasattr(x.flat[0], 'to_datetime64'):
+        return as_float(np.array([v.to_datetime64() for v in x.flat]))
+    return x.astype(np.float64), False
+
+
+def column_spans(px, py, columns):
+    """Highest and lowest row (top, bottom) reached by the polyline px/py in
+    each pixel column, NaN where it does not pass (NaN values break the
+    line). px must be increasing."""
+    top = np.full(columns, np.nan)
+    bottom = np.full(columns, np.nan)
+    # Sommets de chaque colonne : px croissant, les points d'une colonne se suivent
+    col = np.floor(px).astype(np.int64)
+    inside = (col >= 0) & (col < columns)
+    if not inside.all():
+        col, values = col[inside], py[inside]
+    else:
+        values = py
+    if len(col):
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(col)) + 1))
+        with np.errstate(invalid='ignore'):
+            top[col[starts]] = np.fmin.reduceat(values, starts)
+            bottom[col[starts]] = np.fmax.reduceat(values, starts)
+    # Passages aux bords gauche et droit de chaque colonne (NaN dans les trous)
+    if len(px) > 1:
+        edges = np.interp(np.arange(columns + 1, dtype=np.float64), px, py, left=np.nan, right=np.nan)
+        top = np.fmin(top, np.fmin(edges[:-1], edges[1:]))
+        bottom = np.fmax(bottom, np.fmax(edges[:-1], edges[1:]))
+    return top, bottom
+
+
+class Series:
+    """A recorded plot call"""
+
+    def __init__(self, x, y, color, linewidth=1, alpha=1.0, label=None, marker=None, dashed=False,
+                 edgecolor=None):
+        self.x = x
+        self.y = y
+        self.color = to_rgba(color, alpha)
+        self.linewidth = linewidth
+        self.label = label
+        self.marker = marker
+        self.dashed = dashed
+        self.edgecolor = edgecolor
+
+
+class RasterAxes:
+    """Axes drawn into an RGBA image: the plotting calls of the comparison
+    window are recorded, then render() draws them all with shared limits
+    (data range plus 5 %, like matplotlib)"""
+
+    def __init__(self, width=1000, height=600, parent=None):
+        self.width = width
+        self.height = height
+        self.parent = parent
+        self.twin = None
+        self.font = label_font()
+        self.clear()
+
+    def resize(self, width, height):
+        self.width = max(int(width), 200)
+        self.height = max(int(height), 150)
+
+    def clear(self):
+        self.series = []
+        self.hlines = []
+        self.notes = []
+        self.title = ""
+        self.ylabel = ""
+        self.show_grid = False
+        self.show_legend = False
+        self.time_axis = False
+
+    # ------------------------------------------------ appels des axes matplotlib
+    def plot(self, x, y, fmt=None, color='black', label=None, linewidth=1, alpha=1.0, drawstyle=None,
+             markerfacecolor=None, markeredgecolor=None, **kwargs):
+        x, is_time = as_float(np.atleast_1d(x))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        self.time_axis |= is_time
+        if drawstyle == 'steps-post' and len(x) > 1:
+            x = np.repeat(x, 2)[1:]
+            y = np.repeat(y, 2)[:-1]
+        marker = fmt if fmt in ('o', '.') else None
+        if marker:
+            color = markerfacecolor or color
+        self.series.append(Series(x, y, color, linewidth, alpha, label, marker, edgecolor=markeredgecolor))
+        return self.series[-1]
+
+    def axhline(self, y=0, color='black', linestyle='-', alpha=1.0, label=None, **kwargs):
+        self.hlines.append(Series(None, float(y), color, 1, alpha, label, dashed=linestyle == '--'))
+
+    def annotate(self, text, xy, xycoords='axes fraction', color='black', **kwargs):
+        self.notes.append((text, xy, to_rgba(color)))
+
+    def set_title(self, title):
+        self.title = title
+
+    def set_ylabel(self, label):
+        self.ylabel = label
+
+    def grid(self, visible=True):
+        self.show_grid = visible
+
+    def legend(self, loc=None):
+        self.show_legend = True
+
+    def twinx(self):
+        """Second y axis (right side) sharing the x axis"""
+        self.twin = RasterAxes(self.width, self.height, parent=self)
+        return self.twin
+
+    def remove(self):
+        if self.parent is not None and self.parent.twin is self:
+            self.parent.twin = None
+
+    # ------------------------------------------------ rendu
+    def limits(self):
+        """x and y limits of the recorded calls, with 5 % margins"""
+        lines = [s for s in self.series if len(s.x)]
+        with np.errstate(invalid='ignore'):
+            xs = [np.fmin.reduce(s.x) for s in lines] + [np.fmax.reduce(s.x) for s in lines]
+            ys = [np.fmin.reduce(s.y) for s in lines] + [np.fmax.reduce(s.y) for s in lines]
+        ys += [h.y for h in self.hlines]
+        xs = [x for x in xs if np.isfinite(x)]
+        ys = [y for y in ys if np.isfinite(y)]
+        x0, x1 = (min(xs), max(xs)) if xs else (0.0, 1.0)
+        y0, y1 = (min(ys), max(ys)) if ys else (0.0, 1.0)
+        if x1 <= x0:
+            # Un seul instant : au moins 1 s de chaque côté (ns depuis 1970 en float64)
+            half = 1e9 if self.time_axis else 1
+            x0, x1 = x0 - half, x1 + half
+        if y1 <= y0:
+            y0, y1 = y0 - 1, y1 + 1
+        dx, dy = (x1 - x0) * 0.05, (y1 - y0) * 0.05
+        return x0 - dx, x1 + dx, y0 - dy, y1 + dy
+
+    def render(self):
+        """RGBA image (PIL) of the recorded calls"""
+        left, top, right, bottom = MARGINS
+        if self.twin is not None:
+            right += left
+        plot_width = max(self.width - left - right, 10)
+        plot_height = max(self.height - top - bottom, 10)
+        pixels = np.full((self.height, self.width, 4), 255, dtype=np.uint8)
+        area = pixels[top:top + plot_height, left:left + plot_width]
+
+        x0, x1, y0, y1 = self.limits()
+        twin_range = None
+        if self.twin is not None:
+            twin_x0, twin_x1, *twin_range = self.twin.limits()
+            if self.twin.series:
+                x0, x1 = min(x0, twin_x0), max(x1, twin_x1)
+        to_px = lambda x: (x - x0) / (x1 - x0) * plot_width
+        to_py = lambda y, low, high: (high - y) / (high - low) * plot_height
+
+        x_ticks = (time_ticks(x0, x1, max(plot_width // 130, 2)) if self.time_axis
+                   else nice_ticks(x0, x1, max(plot_width // 90, 2)))
+        y_ticks = nice_ticks(y0, y1, max(plot_height // 50, 2))
+        if self.show_grid:
+            grid = np.array([225, 225, 225, 255], dtype=np.uint8)
+            area[:, np.clip(to_px(x_ticks).astype(int), 0, plot_width - 1)] = grid
+            area[np.clip(to_py(y_ticks, y0, y1).astype(int), 0, plot_height - 1), :] = grid
+
+        for axes, low, high in [(self, y0, y1)] + ([(self.twin, *twin_range)] if twin_range else []):
+            for s in axes.series:
+                if s.marker:
+                    continue
+                draw_line(area, to_px(s.x), to_py(s.y, low, high), s.color, s.linewidth)
+            for h in axes.hlines:
+                row = int(round(to_py(h.y, low, high)))
+                if 0 <= row < plot_height:
+                    columns = np.arange(plot_width)
+                    if h.dashed:
+                        columns = columns[(columns // DASH) % 2 == 0]
+                    blend(area, (np.full(len(columns), row), columns), h.color)
+            for s in axes.series:
+                if s.marker:
+                    for x, y in zip(to_px(s.x), to_py(s.y, low, high)):
+                        draw_marker(area, x, y, s.color, s.edgecolor)
+
+        image = Image.fromarray(pixels, 'RGBA')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([left - 1, top - 1, left + plot_width, top + plot_height], outline=(0, 0, 0, 255))
+        self.draw_texts(draw, left, top, plot_width, plot_height, x_ticks, y_ticks, to_px,
+                        lambda y: to_py(y, y0, y1), twin_range)
+        return image
+
+    def draw_texts(self, draw, left, top, plot_width, plot_height, x_ticks, y_ticks, to_px, to_py,
+                   twin_range=None):
+        """Title, tick labels, axis labels, annotations and legends"""
+        black = (0, 0, 0, 255)
+        if self.title:
+            draw.text((left + plot_width / 2, top / 2), self.title, fill=black, font=self.font, anchor='mm')
+        for tick in x_ticks:
+            x = left + to_px(tick)
+            if self.time_axis:
+                text = str(np.datetime64(int(tick), 'ns').astype('datetime64[s]'))
+                text = f"{text[8:10]}/{text[5:7]} {text[11:19]}"
+            else:
+                text = f"{tick + 0:g}"
+            draw.text((x, top + plot_height + 4), text, fill=black, font=self.font, anchor='ma')
+        for tick in y_ticks:
+            draw.text((left - 4, top + to_py(tick)), f"{tick + 0:g}", fill=black, font=self.font, anchor='rm')
+        if self.ylabel:
+            draw.text((4, top - 4), self.ylabel, fill=black, font=self.font, anchor='ld')
+        if twin_range:
+            right = left + plot_width
+            low, high = twin_range
+            for tick in nice_ticks(low, high, max(plot_height // 50, 2)):
+                y = top + (high - tick) / (high - low) * plot_height
+                draw.text((right + 4, y), f"{tick + 0:g}", fill=black, font=self.font, anchor='lm')
+            if self.twin.ylabel:
+                draw.text((right + 4, top - 4), self.twin.ylabel, fill=black, font=self.font, anchor='ld')
+
+        for text, (fx, fy), color in self.notes:
+            x, y = left + 6 + fx * plot_width, top + 4 + (1 - fy) * plot_height
+            box = draw.textbbox((x, y), text, font=self.font)
+            draw.rectangle([box[0] - 3, box[1] - 3, box[2] + 3, box[3] + 3], fill=(255, 255, 255, 255),
+                           outline=color_bytes(color))
+            draw.text((x, y), text, fill=color_bytes(color), font=self.font)
+
+        entries = [s for s in self.series if s.label and self.show_legend]
+        if self.twin is not None and self.twin.show_legend:
+            entries += [s for s in self.twin.series if s.label]
+        if entries:
+            height = 16 * len(entries) + 6
+            width = max(draw.textlength(s.label, font=self.font) for s in entries) + 38
+            x, y = left + plot_width - width - 6, top + 6
+            draw.rectangle([x, y, x + width, y + height], fill=(255, 255, 255, 255), outline=(200, 200, 200, 255))
+            for k, s in enumerate(entries):
+                row = y + 11 + 16 * k
+                draw.line([x + 6, row, x + 26, row], fill=color_bytes(s.color), width=2)
+                draw.text((x + 32, row), s.label, fill=black, font=self.font, anchor='lm')
+
+
+def color_bytes(color):
+    return tuple(int(round(c * 255)) for c in color)
+
+
+def blend(area, where, color):
+    """Paint the pixels `where` (row and column index arrays) of area with an
+    RGBA color (0..1), mixed with the pixels below when it is transparent"""
+    rgba = np.array(color_bytes(color), dtype=np.uint8)
+    # Un pixel RGBA = un entier 32 bits : une seule lecture/écriture par pixel
+    packed = area.view(np.uint32)[..., 0]
+    if rgba[3] == 255:
+        packed[where] = rgba.view(np.uint32)[0]
+        return
+    alpha = np.uint16(rgba[3])
+    pixels = packed[where].view(np.uint8).reshape(-1, 4).astype(np.uint16)
+    pixels[:, :3] = (pixels[:, :3] * (255 - alpha) + rgba[:3].astype(np.uint16) * alpha + 127) // 255
+    packed[where] = pixels.astype(np.uint8).view(np.uint32).ravel()
+
+
+def draw_line(area, px, py, color, linewidth=1):
+    """Draw the polyline px/py (pixels, NaN values break it) into area"""
+    height, columns = area.shape[:2]
+    top, bottom = column_spans(px, py, columns)
+    drawn = np.flatnonzero(~np.isnan(top))
+    half = (linewidth - 1) / 2
+    first = np.clip(np.floor(top[drawn] + 0.5 - half), 0, height).astype(np.int64)
+    last = np.clip(np.floor(bottom[drawn] + 0.5 + half), -1, height - 1).astype(np.int64)
+    lengths = np.maximum(last - first + 1, 0)
+    # Pixels de chaque colonne entre la ligne la plus haute et la plus basse
+    offsets = np.cumsum(lengths) - lengths
+    rows = np.repeat(first - offsets, lengths) + np.arange(lengths.sum())
+    blend(area, (rows, np.repeat(drawn, lengths)), color)
+
+
+def draw_marker(area, x, y, color, edgecolor=None, radius=3):
+    """Filled disc (marker 'o') with a border"""
+    height, width = area.shape[:2]
+    if not (np.isfinite(x) and np.isfinite(y)):
+        return
+    cx, cy = int(round(x)), int(round(y))
+    r0, r1 = max(cy - radius - 1, 0), min(cy + radius + 2, height)
+    c0, c1 = max(cx - radius - 1, 0), min(cx + radius + 2, width)
+    if r0 >= r1 or c0 >= c1:
+        return
+    yy, xx = np.mgrid[r0:r1, c0:c1]
+    distance = np.hypot(yy - cy, xx - cx)
+    patch = area[r0:r1, c0:c1]
+    if edgecolor is not None:
+        patch[distance <= radius + 1] = color_bytes(to_rgba(edgecolor))
+    patch[distance <= radius] = color_bytes(color)
@@ -0,0 +1,350 @@
+# *******************************************
+# Rapport en images des journées (ou semaines) d'un fichier, sans fenêtre
+# - Mêmes tracés que les fenêtres de comparaison et de phase (moyennes,
+#   Max/Min, énergie), une image PNG par période et par tracé
+# - Rendu Agg par un groupe de processus : les colonnes sont placées une
+#   fois en mémoire partagée, chaque processus trace un lot de périodes
+# - PDF de toutes les pages écrit page par page, les images PNG y sont
+#   recopiées sans être décodées
+# - En ligne de commande :
+#     python report.py build journal.csv rapport/ --period Jour --pdf rapport.pdf
+#********************************************
+
+import argparse
+import os
+import struct
+import time as time_module
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from dataset import comparison_columns, phase_columns
+from periods import period_ends, period_starts
+from quality import gap_threshold
+from resample import decimate
+from stats_engine import JOULES_PER_KWH, trapezoid_energy
+
+REPORT_PERIODS = ["Jour", "Semaine"]
+# Tracés : fenêtres de comparaison (type de mesure) et fenêtres de phase
+LAYOUTS = ["Voltage", "Current", "Power", "Phase 1", "Phase 2", "Phase 3", "Phase 4"]
+DEFAULT_LAYOUTS = ["Voltage", "Current", "Power", "Phase 1", "Phase 2", "Phase 3"]
+UNITS = {"Voltage": "V", "Current": "A", "Power": "W"}
+COLORS = ['blue', 'red', 'green', 'grey']
+DPI = 100
+
+
+def layout_columns(layout):
+    """Columns drawn by a layout"""
+    if layout.startswith("Phase"):
+        return phase_columns(layout[-1])
+    return comparison_columns(layout)
+
+
+def report_pages(times, period="Jour"):
+    """(start, end) in ns of the periods holding rows, end excluded"""
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if len(times) == 0:
+        return []
+    starts = np.unique(period_starts(times, period))
+    ends = period_ends(starts, period)
+    return list(zip(starts.view(np.int64).tolist(), ends.view(np.int64).tolist()))
+
+
+def value_stats(times, values):
+    """Mean, (time, value) of the max and of the min, NaN ignored"""
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).all():
+        return np.nan, None, None
+    high = int(np.nanargmax(values))
+    low = int(np.nanargmin(values))
+    return np.nanmean(values), (times[high], values[high]), (times[low], values[low])
+
+
+def format_time(time):
+    return np.datetime_as_string(np.datetime64(time, 's')).replace('T', ' ')[5:]
+
+
+def plot_columns(fig):
+    """Pixel columns of the figure: no need to draw more points"""
+    return int(fig.get_figwidth() * fig.dpi)
+
+
+def draw_comparison(fig, times, arrays, plot_type, gap_ns, title_suffix=""):
+    """Layout of a comparison window: the four phases with their average,
+    Max and Min markers, energy for the power"""
+    ax = fig.add_subplot(111)
+    columns = comparison_columns(plot_type)
+    unit = UNITS[plot_type]
+    notes = []
+    total_energy = 0.0
+    for k, (col, color) in enumerate(zip(columns, COLORS)):
+        label = f"Phase {k + 1}"
+        values = arrays[col]
+        ax.plot(*decimate(times, values, plot_columns(fig), gap_ns), color=color, label=label, linewidth=1)
+        mean, high, low = value_stats(times, values)
+        if high is None:
+            continue
+        ax.axhline(y=mean, color=color, linestyle='--', alpha=0.5)
+        ax.annotate(f'Avg {label}: {mean:.2f}', xy=(0.02, 0.98 - 0.05 * k), xycoords='axes fraction',
+                    color=color, bbox=dict(boxstyle='round,pad=0.5', facecolor='white', alpha=0.8),
+                    verticalalignment='top')
+        ax.plot(high[0], high[1], 'o', color=color, markeredgecolor='black', markerfacecolor='purple', markersize=6)
+        ax.plot(low[0], low[1], 'o', color=color, markeredgecolor='black', markerfacecolor='yellow', markersize=6)
+        note = (f"{label} Max: {high[1]:.2f} {unit} ({format_time(high[0])})  "
+                f"Min: {low[1]:.2f} {unit} ({format_time(low[0])})")
+        if plot_type == "Power":
+            energy = trapezoid_energy(times.view(np.int64), values, gap_ns) / JOULES_PER_KWH
+            total_energy = energy if col == "powermoy4" else total_energy + energy
+            note += f"  Energy: {energy:.2f} kWh"
+        notes.append(note)
+    title = f'{plot_type} Comparison - All Phases{title_suffix}'
+    if plot_type == "Power":
+        title += f" - Energy: {total_energy:.2f} kWh"
+    ax.set_title(title)
+    ax.set_ylabel(f'{plot_type} ({unit})')
+    ax.grid(True)
+    ax.legend(loc='upper right')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
+    ax.tick_params(axis='x', rotation=30, labelsize=8)
+    fig.text(0.01, 0.01, "\n".join(notes), fontsize=8, family='monospace', verticalalignment='bottom')
+    fig.subplots_adjust(bottom=0.1 + 0.02 * len(notes), top=0.95, left=0.07, right=0.98)
+
+
+def draw_phase(fig, times, arrays, phase, gap_ns, title_suffix=""):
+    """Layout of a phase window: voltage, current and power with their
+    average, Max (and Min of the power) and energy"""
+    axes = [fig.add_subplot(311), fig.add_subplot(312), fig.add_subplot(313)]
+    styles = [('Voltage', 'b-', 'r', 'V'), ('Current', 'r-', 'b', 'A'), ('Power', 'g-', 'r', 'W')]
+    notes = []
+    for ax, col, (name, style, avg_color, unit) in zip(axes, phase_columns(phase), styles):
+        values = arrays[col]
+        ax.plot(*decimate(times, values, plot_columns(fig), gap_ns), style, linewidth=1, label=name)
+        mean, high, low = value_stats(times, values)
+        if high is not None:
+            ax.axhline(y=mean, color=avg_color, linestyle='--', label=f'Avg: {mean:.2f}{unit}')
+            ax.plot(high[0], high[1], 'o', markeredgecolor='black', markerfacecolor='purple', markersize=6)
+            note = f"{name} Average: {mean:.2f} {unit}  Max: {high[1]:.2f} {unit} ({format_time(high[0])})"
+            if name == 'Power':
+                ax.plot(low[0], low[1], 'o', markeredgecolor='black', markerfacecolor='yellow', markersize=6)
+                energy = trapezoid_energy(times.view(np.int64), values, gap_ns) / JOULES_PER_KWH
+                note += f"  Min: {low[1]:.2f} {unit} ({format_time(low[0])})  Energy: {energy:.2f} kWh"
+            notes.append(note)
+        ax.set_title(f'{name} - Phase {phase}{title_suffix}')
+        ax.set_ylabel(f'{name} ({unit})')
+        ax.grid(True)
+        ax.legend(loc='upper right')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M:%S'))
+        ax.tick_params(axis='x', rotation=30, labelsize=8)
+    fig.text(0.01, 0.01, "\n".join(notes), fontsize=8, family='monospace', verticalalignment='bottom')
+    fig.subplots_adjust(bottom=0.1 + 0.02 * len(notes), top=0.96, hspace=0.5, left=0.07, right=0.98)
+
+
+def page_path(out_dir, start_ns, layout):
+    day = np.datetime_as_string(np.datetime64(start_ns, 'ns'), 'D')
+    return os.path.join(out_dir, f"{day}_{layout.replace(' ', '').lower()}.png")
+
+
+def render_pages(arrays, pages, layouts, out_dir, gap_ns=None, dpi=DPI):
+    """Draw every layout of every page (start, end) of the rows `arrays`
+    ({column: array}, 'time' in ns, sorted) to PNG files; returns the paths
+    in page order"""
+    times = arrays['time'].view('datetime64[ns]')
+    paths = []
+    for start_ns, end_ns in pages:
+        first, last = np.searchsorted(arrays['time'], [start_ns, end_ns])
+        if first == last:
+            continue
+        rows = {col: values[first:last] for col, values in arrays.items()}
+        suffix = " - " + np.datetime_as_string(np.datetime64(start_ns, 'ns'), 'D')
+        for layout in layouts:
+            fig = Figure(figsize=(12, 8) if layout in UNITS else (11, 8), dpi=dpi)
+            canvas = FigureCanvasAgg(fig)
+            if layout in UNITS:
+                draw_comparison(fig, times[first:last], rows, layout, gap_ns, suffix)
+            else:
+                draw_phase(fig, times[first:last], rows, layout[-1], gap_ns, suffix)
+            canvas.draw()
+            # PNG en RGB (sans transparence) : recopié tel quel dans le PDF
+            path = page_path(out_dir, start_ns, layout)
+            Image.fromarray(np.asarray(canvas.buffer_rgba())[:, :, :3]).save(path)
+            paths.append(path)
+    return paths
+
+
+def render_shared(schema, count, pages, layouts, out_dir, gap_ns, dpi):
+    """render_pages() on the columns placed in shared memory by the parent
+    ({column: (shared memory name, dtype)}, `count` rows; runs in a worker
+    process)"""
+    from loader import attach_shared
+    blocks = {}
+    arrays = {}
+    try:
+        for col, (name, dtype) in schema.items():
+            blocks[col] = attach_shared(name)
+            arrays[col] = np.ndarray(count, dtype=dtype, buffer=blocks[col].buf)
+        return render_pages(arrays, pages, layouts, out_dir, gap_ns, dpi)
+    finally:
+        arrays.clear()
+        for block in blocks.values():
+            block.close()
+
+
+def build_report(data, out_dir, period="Jour", layouts=DEFAULT_LAYOUTS, gap_ns=None, workers=None,
+                 pdf_path=None, dpi=DPI):
+    """PNG images of every period of the rows of `data` (DataFrame with
+    'time' and the columns of the layouts) in out_dir, and with pdf_path a
+    PDF of all of them. The periods are shared between `workers` processes.
+    Without gap_ns the gap threshold follows the median time step (quality).
+    Returns the paths of the images."""
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    os.makedirs(out_dir, exist_ok=True)
+    columns = sorted({col for layout in layouts for col in layout_columns(layout)})
+    times = data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.argsort(times, kind='stable') if (np.diff(times) < 0).any() else None
+    arrays = {'time': times if order is None else times[order]}
+    for col in columns:
+        values = data[col].to_numpy(dtype=np.float64)
+        arrays[col] = values if order is None else values[order]
+    if gap_ns is None:
+        gap_ns = gap_threshold(np.diff(arrays['time']))[0]  # seuil de quality.scan
+    pages = report_pages(arrays['time'], period)
+
+    workers = min(workers or os.cpu_count() or 1, len(pages))
+    if workers <= 1:
+        paths = render_pages(arrays, pages, layouts, out_dir, gap_ns, dpi)
+    else:
+        if os.name == 'posix':
+            # Même suivi des blocs partagés pour tous les processus (voir loader.read_parallel)
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        blocks = {}
+        try:
+            for col, values in arrays.items():
+                blocks[col] = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+                np.ndarray(len(values), dtype=values.dtype, buffer=blocks[col].buf)[:] = values
+            schema = {col: (blocks[col].name, arrays[col].dtype.str) for col in arrays}
+            # Lots de périodes consécutives, plusieurs par processus pour équilibrer la charge
+            chunks = np.array_split(np.arange(len(pages)), min(len(pages), workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(render_shared, schema, len(times), [pages[k] for k in chunk], layouts,
+                                       out_dir, gap_ns, dpi) for chunk in chunks]
+                paths = [path for future in futures for path in future.result()]
+        finally:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+    if pdf_path:
+        with PdfImages(pdf_path, dpi) as pdf:
+            for path in paths:
+                pdf.add_png(path)
+    return paths
+
+
+class PdfImages:
+    """Multi-page PDF with one PNG image (8 bit RGB or grey, not interlaced)
+    per page, written page by page: the compressed PNG data goes in the PDF
+    as it is (FlateDecode with the PNG predictors), nothing is decoded."""
+
+    def __init__(self, path, dpi=DPI):
+        self.file = open(path, "wb")
+        self.dpi = dpi
+        self.offsets = []  # position de chaque objet, le n° k à l'indice k - 1
+        self.pages = []
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.pages_id = self.reserve()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def write_object(self, number, body, stream=None):
+        self.offsets[number - 1] = self.file.tell()
+        self.file.write(b"%d 0 obj\n" % number + body)
+        if stream is not None:
+            self.file.write(b"\nstream\n" + stream + b"\nendstream")
+        self.file.write(b"\nendobj\n")
+
+    def add_png(self, path):
+        with open(path, "rb") as f:
+            png = f.read()
+        if png[:8] != b"\x89PNG\r\n\x1a\n":
+            raise ValueError(f"Not a PNG file: {path}")
+        position = 8
+        data = []
+        while position < len(png):
+            length, kind = struct.unpack(">I4s", png[position:position + 8])
+            chunk = png[position + 8:position + 8 + length]
+            if kind == b"IHDR":
+                width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+                if depth != 8 or color not in (0, 2) or interlace:
+                    raise ValueError(f"PNG not 8 bit RGB or grey: {path}")
+            elif kind == b"IDAT":
+                data.append(chunk)
+            position += 12 + length
+        colors = 3 if color == 2 else 1
+
+        image_id, content_id, page_id = self.reserve(), self.reserve(), self.reserve()
+        self.write_object(image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                          b"/ColorSpace /%s /BitsPerComponent 8 /Filter /FlateDecode "
+                          b"/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent 8 /Columns %d >> "
+                          b"/Length %d >>" % (width, height, b"DeviceRGB" if colors == 3 else b"DeviceGray",
+                                              colors, width, sum(map(len, data))), b"".join(data))
+        # Taille de la page en points (1/72 pouce) d'après la résolution des images
+        page_width, page_height = width * 72 / self.dpi, height * 72 / self.dpi
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        self.write_object(content_id, b"<< /Length %d >>" % len(content), content)
+        self.write_object(page_id, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+                          b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                          % (self.pages_id, page_width, page_height, image_id, content_id))
+        self.pages.append(page_id)
+
+    def close(self):
+        if self.file.closed:
+            return
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        self.write_object(self.pages_id, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        catalog_id = self.reserve()
+        self.write_object(catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % self.pages_id)
+        xref = self.file.tell()
+        self.file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.file.write(b"%010d 00000 n \n" % offset)
+        self.file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                        % (len(self.offsets) + 1, catalog_id, xref))
+        self.file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rapport en images des mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    build_parser = commands.add_parser("build", help="une image par période et par tracé")
+    build_parser.add_argument("file")
+    build_parser.add_argument("out_dir")
+    build_parser.add_argument("--period", choices=REPORT_PERIODS, default="Jour")
+    build_parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=DEFAULT_LAYOUTS,
+                              help="tracés (type de comparaison ou 'Phase N')")
+    build_parser.add_argument("--workers", type=int, help="processus de rendu (un par cœur par défaut)")
+    build_parser.add_argument("--pdf", help="PDF de toutes les images")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from dataset import PhaseDataset
+        columns = sorted({col for layout in args.layouts for col in layout_columns(layout)})
+        dataset = PhaseDataset.from_csv(args.file, columns)
+        started = time_module.perf_counter()
+        paths = build_report(dataset.data, args.out_dir, args.period, args.layouts, dataset.quality().gap_ns,
+                             args.workers, args.pdf)
+        print(f"{len(paths)} images en {time_module.perf_counter() - started:.1f} s")
+    else:
+        parser.print_help()
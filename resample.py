@@ -0,0 +1,189 @@
+# *******************************************
+# Rééchantillonnage à intervalle fixe (profils de charge)
+# - Intervalles alignés sur l'horloge (1 min, 15 min, 1 h...)
+# - Moyenne, Max, Min par intervalle en une réduction numpy (reduceat)
+# - Énergie exacte par intervalle : énergie cumulée (trapèzes) évaluée aux
+#   bornes des intervalles, trous de l'enregistrement exclus
+# - Comparaison avec pandas :
+#     python resample.py bench fichier.csv
+#********************************************
+
+import argparse
+import time as time_module
+
+import numpy as np
+import pandas as pd
+
+from stats_engine import NS_PER_SECOND, JOULES_PER_KWH
+
+RESOLUTIONS = {"1 min": 60, "15 min": 900, "1 h": 3600}  # secondes
+
+
+def cumulative_energy(times_ns, power, max_step_ns=None):
+    """Energy (J) from the first sample to each sample, trapezoidal rule.
+    Intervals longer than `max_step_ns` (gaps) or with a missing value
+    add nothing."""
+    power = np.asarray(power, dtype=np.float64)
+    steps = np.diff(times_ns)
+    areas = (power[:-1] + power[1:]) / 2 * (steps / NS_PER_SECOND)
+    excluded = np.isnan(areas) | (steps < 0)
+    if max_step_ns is not None:
+        excluded |= steps > max_step_ns
+    areas[excluded] = 0.0
+    return np.concatenate(([0.0], np.cumsum(areas))), excluded
+
+
+def energy_at(times_ns, power, cumulative, excluded, at_ns):
+    """Energy (J) from the first sample to the instants `at_ns`: the power is
+    linear between two samples, so the part of the interval before the
+    instant is integrated exactly."""
+    power = np.asarray(power, dtype=np.float64)
+    at_ns = np.asarray(at_ns, dtype=np.int64)
+    i = np.searchsorted(times_ns, at_ns, 'right') - 1
+    inside = (i >= 0) & (i < len(times_ns) - 1)
+    result = np.where(i < 0, 0.0, cumulative[np.clip(i, 0, len(cumulative) - 1)])
+
+    k = i[inside]
+    span = (times_ns[k + 1] - times_ns[k]) / NS_PER_SECOND
+    elapsed = (at_ns[inside] - times_ns[k]) / NS_PER_SECOND
+    partial = power[k] * elapsed + (power[k + 1] - power[k]) * elapsed ** 2 / (2 * span)
+    partial[excluded[k] | np.isnan(partial)] = 0.0
+    result[inside] += partial
+    return result
+
+
+def energy_between(times_ns, power, start_ns, end_ns, max_step_ns=None):
+    """Energy (J) between two instants, which need not be sample times"""
+    cumulative, excluded = cumulative_energy(times_ns, power, max_step_ns)
+    first, last = energy_at(times_ns, power, cumulative, excluded, [start_ns, end_ns])
+    return float(last - first)
+
+
+def resample(data, columns, seconds, max_step_ns=None):
+    """Fixed-interval profile of `columns`: one row per non-empty interval of
+    `seconds` aligned on the clock, with 'time' (start of the interval),
+    'count', the mean (column name), '<col>_max', '<col>_min' and, for the
+    power columns, '<col>_kwh' (energy inside the interval).
+
+    Empty intervals crossed by a step that is integrated (not a gap longer
+    than `max_step_ns`) get a row too, with count 0 and only their energy,
+    so that the energies of the rows add up to the energy of the range."""
+    times = data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = None
+    if len(times) > 1 and (np.diff(times) < 0).any():
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+    if len(times) == 0:
+        return pd.DataFrame({'time': np.array([], dtype='datetime64[ns]'), 'count': np.array([], dtype=np.int64)})
+
+    width = int(seconds * NS_PER_SECOND)
+    buckets = times // width
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    filled = buckets[starts]
+    # Intervalles vides traversés par un pas intégré : ajoutés sans mesure
+    skipped = np.diff(filled) - 1
+    if max_step_ns is not None:
+        skipped[times[starts[1:]] - times[starts[1:] - 1] > max_step_ns] = 0
+    if skipped.any():
+        first = np.repeat(filled[:-1] + 1, skipped)
+        rank = np.arange(len(first)) - np.repeat(np.cumsum(skipped) - skipped, skipped)
+        all_buckets = np.sort(np.concatenate((filled, first + rank)))
+    else:
+        all_buckets = filled
+    position = np.searchsorted(all_buckets, filled)
+    bucket_start = all_buckets * width
+
+    def spread(values, empty):
+        """Values of the non-empty intervals placed among all the intervals"""
+        if len(all_buckets) == len(filled):
+            return values
+        full = np.full(len(all_buckets), empty, dtype=np.asarray(values).dtype)
+        full[position] = values
+        return full
+
+    result = {'time': bucket_start.view('datetime64[ns]'),
+              'count': spread(np.diff(np.append(starts, len(times))), 0)}
+
+    for col in columns:
+        values = data[col].to_numpy(dtype=np.float64)
+        if order is not None:
+            values = values[order]
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid, starts)
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[col] = spread(np.where(count > 0, total / count, np.nan), np.nan)
+        result[f"{col}_max"] = spread(np.fmax.reduceat(values, starts), np.nan)
+        result[f"{col}_min"] = spread(np.fmin.reduceat(values, starts), np.nan)
+        if col.startswith("powermoy"):
+            cumulative, excluded = cumulative_energy(times, values, max_step_ns)
+            # Début et fin de chaque intervalle évalués (intervalles vides non traversés sautés)
+            begin = energy_at(times, values, cumulative, excluded, bucket_start)
+            end = energy_at(times, values, cumulative, excluded, bucket_start + width)
+            result[f"{col}_kwh"] = (end - begin) / JOULES_PER_KWH
+    return pd.DataFrame(result)
+
+
+def decimate(times, values, columns, gap_ns=None):
+    """Points drawing the same line as times/values on `columns` pixel
+    columns: first, min, max and last value of the rows of each column (M4),
+    with a NaN point at the gaps like quality.with_breaks"""
+    from quality import gap_breaks, with_breaks
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) <= 4 * columns:
+        return with_breaks(times, values, gap_ns)
+    ns = times.view(np.int64)
+    span = max(int(ns[-1] - ns[0]), 1)
+    column = np.minimum(((ns - ns[0]) / span * columns).astype(np.int64), columns - 1)
+    segment = np.zeros(len(ns), dtype=np.int64)
+    segment[gap_breaks(times, gap_ns)] = 1
+    segment = np.cumsum(segment)
+    starts = np.concatenate(([0], np.flatnonzero((np.diff(column) != 0) | (np.diff(segment) != 0)) + 1))
+    ends = np.append(starts[1:], len(ns)) - 1
+    middle = ns[starts] + (ns[ends] - ns[starts]) // 2
+    with np.errstate(invalid='ignore'):
+        low = np.fmin.reduceat(values, starts)
+        high = np.fmax.reduceat(values, starts)
+    points_ns = np.stack((ns[starts], middle, middle, ns[ends]), axis=1).ravel()
+    points = np.stack((values[starts], low, high, values[ends]), axis=1).ravel()
+    # Trous : point NaN avant le premier groupe de chaque segment
+    breaks = 4 * np.flatnonzero(np.diff(segment[starts]) != 0) + 4
+    if len(breaks):
+        points_ns = np.insert(points_ns, breaks, points_ns[breaks - 1])
+        points = np.insert(points, breaks, np.nan)
+    return points_ns.view('datetime64[ns]'), points
+
+
+def bench(file_path, repeat=3):
+    """Compare resample() with pandas resample on a log file"""
+    from dataset import PhaseDataset, measure_columns
+    data = PhaseDataset.from_csv(file_path).data
+    columns = measure_columns(data.columns)
+    print(f"{len(data):,} lignes, {len(columns)} colonnes")
+    for label, seconds in RESOLUTIONS.items():
+        timings = []
+        for _ in range(repeat):
+            started = time_module.perf_counter()
+            resample(data, columns, seconds)
+            timings.append(time_module.perf_counter() - started)
+        ours = min(timings)
+        timings = []
+        for _ in range(repeat):
+            started = time_module.perf_counter()
+            data.set_index('time')[columns].resample(f"{seconds}s").agg(['mean', 'max', 'min'])
+            timings.append(time_module.perf_counter() - started)
+        theirs = min(timings)
+        print(f"{label:>6} : {1000 * ours:8.1f} ms   pandas (sans énergie) : {1000 * theirs:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rééchantillonnage des mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    bench_parser = commands.add_parser("bench", help="comparaison avec pandas resample")
+    bench_parser.add_argument("file")
+    args = parser.parse_args()
+    if args.command == "bench":
+        bench(args.file)
+    else:
+        parser.print_help()
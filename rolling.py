@@ -0,0 +1,129 @@
+# *******************************************
+# Statistiques glissantes des courbes
+# - Fenêtres centrées de 2L+1 points, tronquées aux extrémités (la moyenne
+#   garde autant de points à gauche qu'à droite, comme à l'origine)
+# - Moyenne et écart-type par sommes cumulées, Min et Max par l'algorithme
+#   de van Herk / Gil-Werman : coût en O(n) quelle que soit la fenêtre
+# - Médiane et percentiles par fenêtre triée (pandas, O(n log L)),
+#   moyenne exponentielle
+#********************************************
+
+import numpy as np
+import pandas as pd
+
+# Statistiques proposées par les fenêtres : libellé -> nom
+STATISTICS = {
+    "Moyenne": "mean",
+    "Min": "min",
+    "Max": "max",
+    "Écart-type": "std",
+    "Médiane": "median",
+    "P10": "p10",
+    "P90": "p90",
+    "Moyenne exp.": "ewma",
+}
+
+
+def window_bounds(n, half, symmetric=False):
+    """First and last+1 positions of the centered windows: at most `half`
+    points on each side, cut at the ends of the series (`symmetric`: as many
+    on the left as on the right)"""
+    position = np.arange(n)
+    if symmetric:
+        reach = np.minimum(np.minimum(position, n - 1 - position), half)
+        return position - reach, position + reach + 1
+    return np.maximum(position - half, 0), np.minimum(position + half + 1, n)
+
+
+def centered_mean(values, half):
+    """Mean of the 2*half+1 points centered on each point (fewer near the
+    ends); a window with a missing value gives a missing value"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    first, last = window_bounds(n, half, symmetric=True)
+    missing = np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+    result = (sums[last] - sums[first]) / (last - first)
+    result[gaps[last] > gaps[first]] = np.nan
+    return result
+
+
+def rolling_std(values, half):
+    """Sample standard deviation of the centered windows (missing values
+    ignored), by running sums of the values and of their squares"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    first, last = window_bounds(n, half)
+    valid = ~np.isnan(values)
+    # Valeurs centrées : sommes cumulées plus petites, moins d'erreurs d'arrondi
+    shifted = np.where(valid, values - (np.nanmean(values) if valid.any() else 0.0), 0.0)
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    count = counts[last] - counts[first]
+    total = sums[last] - sums[first]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares[last] - squares[first] - total * total / count) / (count - 1)
+    return np.sqrt(np.where(count > 1, np.maximum(variance, 0.0), np.nan))
+
+
+def rolling_extreme(values, half, largest=True):
+    """Max (or min) of the centered windows, missing values ignored.
+
+    van Herk / Gil-Werman: the series is cut in blocks of the window length,
+    with a running max from the left and from the right inside each block;
+    every window covers the end of one block and the start of the next, so
+    its max is one comparison of the two running maxima."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    width = 2 * half + 1
+    pick = np.fmax if largest else np.fmin
+    fill = -np.inf if largest else np.inf
+    # Marges de `half` points : les fenêtres des extrémités sont tronquées
+    blocks = -(-(n + 2 * half) // width)
+    padded = np.full(blocks * width + width, fill)
+    padded[half:half + n] = values
+    rows = padded.reshape(-1, width)
+    from_left = pick.accumulate(rows, axis=1).ravel()
+    from_right = pick.accumulate(rows[:, ::-1], axis=1)[:, ::-1].ravel()
+    result = pick(from_right[:n], from_left[width - 1:width - 1 + n])
+    result[np.isinf(result)] = np.nan  # fenêtre sans valeur
+    return result
+
+
+def rolling_quantile(values, half, quantile):
+    """Quantile (0..1) of the centered windows: pandas keeps the window
+    sorted (skip list), O(log L) per point"""
+    width = 2 * half + 1
+    series = pd.Series(np.asarray(values, dtype=np.float64))
+    return series.rolling(width, center=True, min_periods=1).quantile(quantile).to_numpy()
+
+
+def ewma(values, half):
+    """Exponentially weighted mean, span of 2*half+1 points"""
+    series = pd.Series(np.asarray(values, dtype=np.float64))
+    return series.ewm(span=2 * half + 1, ignore_na=True).mean().to_numpy()
+
+
+def rolling(values, half, statistic="mean"):
+    """One rolling statistic (a value of STATISTICS) of a series"""
+    if statistic == "mean":
+        return centered_mean(values, half)
+    if statistic == "std":
+        return rolling_std(values, half)
+    if statistic in ("min", "max"):
+        return rolling_extreme(values, half, statistic == "max")
+    if statistic == "median":
+        return rolling_quantile(values, half, 0.5)
+    if statistic.startswith("p"):
+        return rolling_quantile(values, half, int(statistic[1:]) / 100)
+    if statistic == "ewma":
+        return ewma(values, half)
+    raise ValueError(f"Unknown statistic: {statistic}")
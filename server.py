@@ -0,0 +1,383 @@
+# *******************************************
+# Serveur HTTP local des mesures (plusieurs utilisateurs, navigateur)
+# - Statistiques (JSON) et profils rééchantillonnés d'une plage de temps,
+#   image PNG d'une mesure d'une phase à la largeur demandée
+# - Résultats gardés dans un cache LRU limité en octets, vidé quand des lignes sont ajoutées
+#   au fichier (suivi du fichier journal en cours d'écriture)
+# - Requêtes traitées par un groupe de threads, serveur de la bibliothèque
+#   standard (http.server)
+# - En ligne de commande :
+#     python server.py serve journal.csv --port 8050 --follow
+#     python server.py loadtest --url http://127.0.0.1:8050 --clients 8 --requests 500
+#********************************************
+
+import argparse
+import io
+import json
+import os
+import threading
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from dataset import measure_columns
+from resample import RESOLUTIONS, decimate, resample
+from stats_engine import JOULES_PER_KWH, RunningStats, trapezoid_energy
+
+DEFAULT_PORT = 8050
+CACHE_BYTES = 64 * 2**20
+FOLLOW_SECONDS = 2.0  # intervalle de contrôle du fichier suivi
+METRICS = {"voltage": "voltagemoy", "current": "currentmoy", "power": "powermoy"}
+UNITS = {"voltagemoy": "V", "currentmoy": "A", "powermoy": "W"}
+
+
+class RequestError(ValueError):
+    """Bad query parameters (answered with HTTP 400)"""
+
+
+class NotFound(LookupError):
+    """Unknown path (answered with HTTP 404)"""
+
+
+def format_times(times):
+    return pd.DatetimeIndex(np.asarray(times, dtype='datetime64[ns]')).strftime('%Y-%m-%d %H:%M:%S').tolist()
+
+
+def json_values(values):
+    """List of floats with None for the missing values (NaN is not JSON)"""
+    values = np.asarray(values, dtype=np.float64)
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+class Snapshot:
+    """Rows of one version of the dataset: requests keep working on them
+    while new rows are appended"""
+
+    def __init__(self, dataset):
+        self.version = dataset.version
+        self.data = dataset.data
+        self.gap_ns = dataset.quality().gap_ns
+        self.times = self.data['time'].to_numpy(dtype='datetime64[ns]')
+        self.columns = measure_columns(self.data.columns)
+
+    def rows(self, start=None, end=None):
+        """Rows between start and end (included), rows in time order"""
+        first = 0 if start is None else int(np.searchsorted(self.times, np.datetime64(start, 'ns'), 'left'))
+        last = len(self.times) if end is None else int(np.searchsorted(self.times, np.datetime64(end, 'ns'), 'right'))
+        return self.data.iloc[first:max(first, last)]
+
+
+class DashboardApp:
+    """Answers of the server from the rows of a PhaseDataset"""
+
+    def __init__(self, dataset, cache_bytes=CACHE_BYTES):
+        self.dataset = dataset
+        self.cache = LRUCache(cache_bytes)
+        self.lock = threading.Lock()  # modifications du dataset (suivi du fichier)
+        self.snapshot = Snapshot(dataset)
+        self.requests = 0
+        dataset.add_listener(self.on_data_changed)
+
+    def on_data_changed(self, dataset):
+        self.snapshot = Snapshot(dataset)
+        self.cache.clear()
+
+    # ------------------------------------------------ paramètres
+    def time_param(self, query, name):
+        if name not in query:
+            return None
+        try:
+            value = pd.Timestamp(query[name][0])
+        except ValueError:
+            raise RequestError(f"Bad {name}: {query[name][0]}")
+        if value is pd.NaT or value.tzinfo is not None:
+            # Vide ou avec fuseau : les dates du fichier sont locales, sans fuseau
+            raise RequestError(f"Bad {name}: {query[name][0]}")
+        return value
+
+    def columns_param(self, query, snapshot):
+        if "columns" not in query:
+            return snapshot.columns
+        columns = query["columns"][0].split(",")
+        unknown = [col for col in columns if col not in snapshot.columns]
+        if unknown:
+            raise RequestError(f"Unknown columns: {', '.join(unknown)}")
+        return columns
+
+    def int_param(self, query, name, default, low, high):
+        try:
+            value = int(query.get(name, [default])[0])
+        except ValueError:
+            raise RequestError(f"Bad {name}: {query[name][0]}")
+        return min(max(value, low), high)
+
+    # ------------------------------------------------ réponses
+    def handle(self, path, query):
+        """(content type, body) of a request; RequestError or NotFound
+        (unknown path) for bad requests"""
+        self.requests += 1
+        if path == "/info":
+            return "application/json", json.dumps(self.info()).encode()
+        snapshot = self.snapshot
+        key = (snapshot.version, path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+        result = self.cache.get(key)
+        if result is None:
+            if path == "/stats":
+                result = "application/json", json.dumps(self.stats(snapshot, query)).encode()
+            elif path == "/profile":
+                result = "application/json", json.dumps(self.profile(snapshot, query)).encode()
+            elif path == "/plot.png":
+                result = "image/png", self.plot(snapshot, query)
+            else:
+                raise NotFound(path)
+            self.cache.put(key, result)
+        return result
+
+    def info(self):
+        snapshot = self.snapshot
+        return {"rows": len(snapshot.data), "version": snapshot.version, "columns": snapshot.columns,
+                "start": format_times(snapshot.times[:1])[0] if len(snapshot.times) else None,
+                "end": format_times(snapshot.times[-1:])[0] if len(snapshot.times) else None,
+                "requests": self.requests, "cache_hits": self.cache.hits, "cache_misses": self.cache.misses}
+
+    def stats(self, snapshot, query):
+        """Count, mean, min, max (dated) and energy of the power columns over
+        a time range"""
+        rows = snapshot.rows(self.time_param(query, "start"), self.time_param(query, "end"))
+        times = rows['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        result = {"rows": len(rows)}
+        for col in self.columns_param(query, snapshot):
+            stats = RunningStats()
+            stats.update(times, rows[col].to_numpy())
+            if stats.count == 0:
+                result[col] = {"count": 0}
+                continue
+            result[col] = {"count": stats.count, "mean": stats.mean, "std": float(np.sqrt(stats.variance)),
+                           "min": stats.min, "min_time": format_times([stats.min_time])[0],
+                           "max": stats.max, "max_time": format_times([stats.max_time])[0]}
+            if col.startswith("powermoy"):
+                # Trous de l'enregistrement exclus, comme dans les fenêtres
+                result[col]["energy_kwh"] = trapezoid_energy(times, rows[col], snapshot.gap_ns) / JOULES_PER_KWH
+        return result
+
+    def profile(self, snapshot, query):
+        """Mean, min and max per interval ('resolution': a key of RESOLUTIONS)"""
+        resolution = query.get("resolution", ["15 min"])[0]
+        if resolution not in RESOLUTIONS:
+            raise RequestError(f"Bad resolution: {resolution} ({', '.join(RESOLUTIONS)})")
+        rows = snapshot.rows(self.time_param(query, "start"), self.time_param(query, "end"))
+        profile = resample(rows, self.columns_param(query, snapshot), RESOLUTIONS[resolution], snapshot.gap_ns)
+        result = {"resolution": resolution, "time": format_times(profile['time'])}
+        result.update((col, json_values(profile[col])) for col in profile.columns if col != 'time')
+        return result
+
+    def plot(self, snapshot, query):
+        """PNG of one measurement of one phase ('metric': voltage, current or
+        power; 'phase': 1 to 4) over a time range, `width` x `height` pixels"""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        import matplotlib.dates as mdates
+        metric = query.get("metric", ["power"])[0]
+        phase = query.get("phase", ["1"])[0]
+        if metric not in METRICS or phase not in ("1", "2", "3", "4"):
+            raise RequestError(f"Bad metric or phase: {metric} {phase}")
+        col = f"{METRICS[metric]}{phase}"
+        if col not in snapshot.columns:
+            raise RequestError(f"Column not loaded: {col}")
+        width = self.int_param(query, "width", 800, 100, 4000)
+        height = self.int_param(query, "height", 300, 100, 2000)
+        rows = snapshot.rows(self.time_param(query, "start"), self.time_param(query, "end"))
+
+        fig = Figure(figsize=(width / 100, height / 100), dpi=100)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        if len(rows):
+            # Pas plus de points que de colonnes de pixels
+            ax.plot(*decimate(rows['time'].to_numpy(), rows[col].to_numpy(), width, snapshot.gap_ns),
+                    color='blue', linewidth=1)
+            mean = rows[col].astype(np.float64).mean()
+            ax.axhline(y=mean, color='red', linestyle='--', alpha=0.5)
+            ax.set_title(f"{metric.capitalize()} - Phase {phase} (Avg: {mean:.2f} {UNITS[METRICS[metric]]})", fontsize=9)
+        ax.grid(True)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M'))
+        ax.tick_params(labelsize=7)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        canvas.print_png(buffer)
+        return buffer.getvalue()
+
+    # ------------------------------------------------ suivi du fichier
+    def follow(self, stop, seconds=FOLLOW_SECONDS):
+        """Append the complete lines written at the end of the file until
+        `stop` (threading.Event) is set"""
+        path = self.dataset.file_path
+        offset = os.path.getsize(path)
+        while not stop.wait(seconds):
+            size = os.path.getsize(path)
+            if size < offset:
+                # Fichier remplacé ou tronqué : relecture complète
+                with self.lock:
+                    self.dataset.reload()
+                offset = size
+                continue
+            if size == offset:
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                block = f.read(size - offset)
+            end = block.rfind(b"\n") + 1  # lignes complètes seulement
+            if end:
+                with self.lock:
+                    self.dataset.append_lines(block[:end].decode("utf-8").splitlines())
+                offset += end
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            content_type, body = self.server.app.handle(url.path, parse_qs(url.query, keep_blank_values=True))
+            status = 200
+        except RequestError as e:
+            content_type, body, status = "application/json", json.dumps({"error": str(e)}).encode(), 400
+        except NotFound:
+            content_type, body, status = "application/json", json.dumps({"error": "Not found"}).encode(), 404
+        except Exception as e:
+            content_type, body, status = "application/json", json.dumps({"error": f"Server error: {e}"}).encode(), 500
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # pas une ligne par requête
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer handing each connection to a pool of threads (at most
+    `workers` requests computed at the same time)"""
+
+    daemon_threads = True
+
+    def __init__(self, address, app, workers=4):
+        super().__init__(address, RequestHandler)
+        self.app = app
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def serve(dataset, host="127.0.0.1", port=DEFAULT_PORT, workers=4, follow=False):
+    """Serve the dataset until interrupted (Ctrl+C)"""
+    app = DashboardApp(dataset)
+    server = PooledHTTPServer((host, port), app, workers)
+    stop = threading.Event()
+    if follow:
+        threading.Thread(target=app.follow, args=(stop,), daemon=True).start()
+    print(f"http://{host}:{server.server_address[1]}/info  ({len(dataset.data):,} lignes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+def load_test(url, clients=8, requests=500, hot_ranges=20, seed=0):
+    """Requests of `clients` threads at the same time: random time ranges,
+    half of them among `hot_ranges` ranges asked again and again (cached).
+    Prints the rate, the latencies and the cache counters of the server."""
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+    with urlopen(f"{url}/info") as response:
+        info = json.load(response)
+    start = pd.Timestamp(info["start"]).value
+    span = pd.Timestamp(info["end"]).value - start
+    rng = np.random.default_rng(seed)
+
+    def random_query():
+        first = start + int(rng.random() * span * 0.9)
+        last = first + int(rng.random() * (start + span - first)) + 1
+        kind = rng.integers(3)
+        times = (f"start={pd.Timestamp(first).strftime('%Y-%m-%dT%H:%M:%S')}"
+                 f"&end={pd.Timestamp(last).strftime('%Y-%m-%dT%H:%M:%S')}")
+        if kind == 0:
+            return f"/stats?{times}"
+        if kind == 1:
+            return f"/profile?{times}&resolution=15+min"
+        return f"/plot.png?{times}&metric=power&phase={rng.integers(1, 4)}&width=800"
+
+    hot = [random_query() for _ in range(hot_ranges)]
+    queries = [hot[rng.integers(hot_ranges)] if rng.random() < 0.5 else random_query() for _ in range(requests)]
+    latencies = []
+    errors = []
+
+    def fetch(query):
+        started = time_module.perf_counter()
+        try:
+            with urlopen(url + query) as response:
+                response.read()
+        except (HTTPError, OSError) as e:
+            errors.append(f"{query}: {e}")
+        latencies.append(time_module.perf_counter() - started)
+
+    started = time_module.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(fetch, queries))
+    elapsed = time_module.perf_counter() - started
+    with urlopen(f"{url}/info") as response:
+        after = json.load(response)
+    latencies = np.sort(latencies)
+    print(f"{requests} requêtes, {clients} clients : {requests / elapsed:.1f} requêtes/s")
+    print(f"latence médiane {1000 * latencies[len(latencies) // 2]:.1f} ms, "
+          f"95 % {1000 * latencies[int(len(latencies) * 0.95)]:.1f} ms, max {1000 * latencies[-1]:.1f} ms")
+    print(f"cache : {after['cache_hits'] - info['cache_hits']} succès, "
+          f"{after['cache_misses'] - info['cache_misses']} calculs, {len(errors)} erreur(s)")
+    for error in errors[:5]:
+        print("  " + error)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur HTTP local des mesures de phases")
+    commands = parser.add_subparsers(dest="command")
+    serve_parser = commands.add_parser("serve", help="servir un fichier journal")
+    serve_parser.add_argument("file")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--workers", type=int, default=4, help="requêtes traitées en même temps")
+    serve_parser.add_argument("--follow", action="store_true", help="ajouter les lignes écrites dans le fichier")
+    serve_parser.add_argument("--compact", action="store_true", help="mesures en float32")
+    load_parser = commands.add_parser("loadtest", help="requêtes simultanées sur un serveur")
+    load_parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    load_parser.add_argument("--clients", type=int, default=8)
+    load_parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        from dataset import PhaseDataset
+        serve(PhaseDataset.from_csv(args.file, compact=args.compact), args.host, args.port, args.workers,
+              args.follow)
+    elif args.command == "loadtest":
+        load_test(args.url.rstrip("/"), args.clients, args.requests)
+    else:
+        parser.print_help()
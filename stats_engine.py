@@ -0,0 +1,332 @@
+# *******************************************
+# Statistiques des mesures
+# - Accumulateurs mis à jour par lots (moyenne de Welford, min/max datés,
+#   énergie par la méthode des trapèzes)
+# - Mêmes statistiques sur une fenêtre glissante (lignes ajoutées à la fin,
+#   retirées au début), pour l'affichage en direct
+# - Statistiques d'un fichier lu par blocs, en parallèle sur plusieurs processus
+#********************************************
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+NS_PER_SECOND = 1e9
+JOULES_PER_KWH = 3600000
+
+
+def trapezoid_energy(times_ns, power, max_step_ns=None):
+    """Energy (J) of a power series (W) with the trapezoidal rule.
+    With `max_step_ns`, intervals longer than it (gaps in the recording) or
+    going back in time are left out."""
+    if len(power) < 2:
+        return 0.0
+    steps = np.diff(np.asarray(times_ns, dtype=np.int64))
+    power = np.asarray(power, dtype=np.float64)
+    areas = (power[:-1] + power[1:]) / 2 * (steps / NS_PER_SECOND)
+    if max_step_ns is not None:
+        areas[(steps > max_step_ns) | (steps < 0)] = 0.0
+    return float(np.nansum(areas))
+
+
+class RunningStats:
+    """Statistics of a column updated batch after batch without keeping the
+    samples: count, mean and variance (Welford/Chan), dated min and max and
+    trapezoidal energy, including the interval between two batches.
+    With `max_step_ns`, intervals longer than it (gaps) or going back in time
+    are left out of the energy, as in trapezoid_energy."""
+
+    def __init__(self, max_step_ns=None):
+        self.max_step_ns = max_step_ns
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.min_time = None
+        self.max = -np.inf
+        self.max_time = None
+        self.energy = 0.0  # J
+        self.first_time = None
+        self.first_value = None
+        self.last_time = None
+        self.last_value = None
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else np.nan
+
+    @property
+    def energy_kwh(self):
+        return self.energy / JOULES_PER_KWH
+
+    def update(self, times_ns, values):
+        """Add a batch of samples (times in ns, in increasing order)"""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            times_ns = times_ns[valid]
+            values = values[valid]
+        n = len(values)
+        if n == 0:
+            return
+
+        batch = RunningStats(self.max_step_ns)
+        batch.count = n
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        i_min = int(values.argmin())
+        i_max = int(values.argmax())
+        batch.min, batch.min_time = float(values[i_min]), int(times_ns[i_min])
+        batch.max, batch.max_time = float(values[i_max]), int(times_ns[i_max])
+        batch.energy = trapezoid_energy(times_ns, values, self.max_step_ns)
+        batch.first_time, batch.first_value = int(times_ns[0]), float(values[0])
+        batch.last_time, batch.last_value = int(times_ns[-1]), float(values[-1])
+        self.combine(batch)
+
+    def combine(self, other):
+        """Merge the statistics of the samples that follow (in time) ours"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            max_step_ns = self.max_step_ns
+            self.__dict__.update(other.__dict__)
+            self.max_step_ns = max_step_ns
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        if other.min < self.min:
+            self.min, self.min_time = other.min, other.min_time
+        if other.max > self.max:
+            self.max, self.max_time = other.max, other.max_time
+        # Trapèze entre le dernier échantillon et le premier de la suite (sauf trou)
+        self.energy += other.energy
+        step = other.first_time - self.last_time
+        if self.max_step_ns is None or 0 <= step <= self.max_step_ns:
+            self.energy += (self.last_value + other.first_value) / 2 * step / NS_PER_SECOND
+        self.last_time, self.last_value = other.last_time, other.last_value
+        return self
+
+
+class RowArrays:
+    """Columns of rows kept in preallocated arrays: rows are appended at the
+    end and dropped at either end without moving the others (the arrays are
+    compacted, or grown, only when the end is reached)"""
+
+    def __init__(self, dtypes):
+        self.dtypes = dict(dtypes)
+        self.arrays = {name: np.empty(0, dtype) for name, dtype in self.dtypes.items()}
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, name):
+        """Rows of a column (view, valid until the next append)"""
+        return self.arrays[name][self.start:self.end]
+
+    def append(self, columns):
+        """Append rows: {name: array}, the same length for every name"""
+        n = len(next(iter(columns.values())))
+        live = len(self)
+        if self.end + n > len(self.arrays[next(iter(self.arrays))]):
+            capacity = max(2 * (live + n), 256)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, self.dtypes[name])
+                grown[:live] = array[self.start:self.end]
+                self.arrays[name] = grown
+            self.start, self.end = 0, live
+        for name, array in self.arrays.items():
+            array[self.end:self.end + n] = columns[name]
+        self.end += n
+
+    def drop_first(self, count):
+        self.start += min(count, len(self))
+
+    def keep_first(self, count):
+        self.end = self.start + min(count, len(self))
+
+
+class WindowStats:
+    """Statistics of the rows of a sliding time window, kept up to date row
+    by row: rows are appended at the end and expire at the start.
+
+    Count and mean come from running sums, the energy (trapezoids, steps
+    longer than `max_step_ns` or going back in time left out) adds the new
+    intervals and subtracts the expired ones, and the dated Min and Max are
+    the first rows of monotonic queues. Appending or expiring a row costs
+    O(1) amortized, whatever the length of the window.
+    `extra` names float columns kept with the rows, without statistics.
+    """
+
+    def __init__(self, columns, max_step_ns=None, extra=()):
+        self.columns = list(columns)
+        self.extra = list(extra)
+        self.max_step_ns = max_step_ns
+        dtypes = {'time': np.int64}
+        dtypes.update((name, np.float64) for name in self.columns + self.extra)
+        self.rows = RowArrays(dtypes)
+        self.sums = dict.fromkeys(self.columns, 0.0)
+        self.counts = dict.fromkeys(self.columns, 0)
+        self.energies = dict.fromkeys(self.columns, 0.0)
+        # Files monotones (date, clé) : clé croissante, valeur pour Min, -valeur pour Max
+        self.lows = {col: RowArrays({'time': np.int64, 'key': np.float64}) for col in self.columns}
+        self.highs = {col: RowArrays({'time': np.int64, 'key': np.float64}) for col in self.columns}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, name):
+        return self.rows[name]
+
+    def append(self, times_ns, values, **extra):
+        """Add rows (times in ns, increasing, after the last row); `values`
+        holds every column, the extra columns not given are NaN"""
+        times_ns = np.asarray(times_ns, dtype=np.int64)
+        n = len(times_ns)
+        if n == 0:
+            return
+        previous = self.rows['time'][-1:]
+        columns = {'time': times_ns}
+        for col in self.columns:
+            columns[col] = np.asarray(values[col], dtype=np.float64)
+        for name in self.extra:
+            columns[name] = extra.get(name, np.full(n, np.nan))
+        for col in self.columns:
+            new = columns[col]
+            valid = ~np.isnan(new)
+            self.sums[col] += float(new[valid].sum())
+            self.counts[col] += int(valid.sum())
+            # Intervalles ajoutés : depuis la dernière ligne de la fenêtre
+            self.energies[col] += trapezoid_energy(np.concatenate((previous, times_ns)),
+                                                   np.concatenate((self.rows[col][-1:], new)),
+                                                   self.max_step_ns)
+            self.push_extreme(self.lows[col], times_ns[valid], new[valid])
+            self.push_extreme(self.highs[col], times_ns[valid], -new[valid])
+        self.rows.append(columns)
+
+    @staticmethod
+    def push_extreme(queue, times_ns, keys):
+        """Monotonic queue of the smallest keys: the rows that no later row
+        beats, the first row holding the smallest key of the window"""
+        if not len(keys):
+            return
+        # Lignes de la file dépassées par une nouvelle ligne : retirées à la fin
+        queue.keep_first(int(np.searchsorted(queue['key'], keys.min(), 'right')))
+        # Nouvelles lignes qu'aucune ligne suivante ne dépasse (minima des suffixes)
+        following = np.append(np.minimum.accumulate(keys[::-1])[::-1][1:], np.inf)
+        kept = keys <= following
+        queue.append({'time': times_ns[kept], 'key': keys[kept]})
+
+    def expire(self, since_ns):
+        """Drop the rows older than since_ns"""
+        times = self.rows['time']
+        count = int(np.searchsorted(times, since_ns))
+        if count == 0:
+            return
+        for col in self.columns:
+            old = self.rows[col][:count]
+            valid = ~np.isnan(old)
+            self.sums[col] -= float(old[valid].sum())
+            self.counts[col] -= int(valid.sum())
+            # Intervalles retirés : de chaque ligne retirée à la suivante
+            self.energies[col] -= trapezoid_energy(times[:count + 1], self.rows[col][:count + 1],
+                                                   self.max_step_ns)
+            for queue in (self.lows[col], self.highs[col]):
+                queue.drop_first(int(np.searchsorted(queue['time'], since_ns)))
+        self.rows.drop_first(count)
+        if not len(self.rows):
+            # Fenêtre vide : sommes remises à zéro (pas d'erreur d'arrondi qui s'accumule)
+            self.sums = dict.fromkeys(self.columns, 0.0)
+            self.energies = dict.fromkeys(self.columns, 0.0)
+
+    def stats(self, col):
+        """RunningStats of a column over the window (count, mean, dated Min
+        and Max, energy; no variance)"""
+        result = RunningStats(self.max_step_ns)
+        result.count = self.counts[col]
+        if result.count == 0:
+            return result
+        result.mean = self.sums[col] / result.count
+        low, high = self.lows[col], self.highs[col]
+        result.min, result.min_time = float(low['key'][0]), int(low['time'][0])
+        result.max, result.max_time = -float(high['key'][0]), int(high['time'][0])
+        result.energy = self.energies[col]
+        result.m2 = np.nan
+        return result
+
+
+# ****************************************Statistiques d'un fichier plus gros que la mémoire
+
+def frame_partials(data, columns, time_range=None, gap_ns=None):
+    """RunningStats of each column for one block of rows (energy without
+    the steps longer than gap_ns)"""
+    if time_range is not None:
+        start, end = time_range
+        data = data[(data['time'] >= start) & (data['time'] <= end)]
+    times = data['time'].values.astype('datetime64[ns]').view(np.int64)
+    partials = {}
+    for col in columns:
+        partials[col] = RunningStats(gap_ns)
+        partials[col].update(times, data[col].values)
+    return partials
+
+
+def range_partials(file_path, start, end, columns, time_range=None, block_size=None, gap_ns=None):
+    """Statistics of the bytes [start, end) of the file, read block by block
+    (runs in a worker process)"""
+    # Import local : le module est aussi chargé dans les processus de calcul
+    from loader import BLOCK_SIZE, iter_frames
+    totals = {col: RunningStats(gap_ns) for col in columns}
+    for data in iter_frames(file_path, start, end, ['time'] + list(columns), block_size or BLOCK_SIZE):
+        for col, partial in frame_partials(data, columns, time_range, gap_ns).items():
+            totals[col].combine(partial)
+    return totals
+
+
+def file_gap_ns(file_path, block_size=None):
+    """Gap threshold (quality.gap_threshold) of the first block of the file"""
+    from loader import BLOCK_SIZE, iter_frames
+    from quality import gap_threshold
+    for data in iter_frames(file_path, usecols=['time'], block_size=block_size or BLOCK_SIZE):
+        times = data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        return gap_threshold(np.diff(times))[0]
+    return gap_threshold([])[0]
+
+
+def file_statistics(file_path, columns=None, time_range=None, workers=1, block_size=None, gap_ns=None):
+    """Exact statistics of a whole file (or of a time range) in one pass,
+    without loading it: peak memory is set by the block size.
+
+    With workers > 1 the file is split into byte ranges processed by a pool
+    of processes and the partial results are combined in file order.
+    The energy leaves out the gaps of the recording: steps longer than
+    gap_ns, by default the threshold of quality.scan for the first block.
+    Returns {column: RunningStats}.
+    """
+    from loader import read_header, split_byte_ranges
+    from dataset import measure_columns
+    if columns is None:
+        columns = measure_columns(read_header(file_path)[0])
+    if gap_ns is None:
+        gap_ns = file_gap_ns(file_path, block_size)
+    ranges = split_byte_ranges(file_path, workers)
+
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(range_partials, file_path, start, end, columns, time_range, block_size, gap_ns)
+                       for start, end in ranges]
+            partials = [future.result() for future in futures]
+    else:
+        partials = [range_partials(file_path, start, end, columns, time_range, block_size, gap_ns)
+                    for start, end in ranges]
+
+    totals = {col: RunningStats(gap_ns) for col in columns}
+    for partial in partials:
+        for col in columns:
+            totals[col].combine(partial[col])
+    return totals
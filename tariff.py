@@ -0,0 +1,243 @@
+# *******************************************
+# Énergie par période tarifaire (heures pleines / heures creuses...)
+# - Plages tarifaires par heure de la journée, jours de la semaine et
+#   dates de validité, lues dans un fichier JSON (tariff.json, dossier du programme)
+# - Énergie de chaque phase répartie entre les tarifs : énergie cumulée
+#   (trapèzes) évaluée à chaque changement de tarif, les intervalles à
+#   cheval sur un changement sont partagés exactement
+# - Énergie cumulée gardée dans le cache du PhaseDataset : un bilan sur
+#   une année ne fait que quelques recherches dichotomiques
+# - Bilan d'un fichier en ligne de commande :
+#     python tariff.py breakdown fichier.csv --by Jour --out bilan.csv
+#********************************************
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from periods import PERIODS, POWER_COLUMNS, period_starts
+from resample import cumulative_energy, energy_at
+from stats_engine import JOULES_PER_KWH
+
+NS_PER_DAY = 86400 * 1_000_000_000
+TARIFF_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tariff.json")  # à côté du programme
+# Heures creuses de 22h à 6h et tout le week-end, heures pleines sinon
+DEFAULT_TARIFF = {
+    "default": "HP",
+    "rules": [
+        {"name": "HC", "hours": ["22:00", "06:00"]},
+        {"name": "HC", "days": [5, 6]},
+    ],
+}
+
+
+def day_seconds(text):
+    """'HH:MM' to seconds since midnight ('24:00' is the end of the day)"""
+    hours, minutes = text.split(":")
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+class TariffRule:
+    """Times belonging to one tariff: hours of the day [start, end) (the
+    range may run over midnight), days of the week (0 is Monday) and dates
+    of validity [date_from, date_to] (None: no limit)"""
+
+    def __init__(self, name, start=0, end=86400, days=None, date_from=None, date_to=None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.days = list(range(7)) if days is None else list(days)
+        self.date_from = None if date_from is None else np.datetime64(date_from, 'D')
+        self.date_to = None if date_to is None else np.datetime64(date_to, 'D')
+
+    @classmethod
+    def from_dict(cls, rule):
+        start, end = rule.get("hours", ["00:00", "24:00"])
+        return cls(rule["name"], day_seconds(start), day_seconds(end), rule.get("days"),
+                   rule.get("from"), rule.get("to"))
+
+    def to_dict(self):
+        rule = {"name": self.name,
+                "hours": [f"{self.start // 3600:02d}:{self.start % 3600 // 60:02d}",
+                          f"{self.end // 3600:02d}:{self.end % 3600 // 60:02d}"]}
+        if self.days != list(range(7)):
+            rule["days"] = self.days
+        if self.date_from is not None:
+            rule["from"] = str(self.date_from)
+        if self.date_to is not None:
+            rule["to"] = str(self.date_to)
+        return rule
+
+    def matches(self, times_ns):
+        """Mask of the times (ns) that belong to the rule"""
+        days = times_ns // NS_PER_DAY
+        seconds = times_ns % NS_PER_DAY // 1_000_000_000
+        if self.start <= self.end:
+            mask = (seconds >= self.start) & (seconds < self.end)
+        else:
+            mask = (seconds >= self.start) | (seconds < self.end)
+        mask &= np.isin((days + 3) % 7, self.days)  # le 01/01/1970 est un jeudi
+        if self.date_from is not None:
+            mask &= days >= self.date_from.astype(np.int64)
+        if self.date_to is not None:
+            mask &= days <= self.date_to.astype(np.int64)
+        return mask
+
+
+class TariffSchedule:
+    """Ordered tariff rules: a time gets the tariff of the first rule it
+    matches, the `default` tariff if none"""
+
+    def __init__(self, rules, default="HP"):
+        self.rules = list(rules)
+        self.default = default
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls([TariffRule.from_dict(rule) for rule in config.get("rules", [])],
+                   config.get("default", "HP"))
+
+    def to_dict(self):
+        return {"default": self.default, "rules": [rule.to_dict() for rule in self.rules]}
+
+    @classmethod
+    def load(cls, path=TARIFF_FILE):
+        """Schedule of the JSON file, the default one if the file is missing"""
+        if not os.path.exists(path):
+            return cls.from_dict(DEFAULT_TARIFF)
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path=TARIFF_FILE):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def names(self):
+        """Tariff names, the default one first"""
+        names = [self.default]
+        for rule in self.rules:
+            if rule.name not in names:
+                names.append(rule.name)
+        return names
+
+    def classify(self, times_ns):
+        """Position in names() of the tariff of each time (ns)"""
+        times_ns = np.asarray(times_ns, dtype=np.int64)
+        names = self.names()
+        result = np.zeros(len(times_ns), dtype=np.intp)
+        pending = np.ones(len(times_ns), dtype=bool)
+        for rule in self.rules:
+            mask = pending & rule.matches(times_ns)
+            result[mask] = names.index(rule.name)
+            pending &= ~mask
+        return result
+
+    def boundaries(self, start_ns, end_ns):
+        """Instants between start and end (both included) where the tariff
+        may change: every rule hour of every day, and midnight (days of the
+        week and dates of validity change at midnight)"""
+        edges = {0}
+        for rule in self.rules:
+            edges.update((rule.start % 86400, rule.end % 86400))
+        edges = np.array(sorted(edges), dtype=np.int64) * 1_000_000_000
+        days = np.arange(start_ns // NS_PER_DAY, end_ns // NS_PER_DAY + 1, dtype=np.int64) * NS_PER_DAY
+        instants = (days[:, None] + edges[None, :]).ravel()
+        instants = instants[(instants > start_ns) & (instants < end_ns)]
+        return np.concatenate(([start_ns], instants, [end_ns]))
+
+
+class EnergyCurve:
+    """Cumulative energy of a power column, computed once: the energy between
+    any two instants is then two lookups (resample.energy_at)"""
+
+    def __init__(self, times_ns, power, max_step_ns=None):
+        times_ns = np.asarray(times_ns, dtype=np.int64)
+        power = np.asarray(power, dtype=np.float64)
+        if len(times_ns) > 1 and (np.diff(times_ns) < 0).any():
+            order = np.argsort(times_ns, kind='stable')
+            times_ns, power = times_ns[order], power[order]
+        self.times = times_ns
+        self.power = power
+        self.cumulative, self.excluded = cumulative_energy(times_ns, power, max_step_ns)
+
+    @classmethod
+    def for_dataset(cls, dataset, column, max_step_ns=None):
+        """Curve of a column of a PhaseDataset, kept in its cache until the rows change"""
+        key = ('energy', column, max_step_ns)
+        if key not in dataset.cache:
+            times = dataset.data['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            dataset.cache[key] = cls(times, dataset.data[column].to_numpy(), max_step_ns)
+        return dataset.cache[key]
+
+    def at(self, at_ns):
+        """Energy (J) from the first sample to each instant"""
+        if len(self.times) == 0:
+            return np.zeros(len(at_ns))
+        return energy_at(self.times, self.power, self.cumulative, self.excluded, at_ns)
+
+
+def breakdown(curves, schedule, start, end, by=None):
+    """Energy (kWh) of each curve per tariff between start and end.
+
+    `curves` is {column: EnergyCurve}. Returns one row per tariff with a
+    '<column>_kwh' column per curve, or with `by` ("Jour", "Semaine" or
+    "Mois") one row per period and tariff with the start of the period in
+    'period'. Only the tariffs met in the range get a row.
+    """
+    start_ns = int(pd.Timestamp(start).value)
+    end_ns = int(pd.Timestamp(end).value)
+    bounds = schedule.boundaries(start_ns, end_ns)
+    names = schedule.names()
+    table = pd.DataFrame({'tariff': np.array(names, dtype=object)[schedule.classify(bounds[:-1])]})
+    keys = ['tariff']
+    if by is not None:
+        # Les périodes commencent à minuit, instant qui fait partie des limites
+        table.insert(0, 'period', period_starts(bounds[:-1], by))
+        keys = ['period', 'tariff']
+    for column, curve in curves.items():
+        table[f"{column}_kwh"] = np.diff(curve.at(bounds)) / JOULES_PER_KWH
+    table = table.groupby(keys, sort=False).sum().reset_index()
+    order = table['tariff'].map(names.index)
+    if by is not None:
+        return table.assign(order=order).sort_values(['period', 'order']).drop(columns='order').reset_index(drop=True)
+    return table.assign(order=order).sort_values('order').drop(columns='order').reset_index(drop=True)
+
+
+def dataset_breakdown(dataset, schedule, start, end, columns=POWER_COLUMNS, by=None, max_step_ns=None):
+    """breakdown() of the power columns of a PhaseDataset"""
+    curves = {col: EnergyCurve.for_dataset(dataset, col, max_step_ns)
+              for col in columns if col in dataset.data.columns}
+    return breakdown(curves, schedule, start, end, by)
+
+
+def export_breakdown(table, path):
+    """Write a breakdown table to a ';' CSV file like the log files"""
+    table.to_csv(path, sep=';', index=False, float_format='%.6f', date_format='%d/%m/%Y')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Énergie des phases par période tarifaire")
+    commands = parser.add_subparsers(dest="command")
+    breakdown_parser = commands.add_parser("breakdown", help="bilan par tarif d'un fichier journal")
+    breakdown_parser.add_argument("file")
+    breakdown_parser.add_argument("--config", default=TARIFF_FILE, help="plages tarifaires (JSON)")
+    breakdown_parser.add_argument("--by", choices=PERIODS, help="une ligne par période et par tarif")
+    breakdown_parser.add_argument("--out", help="fichier CSV du bilan")
+    args = parser.parse_args()
+
+    if args.command == "breakdown":
+        from dataset import PhaseDataset
+        from quality import scan
+        dataset = PhaseDataset.from_csv(args.file, POWER_COLUMNS)
+        times = dataset.data['time']
+        table = dataset_breakdown(dataset, TariffSchedule.load(args.config), times.min(), times.max(),
+                                  by=args.by, max_step_ns=scan(dataset.data).gap_ns)
+        if args.out:
+            export_breakdown(table, args.out)
+        else:
+            print(table.to_string(index=False))
+    else:
+        parser.print_help()